@@ -4,22 +4,41 @@ Financial Advisor AI
 
 A sophisticated AI-powered financial advisory system using multiple autonomous agents.
 This package provides a complete solution for AI-driven financial planning and portfolio management.
+
+Heavy dependencies (autogen, llama_index) are only imported when one of the
+names below is first accessed, so importing the package and load_config is cheap.
 """
 
+import importlib
+from typing import Any
+
 __version__ = "1.0.0"
 __author__ = "Gawain"
 
 from .config import load_config
-from .agents import (
-    create_advisor_agent,
-    create_portfolio_agent,
-    create_market_data_agent,
-    create_compliance_agent,
-    create_user_proxy
-)
-from .utils import (
-    get_customer_profile,
-    initialize_llama_index,
-    llama_index_query,
-    custom_speaker_selection_func
-) 
\ No newline at end of file
+
+# Public name -> submodule that defines it, imported on first access
+_LAZY_EXPORTS = {
+    "create_advisor_agent": "agents",
+    "create_portfolio_agent": "agents",
+    "create_market_data_agent": "agents",
+    "create_compliance_agent": "agents",
+    "create_user_proxy": "agents",
+    "get_customer_profile": "utils",
+    "initialize_llama_index": "utils",
+    "llama_index_query": "utils",
+    "custom_speaker_selection_func": "utils",
+    "start_index_warmup": "utils",
+}
+
+__all__ = ["load_config", *_LAZY_EXPORTS]
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_LAZY_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
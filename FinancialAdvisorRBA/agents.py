@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import autogen
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Optional
 from .utils import get_customer_profile, llama_index_query
 
 def create_advisor_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgent:
@@ -74,6 +74,9 @@ def create_portfolio_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgent
     - Include an explanation of WHY each asset was chosen.
     - Send "CHECK NEEDED" to the Compliance Agent before submitting to the user.
     - If the proposal is approved by Compliance Agent, say "PROPOSAL DONE".
+    - If a Review Panel returns the risk report and the compliance verdict together, do not ask for another check:
+      say "PROPOSAL DONE" if the verdict is APPROVED and no high risk is flagged; otherwise revise the allocation
+      and say "RISK EVALUATION NEEDED" to have the revision reviewed.
 
     Example Workflow:
     Step 1: Request Market Data from Market Data Agent
@@ -98,11 +101,16 @@ def create_portfolio_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgent
         llm_config=llm_config,
     )
 
-def create_market_data_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgent:
-    """Create the market data agent."""
+def create_market_data_agent(llm_config: Dict[str, Any], table_lookup: bool = True) -> autogen.AssistantAgent:
+    """Create the market data agent; table_lookup says whether it has the lookup_market_figures tool."""
+    table_guideline = (
+        "\n    - For exact figures from research tables (returns, yields, forecasts), call lookup_market_figures "
+        "first; use query_market_data for narrative insights."
+        if table_lookup else ""
+    )
     return autogen.AssistantAgent(
         name="MarketDataAgent",
-        system_message="""You are a financial market intelligence assistant. Your role is to provide:
+        system_message=f"""You are a financial market intelligence assistant. Your role is to provide:
     - Market insights (stock, commodities, bonds).
     - Economic indicators (interest rates, inflation).
     - Investment trends & sentiment analysis.
@@ -113,7 +121,8 @@ def create_market_data_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAge
       - Market Overview: General trend summary.
       - Risks & Opportunities: Key observations.
       - Recent Events Impacting Markets.
-    - Always include date/time relevance (e.g., "as of Q1 2025").
+    - Always include date/time relevance (e.g., "as of Q1 2025").{table_guideline}
+    - When you need several insights (e.g. equities, bonds, rates, FX), ask them all in one query_market_data_batch call instead of calling query_market_data repeatedly.
     - If market data is unavailable, inform the user instead of making assumptions.
 
     Example Query & Response Format:
@@ -125,18 +134,19 @@ def create_market_data_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAge
         llm_config=llm_config,
     )
 
-def create_risk_assessment_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgent:
-    """Create the risk assessment agent."""
+def create_risk_assessment_agent(llm_config: Dict[str, Any], table_lookup: bool = True) -> autogen.AssistantAgent:
+    """Create the risk assessment agent; table_lookup says whether it has the lookup_market_figures tool."""
+    table_guideline = " Use lookup_market_figures to fetch exact tabulated forecasts." if table_lookup else ""
     return autogen.AssistantAgent(
         name="RiskAssessmentAgent",
-        system_message="""You are the Risk Assessment Agent.
+        system_message=f"""You are the Risk Assessment Agent.
     Your responsibility is to evaluate the risk profile of investment recommendations by analyzing portfolio performance, expected returns, and risk exposure.
     You DO NOT modify portfolio allocations but provide a structured risk report to help the Portfolio Recommendation Agent refine its suggestions.
 
     Core Responsibilities:
-    - Compute Expected Portfolio Return → Estimate 1-year projected returns based on historical market data.
-    - Evaluate Risk Metrics → Analyze volatility, Sharpe Ratio, Value at Risk (VaR), and maximum drawdown to measure investment risk.
-    - Perform Stress Testing & Scenario Analysis → Assess how the portfolio behaves under different market conditions (e.g., inflation hikes, stock market downturns).
+    - Compute Risk Metrics with the assess_portfolio_risk tool → Pass the proposed allocation (and any alternative allocations to compare) as asset class weights. Never calculate or estimate the numbers yourself.
+    - Interpret the Results → Explain expected return, volatility, Sharpe Ratio, Value at Risk (VaR), maximum drawdown and stress scenario losses reported by the tool.
+    - Adjust Assumptions When Needed → If market data indicates different expected returns, volatilities or correlations, pass them as overrides to the tool.{table_guideline}
     - Retrieve Real-Time Market Data → If market data is missing, say "MARKET DATA REQUIRED".
     - Flag High-Risk Allocations → Identify overly volatile assets and notify the Portfolio Recommendation Agent without making adjustments.
 
@@ -195,11 +205,33 @@ def create_compliance_agent(llm_config: Dict[str, Any]) -> autogen.AssistantAgen
         llm_config=llm_config,
     )
 
-def create_user_proxy() -> autogen.UserProxyAgent:
-    """Create the user proxy agent."""
-    return autogen.UserProxyAgent(
+class CallbackUserProxyAgent(autogen.UserProxyAgent):
+    """User proxy that obtains human input from a callback instead of stdin."""
+
+    def __init__(self, input_fn: Callable[[str], str], **kwargs):
+        super().__init__(**kwargs)
+        self._input_fn = input_fn
+
+    def get_human_input(self, prompt: str) -> str:
+        """Ask the callback for the user's reply to prompt."""
+        return self._input_fn(prompt)
+
+def create_user_proxy(input_fn: Optional[Callable[[str], str]] = None) -> autogen.UserProxyAgent:
+    """
+    Create the user proxy agent.
+
+    Args:
+        input_fn (Optional[Callable[[str], str]], optional): Supplies the user's replies. Defaults to None (read stdin).
+
+    Returns:
+        autogen.UserProxyAgent: The user proxy agent.
+    """
+    kwargs = dict(
         name="user",
         human_input_mode="ALWAYS",
         code_execution_config=False,
         is_termination_msg=lambda msg: isinstance(msg.get("content"), str) and "END" in msg["content"].upper()
-    ) 
\ No newline at end of file
+    )
+    if input_fn is not None:
+        return CallbackUserProxyAgent(input_fn, **kwargs)
+    return autogen.UserProxyAgent(**kwargs)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch Portfolio Review
+----------------------
+Re-runs the portfolio -> risk -> compliance pipeline for many customers
+without a human in the loop. Each customer's stored profile stands in for
+the advisor's interview, proposals are approved automatically, and
+customers are spread across a pool of worker threads sharing one index,
+one answer cache, one LLM scheduler and one set of HTTP clients.
+
+Results stream to a JSONL file as customers finish; customers already in
+the file are skipped, so an interrupted run picks up where it stopped.
+
+Usage:
+    python -m FinancialAdvisorRBA.batch customers.txt --output reviews.jsonl --workers 8
+
+The input has one customer id per line, optionally followed by a comma and
+the customer's risk profile (conservative, moderate or aggressive).
+Customers without a risk profile are not reviewed; they are written with
+status "needs_review" and retried on the next run.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+import autogen
+from llama_index.core import VectorStoreIndex
+
+from .agents import create_user_proxy
+from .compliance import parse_allocation
+from .config import load_config
+from .financialdemo import build_chat_manager
+from .model_tiers import tier_metrics
+from .review import split_review, with_panel_members
+from .scheduler import get_llm_scheduler
+from .server import LLMClientPool
+from .utils import (
+    BackgroundIndex,
+    configure_profile_store,
+    get_answer_cache,
+    get_customer_profile,
+    initialize_llama_index,
+    resolve_index
+)
+
+logger = logging.getLogger(__name__)
+
+# Results that are written but retried when the batch is run again
+RETRY_STATUSES = frozenset({"error", "needs_review"})
+
+# The client's reply to the summary report, and to any agent that hands the conversation back before the proposal is done
+AUTO_APPROVAL = "APPROVE. Proceed using the profile above; no further client input is available."
+
+def read_customer_list(path: Path, default_risk_profile: Optional[str] = None) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Read customer ids and risk profiles from a batch input file.
+
+    Args:
+        path (Path): File with one "customer_id[,risk_profile]" per line; blank lines and
+            lines starting with "#" are ignored.
+        default_risk_profile (Optional[str], optional): Risk profile of customers listed without one.
+            Defaults to None (unknown).
+
+    Yields:
+        Tuple[str, Optional[str]]: Customer id and risk profile, or None if it is unknown.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            risk_profile = row[1].strip() if len(row) > 1 and row[1].strip() else default_risk_profile
+            yield row[0].strip(), risk_profile
+
+def completed_customers(output: Path) -> Set[str]:
+    """
+    Get the customers already reviewed in an output file.
+
+    Args:
+        output (Path): JSONL results file.
+
+    Returns:
+        Set[str]: Ids of customers with a result whose status is not in RETRY_STATUSES.
+    """
+    done = set()
+    if output.exists():
+        with open(output, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                if result.get("status") not in RETRY_STATUSES:
+                    done.add(result["customer_id"])
+    return done
+
+def financial_summary(profile: Dict[str, Any], risk_profile: str) -> str:
+    """
+    Financial summary report built from a stored profile, in place of the advisor's interview.
+
+    Args:
+        profile (Dict[str, Any]): Stored customer profile.
+        risk_profile (str): The customer's risk profile.
+
+    Returns:
+        str: Report attributed to the FinancialAdvisor at the start of the review.
+    """
+    return (
+        "Financial Summary Report\n"
+        f"Overview: Scheduled 2025 portfolio review for customer {profile['customer_id']} ({profile['name']}).\n"
+        f"Customer profile: {json.dumps(profile)}\n"
+        f"Risk Assessment: {risk_profile} risk profile.\n"
+        "Suggested Strategies: rebalance the current holdings for 2025 in line with the risk profile."
+    )
+
+def summarize_review(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Extract the outcome of a review from its group chat messages.
+
+    Args:
+        messages (List[Dict[str, Any]]): Group chat messages; review panel reports count as
+            messages of the reviewers they contain.
+
+    Returns:
+        Dict[str, Any]: Status ("approved", "requires_changes" or "incomplete"), the final
+        proposal and its parsed allocation, the last risk report and compliance verdict.
+    """
+    messages = [part for message in messages for part in split_review(message)]
+
+    def last(speaker: str, predicate=lambda text: True) -> Optional[str]:
+        return next((
+            m["content"] for m in reversed(messages)
+            if m.get("name") == speaker and isinstance(m.get("content"), str) and m["content"] and predicate(m["content"])
+        ), None)
+
+    proposal = last("PortfolioRecommendationAgent", lambda text: bool(parse_allocation(text)[0]))
+    verdict = last("RegulatoryComplianceAgent")
+    done = last("PortfolioRecommendationAgent", lambda text: "PROPOSAL DONE" in text) is not None
+    if verdict is not None and "REQUIRES CHANGES" in verdict and not done:
+        status = "requires_changes"
+    elif verdict is not None and "APPROVED" in verdict and done:
+        status = "approved"
+    else:
+        status = "incomplete"
+    return {
+        "status": status,
+        "proposal": proposal,
+        "allocation": [
+            {"holding": name, "asset_class": asset, "weight": weight}
+            for name, asset, weight in (parse_allocation(proposal)[0] if proposal else [])
+        ],
+        "risk_report": last("RiskAssessmentAgent"),
+        "compliance": verdict
+    }
+
+def review_customer(
+    config: Dict[str, Any],
+    index: Union[VectorStoreIndex, BackgroundIndex],
+    customer_id: str,
+    risk_profile: Optional[str],
+    client_pool: Optional[LLMClientPool] = None
+) -> Dict[str, Any]:
+    """
+    Run the portfolio, risk and compliance agents for one customer, approving automatically.
+
+    Args:
+        config (Dict[str, Any]): Configuration returned by load_config.
+        index (Union[VectorStoreIndex, BackgroundIndex]): Market research index shared by all customers.
+        customer_id (str): Customer to review.
+        risk_profile (Optional[str]): The customer's risk profile. Customers without one are
+            not reviewed, since the proposal would be approved against a guessed profile.
+        client_pool (Optional[LLMClientPool], optional): HTTP clients shared across customers. Defaults to None.
+
+    Returns:
+        Dict[str, Any]: Review outcome (see summarize_review) with the customer id, rounds and seconds taken,
+        status "needs_review" if the risk profile is unknown, or status "error" and the error message.
+    """
+    start = time.perf_counter()
+    profile = get_customer_profile(customer_id)
+    if "error" in profile:
+        return {"customer_id": customer_id, "status": "error", "error": profile["error"], "seconds": 0.0}
+    if not risk_profile:
+        return {
+            "customer_id": customer_id,
+            "status": "needs_review",
+            "risk_profile": None,
+            "error": "No risk profile on record; add one to the input file or pass --risk-profile",
+            "seconds": 0.0
+        }
+
+    manager: Optional[autogen.GroupChatManager] = None
+
+    def auto_reply(prompt: str) -> str:
+        messages = manager.groupchat.messages if manager is not None else []
+        if any("PROPOSAL DONE" in str(m.get("content") or "") for m in messages[-2:]):
+            return "exit"
+        return AUTO_APPROVAL
+
+    try:
+        user_proxy = create_user_proxy(input_fn=auto_reply)
+        manager = build_chat_manager(config, index, user_proxy, silent=True, customer_id=profile["customer_id"])
+        if client_pool is not None:
+            client_pool.attach([manager, *with_panel_members(manager.groupchat.agents)])
+        # Start from the advisor's report and the client's approval, so the
+        # portfolio agent speaks first and the interview is never run
+        last_agent, last_message = manager.resume(messages=[
+            {"role": "user", "name": "FinancialAdvisor", "content": financial_summary(profile, risk_profile)},
+            {"role": "user", "name": user_proxy.name, "content": AUTO_APPROVAL}
+        ], silent=True)
+        last_agent.initiate_chat(manager, message=last_message, clear_history=False, silent=True)
+        result = summarize_review(manager.groupchat.messages)
+    except Exception as e:
+        logger.error(f"Review of {customer_id} failed: {str(e)}")
+        return {
+            "customer_id": customer_id,
+            "status": "error",
+            "error": f"{type(e).__name__}: {e}",
+            "seconds": time.perf_counter() - start
+        }
+    return {
+        "customer_id": customer_id,
+        "risk_profile": risk_profile,
+        **result,
+        "rounds": len(manager.groupchat.messages),
+        "seconds": time.perf_counter() - start
+    }
+
+def run_batch(
+    config: Dict[str, Any],
+    index: Union[VectorStoreIndex, BackgroundIndex],
+    customers: List[Tuple[str, Optional[str]]],
+    output: Path,
+    workers: int = 8
+) -> Dict[str, Any]:
+    """
+    Review many customers on a worker pool, appending each result to a JSONL file as it finishes.
+
+    Args:
+        config (Dict[str, Any]): Configuration returned by load_config.
+        index (Union[VectorStoreIndex, BackgroundIndex]): Market research index shared by all customers.
+        customers (List[Tuple[str, Optional[str]]]): Customer ids and risk profiles (None if unknown).
+        output (Path): JSONL results file; customers already in it are skipped unless their
+            status is in RETRY_STATUSES.
+        workers (int, optional): Customers reviewed concurrently. Defaults to 8.
+
+    Returns:
+        Dict[str, Any]: Throughput statistics: customers reviewed and skipped, counts per status,
+        wall time, customers per minute, per-customer latency, LLM usage per model tier,
+        answer cache hit rate and scheduler waits.
+    """
+    done = completed_customers(output)
+    pending = [(customer_id, risk) for customer_id, risk in customers if customer_id not in done]
+    client_pool = LLMClientPool()
+    statuses: Dict[str, int] = {}
+    durations: List[float] = []
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-review") as pool, \
+            open(output, "a", encoding="utf-8") as out:
+        futures = [
+            pool.submit(review_customer, config, index, customer_id, risk, client_pool)
+            for customer_id, risk in pending
+        ]
+        for count, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            out.write(json.dumps(result, default=str) + "\n")
+            out.flush()
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+            durations.append(result["seconds"])
+            if count % 50 == 0 or count == len(futures):
+                elapsed = time.perf_counter() - start
+                logger.info(f"Reviewed {count}/{len(futures)} customers ({count / elapsed * 60:.1f}/min)")
+    wall = time.perf_counter() - start
+
+    resolved = resolve_index(index)
+    scheduler = get_llm_scheduler()
+    ordered = sorted(durations)
+    return {
+        "customers": len(pending),
+        "skipped": len(customers) - len(pending),
+        "statuses": statuses,
+        "wall_seconds": round(wall, 3),
+        "customers_per_minute": round(len(pending) / wall * 60, 2) if wall > 0 and pending else 0.0,
+        "customer_seconds_p50": round(statistics.median(ordered), 3) if ordered else 0.0,
+        "customer_seconds_p95": round(ordered[int(0.95 * (len(ordered) - 1))], 3) if ordered else 0.0,
+        "llm_tiers": tier_metrics.summary(),
+        "answer_cache": get_answer_cache(resolved).stats() if resolved is not None else {},
+        "scheduler": scheduler.stats() if scheduler is not None else {}
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Review portfolios for many customers without an interview")
+    parser.add_argument("customers", type=Path, help="File with one customer_id[,risk_profile] per line")
+    parser.add_argument("--output", type=Path, default=Path("portfolio_reviews.jsonl"), help="JSONL results file")
+    parser.add_argument("--workers", type=int, default=8, help="Customers reviewed concurrently")
+    parser.add_argument(
+        "--risk-profile",
+        help="Risk profile of customers listed without one; by default they are marked needs_review"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = load_config()
+    if config is None:
+        raise SystemExit(1)
+    configure_profile_store(config["profile_db"])
+    index = initialize_llama_index(config["pdf_dir"], config["index_dir"], config["vector_dtype"])
+    if index is None:
+        logger.error("Failed to initialize LlamaIndex")
+        raise SystemExit(1)
+
+    customers = list(read_customer_list(args.customers, args.risk_profile))
+    stats = run_batch(config, index, customers, args.output, args.workers)
+    print(json.dumps(stats, indent=2))
+
+if __name__ == "__main__":
+    main()
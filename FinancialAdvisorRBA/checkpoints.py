@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Append-only checkpoints for advisory sessions.
+
+Every message added to a group chat - agent replies, tool calls and tool
+results - is appended to the session's JSONL file as soon as it is added,
+together with the speaker and any approval the client still owes. A crashed
+or timed-out session is resumed from its file by id, without repeating the
+LLM and tool calls that produced the recorded messages.
+"""
+
+import functools
+import json
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import autogen
+
+# Phrases with which an agent hands a report or proposal to the client for approval
+# ("APPROVED" is a compliance verdict, not a request)
+APPROVAL_REQUEST = re.compile(r"\bAPPROV(?:E|AL)\b|PROPOSAL DONE")
+
+def new_session_id() -> str:
+    """Generate an id for a new advisory session."""
+    return uuid.uuid4().hex[:12]
+
+class SessionCheckpoint:
+    """
+    Append-only record of one session's group chat.
+
+    Opening an existing checkpoint restores its messages. A torn last line
+    left by a crash mid-write is ignored.
+    """
+
+    def __init__(self, path: Path, session_id: str, user_name: str = "user"):
+        """
+        Args:
+            path (Path): JSONL checkpoint file.
+            session_id (str): Session id.
+            user_name (str, optional): Name of the agent representing the client. Defaults to "user".
+        """
+        self.path = Path(path)
+        self.session_id = session_id
+        self.user_name = user_name
+        self.messages: List[Dict[str, Any]] = []
+        self.last_speaker: Optional[str] = None
+        self.pending_approval: Optional[Dict[str, Any]] = None
+        self.finished = False
+        self._lock = threading.Lock()
+        torn = self._load()
+        self.rounds = len(self.messages)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Line buffered: each record reaches the OS as one write, without an fsync
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        if torn:
+            # Terminate the torn line so the next record starts on its own line
+            self._file.write("\n")
+
+    def _load(self) -> bool:
+        """Restore messages and session state from the file; return whether its last line is torn."""
+        if not self.path.exists():
+            return False
+        line = ""
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("status") == "finished":
+                    self.finished = True
+                    continue
+                index = record["round"]
+                # Rounds are written once, in order; anything else is a stale duplicate
+                if index != len(self.messages):
+                    continue
+                self.messages.append(record["message"])
+                self.last_speaker = record["speaker"]
+                self.pending_approval = record.get("pending_approval")
+        return bool(line) and not line.endswith("\n")
+
+    def record(self, index: int, message: Dict[str, Any], speaker: str) -> None:
+        """
+        Append one group chat message. Messages already checkpointed are skipped,
+        so replaying a resumed chat does not duplicate them.
+
+        Args:
+            index (int): Position of the message in the group chat.
+            message (Dict[str, Any]): The message as stored by the group chat.
+            speaker (str): Name of the agent that added it.
+        """
+        with self._lock:
+            if index < self.rounds:
+                return
+            if speaker == self.user_name:
+                self.pending_approval = None
+            elif APPROVAL_REQUEST.search(message.get("content") or ""):
+                self.pending_approval = {"agent": speaker, "round": index}
+            line = json.dumps({
+                "round": index,
+                "time": time.time(),
+                "speaker": speaker,
+                "message": message,
+                "pending_approval": self.pending_approval
+            }, default=str)
+            self._file.write(line + "\n")
+            self.rounds = index + 1
+            self.last_speaker = speaker
+
+    def finish(self) -> None:
+        """Mark the session as finished so it is not resumed."""
+        with self._lock:
+            self._file.write(json.dumps({"status": "finished", "time": time.time()}) + "\n")
+            self.finished = True
+
+    def close(self) -> None:
+        """Close the checkpoint file."""
+        with self._lock:
+            self._file.close()
+
+def open_checkpoint(checkpoint_dir: Path, session_id: str) -> SessionCheckpoint:
+    """
+    Open a session's checkpoint, restoring any messages already recorded.
+
+    Args:
+        checkpoint_dir (Path): Directory holding one JSONL file per session.
+        session_id (str): Session id.
+
+    Returns:
+        SessionCheckpoint: Checkpoint to attach with checkpoint_chat.
+    """
+    return SessionCheckpoint(Path(checkpoint_dir) / f"{session_id}.jsonl", session_id)
+
+def checkpoint_chat(groupchat: autogen.GroupChat, checkpoint: SessionCheckpoint) -> None:
+    """
+    Checkpoint every message added to a group chat.
+
+    Call before creating the GroupChatManager, which keeps its own copy of the GroupChat.
+
+    Args:
+        groupchat (autogen.GroupChat): Group chat to checkpoint.
+        checkpoint (SessionCheckpoint): Session checkpoint.
+    """
+    append = groupchat.append
+
+    @functools.wraps(append)
+    def checkpointed_append(message: Dict, speaker: autogen.Agent) -> None:
+        index = len(groupchat.messages)
+        append(message, speaker)
+        checkpoint.record(index, message, speaker.name)
+
+    groupchat.append = checkpointed_append
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rule-based compliance pre-screen.
+
+Evaluates a proposed allocation against the declarative rule set in
+compliance_rules.json before the RegulatoryComplianceAgent is asked for
+an LLM review. Clear violations and clear passes are answered immediately
+with the rule ids involved; only ambiguous proposals reach the LLM. Every
+decision is appended to an audit log recording which path was taken.
+"""
+
+import json
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import autogen
+
+from .risk import classify_asset
+
+DEFAULT_RULES_PATH = Path(__file__).parent / "compliance_rules.json"
+
+APPROVED = "APPROVED"
+REQUIRES_CHANGES = "REQUIRES CHANGES"
+AMBIGUOUS = "AMBIGUOUS"
+
+# Words that mark a percentage line as a metric rather than a holding
+_METRIC_WORDS = re.compile(
+    r"return|volatility|ratio|yield|growth|rate|drawdown|\bvar\b|inflation|probability|confidence|risk|fee|cost"
+)
+_PERCENT_FIRST = re.compile(r"^[\s\-*•\d.)]*?(\d+(?:\.\d+)?)\s*%\s*(?:in\s+|of\s+|[-–:]\s*)?(.+?)\s*$")
+_PERCENT_LAST = re.compile(r"^[\s\-*•|]*(.+?)\s*[:\-–|(]\s*(\d+(?:\.\d+)?)\s*%")
+# The "Risk Assessment:" line of the advisor's Financial Summary Report
+_RISK_ASSESSMENT_LINE = re.compile(r"^[\s\-*#•]*Risk Assessment\s*:\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+_NEGATION = re.compile(r"\b(?:not|no|never|isn't|aren't)\b|n't\b", re.IGNORECASE)
+
+_OPERATORS: Dict[str, Callable[[float, Any], float]] = {
+    # Each returns the slack: positive when the rule passes, negative when violated
+    "<=": lambda value, limit: limit - value,
+    ">=": lambda value, limit: value - limit,
+    "between": lambda value, limit: min(value - limit[0], limit[1] - value),
+}
+
+def parse_allocation(text: str) -> Tuple[List[Tuple[str, str, float]], List[str]]:
+    """
+    Extract holdings from a proposal written in prose or as a list.
+
+    Recognizes lines such as "- 50% S&P 500 Index Fund" and "Gold: 10%".
+
+    Args:
+        text (str): Proposal text.
+
+    Returns:
+        Tuple[List[Tuple[str, str, float]], List[str]]: Holdings as (name, asset class, weight fraction)
+        and names of percentage lines whose asset could not be classified.
+    """
+    holdings, unrecognized = [], []
+    for line in text.splitlines():
+        if line.count("%") != 1:
+            continue
+        match = _PERCENT_FIRST.match(line)
+        if match:
+            weight, name = match.group(1), match.group(2)
+        else:
+            match = _PERCENT_LAST.match(line)
+            if not match:
+                continue
+            name, weight = match.group(1), match.group(2)
+        name = name.strip(" *|:-–()")
+        asset = classify_asset(name)
+        if asset is not None:
+            holdings.append((name, asset, float(weight) / 100))
+        elif not _METRIC_WORDS.search(name.lower()):
+            unrecognized.append(name)
+    return holdings, unrecognized
+
+class ComplianceRuleEngine:
+    """Declarative compliance rules compiled into fast predicates."""
+
+    def __init__(self, spec: Dict[str, Any]):
+        """
+        Args:
+            spec (Dict[str, Any]): Rule set in the format of compliance_rules.json.
+        """
+        self.margin = spec.get("ambiguity_margin", 0.02)
+        self.parse_tolerance = spec.get("parse_tolerance", 0.05)
+        self.risk_profiles = [
+            (profile, re.compile("|".join(map(re.escape, keywords)), re.IGNORECASE))
+            for profile, keywords in spec.get("risk_profiles", {}).items()
+        ]
+        groups = {name: frozenset(assets) for name, assets in spec.get("asset_groups", {}).items()}
+        self.rules = [self._compile(rule, groups) for rule in spec["rules"]]
+
+    @classmethod
+    def from_file(cls, path: Path = DEFAULT_RULES_PATH) -> "ComplianceRuleEngine":
+        """
+        Load and compile a rule set file.
+
+        Args:
+            path (Path, optional): JSON rule set. Defaults to DEFAULT_RULES_PATH.
+
+        Returns:
+            ComplianceRuleEngine: Compiled engine.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _compile(self, rule: Dict[str, Any], groups: Dict[str, frozenset]) -> Dict[str, Any]:
+        """Turn one rule definition into a metric function and slack check."""
+        metric = rule["metric"]
+        if metric == "total_weight":
+            measure = lambda holdings: sum(weight for _, _, weight in holdings)
+        elif metric == "max_single_asset":
+            measure = lambda holdings: max((weight for _, _, weight in holdings), default=0.0)
+        elif metric.startswith("group:"):
+            members = groups[metric[len("group:"):]]
+            measure = lambda holdings: sum(weight for _, asset, weight in holdings if asset in members)
+        else:
+            raise ValueError(f"Unknown metric '{metric}' in rule {rule['id']}")
+        return {
+            "id": rule["id"],
+            "description": rule.get("description", ""),
+            "profiles": frozenset(rule.get("when", {}).get("risk_profile", [])),
+            "measure": measure,
+            "slack": _OPERATORS[rule["op"]],
+            "limit": rule["limit"],
+            "margin": rule.get("margin", self.margin)
+        }
+
+    def detect_risk_profile(self, report: str) -> Optional[str]:
+        """
+        Read the client's risk profile from the "Risk Assessment:" line of a Financial Summary Report.
+
+        Args:
+            report (str): The advisor's report.
+
+        Returns:
+            Optional[str]: Risk profile name, or None if the line is missing, negated or names
+            zero or several profiles.
+        """
+        lines = _RISK_ASSESSMENT_LINE.findall(report)
+        if len(lines) != 1 or _NEGATION.search(lines[0]):
+            return None
+        matches = [profile for profile, pattern in self.risk_profiles if pattern.search(lines[0])]
+        return matches[0] if len(matches) == 1 else None
+
+    def evaluate(self, proposal: str, risk_profile: Optional[str]) -> Dict[str, Any]:
+        """
+        Screen a proposal against the rule set.
+
+        Args:
+            proposal (str): Proposal text containing the allocation.
+            risk_profile (Optional[str]): Client risk profile, if known.
+
+        Returns:
+            Dict[str, Any]: Verdict (APPROVED, REQUIRES CHANGES or AMBIGUOUS), violated,
+            borderline, undetermined and passed rule ids, details and the parsed allocation.
+        """
+        holdings, unrecognized = parse_allocation(proposal)
+        result = {
+            "verdict": AMBIGUOUS,
+            "risk_profile": risk_profile,
+            "allocation": {name: weight for name, _, weight in holdings},
+            "violations": [],
+            "borderline": [],
+            "undetermined": [],
+            "passed": [],
+            "details": []
+        }
+        total = sum(weight for _, _, weight in holdings)
+        if not holdings or unrecognized or abs(total - 1.0) > self.parse_tolerance:
+            result["details"].append("Allocation could not be parsed reliably")
+            return result
+
+        for rule in self.rules:
+            if rule["profiles"]:
+                if risk_profile is None:
+                    result["undetermined"].append(rule["id"])
+                    continue
+                if risk_profile not in rule["profiles"]:
+                    continue
+            value = rule["measure"](holdings)
+            slack = rule["slack"](value, rule["limit"])
+            if slack < -rule["margin"]:
+                result["violations"].append(rule["id"])
+                limit = rule["limit"]
+                limit = f"{limit[0]:.0%}-{limit[1]:.0%}" if isinstance(limit, list) else f"{limit:.0%}"
+                result["details"].append(f"{rule['id']}: {rule['description']} (actual {value:.1%}, limit {limit})")
+            elif slack < rule["margin"]:
+                result["borderline"].append(rule["id"])
+            else:
+                result["passed"].append(rule["id"])
+
+        if result["violations"]:
+            result["verdict"] = REQUIRES_CHANGES
+        elif not result["borderline"] and not result["undetermined"]:
+            result["verdict"] = APPROVED
+        return result
+
+@lru_cache(maxsize=None)
+def load_rule_engine(path: Path = DEFAULT_RULES_PATH) -> ComplianceRuleEngine:
+    """
+    Load a rule set once per process.
+
+    Args:
+        path (Path, optional): JSON rule set. Defaults to DEFAULT_RULES_PATH.
+
+    Returns:
+        ComplianceRuleEngine: Shared compiled engine.
+    """
+    return ComplianceRuleEngine.from_file(path)
+
+class ComplianceAuditLog:
+    """Append-only JSONL record of compliance decisions."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Append one decision."""
+        line = json.dumps({"timestamp": time.time(), **entry}, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+@lru_cache(maxsize=None)
+def open_audit_log(path: Path) -> ComplianceAuditLog:
+    """
+    Get the shared audit log writer for a path.
+
+    Args:
+        path (Path): JSONL audit log file.
+
+    Returns:
+        ComplianceAuditLog: Writer shared by every session in the process.
+    """
+    return ComplianceAuditLog(path)
+
+def format_verdict(result: Dict[str, Any]) -> str:
+    """
+    Render a decisive pre-screen result as a compliance agent reply.
+
+    Args:
+        result (Dict[str, Any]): Result of ComplianceRuleEngine.evaluate.
+
+    Returns:
+        str: Reply containing the verdict keyword the speaker router listens for.
+    """
+    if result["verdict"] == APPROVED:
+        return (
+            "Verdict: APPROVED (automated rule pre-screen)\n"
+            f"Risk profile: {result['risk_profile']}\n"
+            f"Rules passed: {', '.join(result['passed'])}"
+        )
+    return (
+        "Verdict: REQUIRES CHANGES (automated rule pre-screen)\n"
+        + "\n".join(f"- {detail}" for detail in result["details"])
+        + "\nAction: The Portfolio Recommendation Agent must revise the allocation and resubmit for compliance review."
+    )
+
+def add_compliance_prescreen(
+    agent: autogen.ConversableAgent,
+    engine: ComplianceRuleEngine,
+    audit_log: ComplianceAuditLog,
+    proposal_speaker: str = "PortfolioRecommendationAgent",
+    report_speaker: str = "FinancialAdvisor",
+    handoff_keyword: str = "CHECK NEEDED",
+    reviewers: Tuple[str, ...] = ("ReviewPanel",)
+) -> None:
+    """
+    Answer clear-cut compliance checks from the rule engine before the agent's LLM reply.
+
+    Only turns that review a fresh proposal are screened: the last message is the
+    proposal speaker's hand-off, or the agent is asked by a review panel, which
+    only runs once a proposal has been handed to it.
+
+    Args:
+        agent (autogen.ConversableAgent): The RegulatoryComplianceAgent.
+        engine (ComplianceRuleEngine): Compiled rule set.
+        audit_log (ComplianceAuditLog): Where every decision is recorded.
+        proposal_speaker (str, optional): Agent whose latest message holds the proposal.
+            Defaults to "PortfolioRecommendationAgent".
+        report_speaker (str, optional): Agent whose Financial Summary Report states the client's risk profile.
+            Defaults to "FinancialAdvisor".
+        handoff_keyword (str, optional): Phrase with which the proposal speaker asks for a compliance check.
+            Defaults to "CHECK NEEDED".
+        reviewers (Tuple[str, ...], optional): Senders that run the agent as part of a proposal review.
+            Defaults to ("ReviewPanel",).
+    """
+    def prescreen(recipient, messages=None, sender=None, config=None):
+        # Use the full history rather than the windowed one for profile detection
+        history = recipient.chat_messages.get(sender) or messages or []
+        if not history:
+            return False, None
+        last = history[-1]
+        handed_off = (
+            last.get("name") == proposal_speaker
+            and isinstance(last.get("content"), str)
+            and handoff_keyword in last["content"]
+        )
+        if not handed_off and getattr(sender, "name", None) not in reviewers:
+            return False, None
+        proposal = next(
+            (m.get("content") for m in reversed(history) if m.get("name") == proposal_speaker and m.get("content")),
+            None
+        )
+        if proposal is None:
+            return False, None
+
+        start = time.perf_counter()
+        report = next(
+            (
+                m["content"] for m in reversed(history)
+                if m.get("name") == report_speaker and isinstance(m.get("content"), str)
+                and _RISK_ASSESSMENT_LINE.search(m["content"])
+            ),
+            ""
+        )
+        profile = engine.detect_risk_profile(report)
+        result = engine.evaluate(proposal, profile)
+        elapsed_us = (time.perf_counter() - start) * 1e6
+
+        path = "llm" if result["verdict"] == AMBIGUOUS else "rules"
+        audit_log.record({
+            "agent": recipient.name,
+            "path": path,
+            "verdict": result["verdict"],
+            "risk_profile": profile,
+            "violations": result["violations"],
+            "borderline": result["borderline"],
+            "undetermined": result["undetermined"],
+            "passed": result["passed"],
+            "allocation": result["allocation"],
+            "elapsed_us": round(elapsed_us, 1)
+        })
+        if path == "llm":
+            return False, None
+        return True, format_verdict(result)
+
+    agent.register_reply([autogen.Agent, None], prescreen, position=0)
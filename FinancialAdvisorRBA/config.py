@@ -23,6 +23,10 @@ def load_config():
         print("Please add your OpenAI API key to the .env file.")
         return None
     
+    return build_config(api_key)
+
+def build_config(api_key):
+    """Build configuration settings for an API key, without reading the environment."""
     return {
         "api_key": api_key,
         "llm_config": {
@@ -32,5 +36,62 @@ def load_config():
                 "temperature": 0.3
             }]
         },
-        "pdf_dir": Path(__file__).parent / "sample_pdf"
+        # Shared by every session: rate limits of the OpenAI account, requests in flight and backoff.
+        # Agents' clients retry on their own only when this is set to None
+        "llm_scheduler": {
+            "requests_per_minute": 500,
+            "tokens_per_minute": 30000,
+            "max_concurrency": 8,
+            "max_retries": 5,
+            "base_delay": 1.0,
+            "max_delay": 30.0
+        },
+        # Model tiers from cheapest to largest; prices are USD per 1K tokens. A turn moves to the
+        # next tier when its prompt exceeds max_prompt_tokens, the call fails or the reply is unusable
+        "model_tiers": {
+            "small": {
+                "model": "gpt-4o-mini",
+                "prompt_price": 0.00015,
+                "completion_price": 0.0006,
+                "max_prompt_tokens": 2500
+            },
+            "large": {
+                "model": "gpt-4",
+                "prompt_price": 0.03,
+                "completion_price": 0.06
+            }
+        },
+        # Tier each agent starts on
+        "agent_tiers": {
+            "FinancialAdvisor": "small",
+            "MarketDataAgent": "small",
+            "PortfolioRecommendationAgent": "large",
+            "RiskAssessmentAgent": "large",
+            "RegulatoryComplianceAgent": "large"
+        },
+        # Show agent replies token by token as they are generated (console and session host)
+        "stream_responses": True,
+        # Review each proposal for risk and compliance concurrently, as one merged turn
+        "review_fanout": True,
+        "pdf_dir": Path(__file__).parent / "sample_pdf",
+        "index_dir": Path(__file__).parent / "index_store",
+        # Storage type of the embeddings in the memory-mapped vector store: "float32", "float16" or "int8"
+        "vector_dtype": "float16",
+        "profile_db": Path(__file__).parent / "customers.db",
+        "compliance_rules": Path(__file__).parent / "compliance_rules.json",
+        "compliance_audit_log": Path(__file__).parent / "compliance_audit.jsonl",
+        # Append-only per-session checkpoints for resuming; set to None to disable
+        "checkpoint_dir": Path(__file__).parent / "sessions",
+        # Span trace export (JSONL); set to None to disable tracing
+        "trace_log": Path(__file__).parent / "traces.jsonl",
+        # Also keep in-process p50/p95 statistics in tracing.trace_aggregator
+        "trace_aggregate": True,
+        # Per-agent token budget for the message history sent to the LLM
+        "context_budgets": {
+            "FinancialAdvisor": 3000,
+            "PortfolioRecommendationAgent": 6000,
+            "MarketDataAgent": 3000,
+            "RiskAssessmentAgent": 4000,
+            "RegulatoryComplianceAgent": 4000
+        }
     } 
\ No newline at end of file
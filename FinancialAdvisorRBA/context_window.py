@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Token-budgeted conversation windowing with a rolling summary of older turns."""
+
+import copy
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import autogen
+from autogen.agentchat.contrib.capabilities.transform_messages import TransformMessages
+from autogen.token_count_utils import count_token
+
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+def _message_key(message: Dict[str, Any]) -> str:
+    """Stable hash of a message, used to memoize token counts and summaries."""
+    payload = json.dumps(message, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def extractive_summary(message: Dict[str, Any], max_chars: int = 200) -> str:
+    """
+    Summarize a message as its speaker and first sentence, without an LLM call.
+
+    Args:
+        message (Dict[str, Any]): Chat message.
+        max_chars (int, optional): Maximum summary length. Defaults to 200.
+
+    Returns:
+        str: One-line summary of the message.
+    """
+    content = " ".join(str(message.get("content") or "").split())
+    calls = message.get("tool_calls") or ([{"function": message["function_call"]}] if message.get("function_call") else [])
+    if calls:
+        content = "called " + ", ".join(
+            f"{call['function'].get('name')}({call['function'].get('arguments') or ''})" for call in calls
+        )
+    elif _is_tool_traffic(message):
+        content = f"tool result: {content}"
+    first_sentence = content.split(". ")[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[:max_chars - 3] + "..."
+    return f"- {message.get('name') or message.get('role', 'unknown')}: {first_sentence}"
+
+def _is_tool_traffic(message: Dict[str, Any]) -> bool:
+    """Whether a message is a tool or function call, or a result of one."""
+    return bool(
+        message.get("role") in ("tool", "function")
+        or message.get("tool_calls")
+        or message.get("tool_responses")
+        or message.get("function_call")
+    )
+
+def _is_tool_result(message: Dict[str, Any]) -> bool:
+    """Whether a message answers the tool or function call before it."""
+    return message.get("role") in ("tool", "function") or bool(message.get("tool_responses"))
+
+class RollingSummaryTransform:
+    """
+    Message transform that fits an agent's history into a token budget.
+
+    Messages are kept verbatim from newest to oldest until the budget is
+    spent; older turns are folded into a single rolling summary message.
+    The newest message, the tool calls and results of the current turn and
+    the latest message from each pinned speaker (by default the latest
+    portfolio proposal) are always kept verbatim. Older tool exchanges are
+    summarized like any other turn, a call together with its results, so a
+    result is never kept without the call it answers. Per-message token
+    counts and summaries are memoized, so each turn is only counted and
+    summarized once across rounds.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int,
+        model: str = "gpt-4",
+        pinned_speakers: Sequence[str] = ("PortfolioRecommendationAgent",),
+        summarizer: Callable[[Dict[str, Any]], str] = extractive_summary,
+        memo_size: int = 2048
+    ):
+        """
+        Args:
+            max_tokens (int): Token budget for the agent's message history.
+            model (str, optional): Model used for token counting. Defaults to "gpt-4".
+            pinned_speakers (Sequence[str], optional): Speakers whose latest message is never summarized.
+                Defaults to ("PortfolioRecommendationAgent",).
+            summarizer (Callable[[Dict[str, Any]], str], optional): Turns one message into a summary line.
+                Defaults to extractive_summary.
+            memo_size (int, optional): Number of messages whose token count and summary are memoized. Defaults to 2048.
+        """
+        self.max_tokens = max_tokens
+        self.model = model
+        self.pinned_speakers = set(pinned_speakers)
+        self.summarizer = summarizer
+        self.memo_size = memo_size
+        self.metrics = {"rounds": 0, "tokens_before": 0, "tokens_after": 0, "tokens_saved": 0, "last_saved": 0}
+        self._memo: "OrderedDict[str, Tuple[int, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def apply_transform(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fit messages into the token budget.
+
+        Args:
+            messages (List[Dict[str, Any]]): Agent's message history, oldest first.
+
+        Returns:
+            List[Dict[str, Any]]: Windowed history with older turns summarized.
+        """
+        pinned = self._pinned_indices(messages)
+        tokens = [self._tokens(message) for message in messages]
+        budget = self.max_tokens - sum(tokens[i] for i in pinned)
+
+        keep = set(pinned)
+        for unit in reversed(self._units(messages)):
+            unit = [i for i in unit if i not in keep]
+            if not unit:
+                continue
+            cost = sum(tokens[i] for i in unit)
+            if cost > budget:
+                break
+            keep.update(unit)
+            budget -= cost
+
+        compacted = [messages[i] for i in range(len(messages)) if i not in keep]
+        if not compacted:
+            result = copy.deepcopy(messages)
+        else:
+            lines = [SUMMARY_HEADER] + [self._summary(message) for message in compacted]
+            summary = {"role": "user", "name": "ConversationSummary", "content": "\n".join(lines)}
+            system = [copy.deepcopy(m) for i, m in enumerate(messages) if i in keep and m.get("role") == "system"]
+            rest = [copy.deepcopy(m) for i, m in enumerate(messages) if i in keep and m.get("role") != "system"]
+            result = system + [summary] + rest
+
+        before = sum(tokens)
+        after = before if not compacted else self._count(result)
+        with self._lock:
+            self.metrics["rounds"] += 1
+            self.metrics["tokens_before"] += before
+            self.metrics["tokens_after"] += after
+            self.metrics["tokens_saved"] += before - after
+            self.metrics["last_saved"] = before - after
+        return result
+
+    def get_logs(self, pre_transform_messages: List[Dict[str, Any]], post_transform_messages: List[Dict[str, Any]]) -> Tuple[str, bool]:
+        """
+        Describe the effect of the last transform.
+
+        Args:
+            pre_transform_messages (List[Dict[str, Any]]): Messages before the transform.
+            post_transform_messages (List[Dict[str, Any]]): Messages after the transform.
+
+        Returns:
+            Tuple[str, bool]: Log message and whether the history was changed.
+        """
+        saved = self.metrics["last_saved"]
+        if saved <= 0:
+            return "No messages were summarized.", False
+        return f"Summarized {len(pre_transform_messages) - len(post_transform_messages) + 1} messages, saving {saved} tokens.", True
+
+    def _pinned_indices(self, messages: List[Dict[str, Any]]) -> set:
+        """Indices of system messages, the newest message, the current turn's tool traffic and the latest message of each pinned speaker."""
+        pinned = {len(messages) - 1} if messages else set()
+        # The current turn's tool exchanges are the run of tool traffic ending the history
+        i = len(messages) - 1
+        while i >= 0 and _is_tool_traffic(messages[i]):
+            pinned.add(i)
+            i -= 1
+        latest: Dict[str, int] = {}
+        for i, message in enumerate(messages):
+            if message.get("role") == "system":
+                pinned.add(i)
+            elif message.get("name") in self.pinned_speakers and not _is_tool_traffic(message):
+                latest[message["name"]] = i
+        pinned |= set(latest.values())
+        # A pinned call keeps its results, and a pinned result keeps its call
+        for unit in self._units(messages):
+            if pinned.intersection(unit):
+                pinned.update(unit)
+        return pinned
+
+    @staticmethod
+    def _units(messages: List[Dict[str, Any]]) -> List[List[int]]:
+        """Group message indices so each tool or function call shares a unit with its results."""
+        units: List[List[int]] = []
+        for i, message in enumerate(messages):
+            if _is_tool_result(message) and units and _is_tool_traffic(messages[units[-1][0]]):
+                units[-1].append(i)
+            else:
+                units.append([i])
+        return units
+
+    def _tokens(self, message: Dict[str, Any]) -> int:
+        """Memoized token count of a message."""
+        return self._memoized(message)[0]
+
+    def _summary(self, message: Dict[str, Any]) -> str:
+        """Memoized summary line of a message."""
+        key = _message_key(message)
+        count, summary = self._memoized(message, key)
+        if summary is None:
+            summary = self.summarizer(message)
+            with self._lock:
+                self._memo[key] = (count, summary)
+        return summary
+
+    def _memoized(self, message: Dict[str, Any], key: Optional[str] = None) -> Tuple[int, Optional[str]]:
+        """Fetch or create the memo entry for a message."""
+        key = key or _message_key(message)
+        with self._lock:
+            entry = self._memo.get(key)
+            if entry is not None:
+                self._memo.move_to_end(key)
+                return entry
+        entry = (self._count([message]), None)
+        with self._lock:
+            self._memo[key] = entry
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return entry
+
+    def _count(self, messages: List[Dict[str, Any]]) -> int:
+        """Count the tokens of a list of messages for the configured model."""
+        return count_token(messages, self.model)
+
+def add_context_window(agent: autogen.ConversableAgent, max_tokens: int, model: str = "gpt-4") -> RollingSummaryTransform:
+    """
+    Attach a token-budgeted rolling-summary window to an agent.
+
+    Args:
+        agent (autogen.ConversableAgent): Agent whose LLM context should be bounded.
+        max_tokens (int): Token budget for the agent's message history.
+        model (str, optional): Model used for token counting. Defaults to "gpt-4".
+
+    Returns:
+        RollingSummaryTransform: The attached transform, whose metrics report tokens saved.
+    """
+    transform = RollingSummaryTransform(max_tokens=max_tokens, model=model)
+    TransformMessages(transforms=[transform]).add_to_agent(agent)
+    return transform
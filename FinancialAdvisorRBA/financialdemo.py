@@ -10,11 +10,18 @@ This module serves as the main entry point for the Financial Advisor AI system,
 setting up the chat environment and managing agent interactions.
 """
 
+import argparse
 import autogen
 import sys
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
+from llama_index.core import VectorStoreIndex
+from .checkpoints import SessionCheckpoint, checkpoint_chat, new_session_id, open_checkpoint
+from .compliance import add_compliance_prescreen, load_rule_engine, open_audit_log
 from .config import load_config
+from .context_window import add_context_window
+from .model_tiers import ModelRouter
+from .profiles import DEFAULT_CUSTOMER_ID
 from .agents import (
     create_advisor_agent,
     create_portfolio_agent,
@@ -23,11 +30,37 @@ from .agents import (
     create_compliance_agent,
     create_user_proxy
 )
+from .retrieval import REGION_KEYWORDS
+from .review import ReviewPanelAgent
+from .risk import ASSET_ASSUMPTIONS, assess_portfolio_risk
+from .scheduler import configure_llm_scheduler, schedule_client
+from .streaming import ConsoleTokenChannel, TokenChannel, stream_replies
+from .tracing import Tracer, instrument_agent, instrument_chat, open_trace_sink, trace_aggregator, trace_speaker_selection
 from .utils import (
-    get_customer_profile,
-    initialize_llama_index,
+    BackgroundIndex,
+    configure_profile_store,
+    customer_profile_tool,
+    start_index_warmup,
     llama_index_query,
-    custom_speaker_selection_func
+    llama_index_batch_query,
+    lookup_market_figures,
+    has_research_tables,
+    custom_speaker_selection_func,
+    speaker_router
+)
+
+MARKET_DATA_FILTERS_DESCRIPTION = (
+    f"Optionally restrict the research used to a region ({', '.join(REGION_KEYWORDS)}; comma-separated) "
+    "and/or a publication period as 'YYYY-MM' or 'YYYY-MM..YYYY-MM'"
+)
+MARKET_DATA_DESCRIPTION = (
+    "A function to get market insights, please input question for market insights. "
+    + MARKET_DATA_FILTERS_DESCRIPTION
+)
+MARKET_DATA_BATCH_DESCRIPTION = (
+    "A function to get market insights for several questions at once (e.g. equities, bonds, rates and FX), "
+    "please input a list of questions; returns one answer per question. Prefer it over repeated "
+    "query_market_data calls. " + MARKET_DATA_FILTERS_DESCRIPTION
 )
 
 # Configure logging
@@ -37,69 +70,229 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def setup_chat_environment() -> Optional[autogen.GroupChatManager]:
+def build_chat_manager(
+    config: Dict[str, Any],
+    index: Union[VectorStoreIndex, BackgroundIndex],
+    user_proxy: Optional[autogen.UserProxyAgent] = None,
+    checkpoint: Optional[SessionCheckpoint] = None,
+    silent: bool = False,
+    token_channel: Optional[TokenChannel] = None,
+    customer_id: str = DEFAULT_CUSTOMER_ID
+) -> autogen.GroupChatManager:
     """
-    Set up the chat environment with all agents.
+    Create the agents and group chat for one advisory session.
     
+    Args:
+        config (Dict[str, Any]): Configuration returned by load_config.
+        index (Union[VectorStoreIndex, BackgroundIndex]): Market research index, shared across sessions.
+            A background handle lets the conversation start before the index is ready.
+        user_proxy (Optional[autogen.UserProxyAgent], optional): Agent representing the client.
+            Defaults to None (an interactive stdin proxy).
+        checkpoint (Optional[SessionCheckpoint], optional): Where each round of the chat is recorded
+            for resuming. Defaults to None (no checkpointing).
+        silent (bool, optional): Do not print the conversation. Defaults to False.
+        token_channel (Optional[TokenChannel], optional): Where agent replies are streamed as they are
+            generated; a ConsoleTokenChannel also replaces the manager's printing of streamed replies.
+            Defaults to None (replies arrive whole).
+        customer_id (str, optional): Customer the session is about; the advisor's profile tool can read
+            only this customer. Defaults to DEFAULT_CUSTOMER_ID.
+        
     Returns:
-        Optional[autogen.GroupChatManager]: Configured group chat manager or None if setup fails.
+        autogen.GroupChatManager: Configured group chat manager.
     """
-    try:
-        # Load configuration
-        config = load_config()
-        if config is None:
-            logger.error("Failed to load configuration")
-            return None
-        
-        # Initialize LlamaIndex
-        index = initialize_llama_index(config["pdf_dir"])
-        if index is None:
-            logger.error("Failed to initialize LlamaIndex")
-            return None
-        
-        # Create agents
-        advisor = create_advisor_agent(config["llm_config"])
-        user_proxy = create_user_proxy()
-        portfolio_agent = create_portfolio_agent(config["llm_config"])
-        market_data_agent = create_market_data_agent(config["llm_config"])
-        compliance_agent = create_compliance_agent(config["llm_config"])
-        risk_assessment_agent = create_risk_assessment_agent(config["llm_config"])
-
-        # Register functions
-        autogen.register_function(
-            get_customer_profile,
-            caller=advisor,
-            executor=user_proxy,
-            description="A function to get the customer profile, please input an empty string",
-        )
+    # Create agents, each on the model tier its role needs
+    scheduler = configure_llm_scheduler(**config["llm_scheduler"]) if config.get("llm_scheduler") else None
+    model_router = ModelRouter(
+        config["llm_config"], config["model_tiers"], config["agent_tiers"],
+        scheduler=scheduler, streaming=token_channel is not None
+    )
+    advisor = create_advisor_agent(model_router.llm_config_for("FinancialAdvisor"))
+    user_proxy = user_proxy or create_user_proxy()
+    portfolio_agent = create_portfolio_agent(model_router.llm_config_for("PortfolioRecommendationAgent"))
+    # The table lookup tool is offered only if the research has tables, since every tool costs prompt tokens
+    table_lookup = has_research_tables(index)
+    market_data_agent = create_market_data_agent(model_router.llm_config_for("MarketDataAgent"), table_lookup)
+    compliance_agent = create_compliance_agent(model_router.llm_config_for("RegulatoryComplianceAgent"))
+    risk_assessment_agent = create_risk_assessment_agent(
+        model_router.llm_config_for("RiskAssessmentAgent"), table_lookup
+    )
+
+    # Bound each agent's prompt with a rolling summary of older turns
+    for agent in (advisor, portfolio_agent, market_data_agent, compliance_agent, risk_assessment_agent):
+        add_context_window(agent, config["context_budgets"][agent.name])
+
+    # Answer clear-cut compliance checks from the rule set without an LLM call
+    add_compliance_prescreen(
+        compliance_agent,
+        load_rule_engine(config["compliance_rules"]),
+        open_audit_log(config["compliance_audit_log"])
+    )
+
+    # Register functions
+    autogen.register_function(
+        customer_profile_tool(customer_id),
+        caller=advisor,
+        executor=user_proxy,
+        name="get_customer_profile",
+        description="A function to get the current customer's profile",
+    )
+
+    def market_filters(region: str, period: str) -> Optional[Dict[str, Any]]:
+        """Build metadata filters from the region and period a tool call names."""
+        filters = {}
+        if region:
+            filters["regions"] = [r.strip().lower().replace(" ", "_") for r in region.split(",") if r.strip()]
+        if period:
+            start, _, end = period.partition("..")
+            start, end = start.strip(), (end or start).strip()
+            # A bare year covers all of its months
+            filters["period"] = (start + "-01" if len(start) == 4 else start, end + "-12" if len(end) == 4 else end)
+        return filters or None
 
-        def query_market_data(query: str) -> str:
-            """Query market data using LlamaIndex."""
-            return llama_index_query(query, index)
+    def query_market_data(query: str, region: str = "", period: str = "") -> str:
+        """Query market data using LlamaIndex, optionally restricted to a region and period."""
+        return llama_index_query(query, index, market_filters(region, period))
 
+    def query_market_data_batch(questions: List[str], region: str = "", period: str = "") -> str:
+        """Answer several market data questions in one tool call."""
+        return llama_index_batch_query(questions, index, market_filters(region, period))
+
+    for executor in (portfolio_agent, risk_assessment_agent):
         autogen.register_function(
             query_market_data,
             caller=market_data_agent,
-            executor=portfolio_agent,
-            description="A function to get market insights, please input question for market insights",
+            executor=executor,
+            description=MARKET_DATA_DESCRIPTION,
         )
-
         autogen.register_function(
-            query_market_data,
+            query_market_data_batch,
             caller=market_data_agent,
-            executor=risk_assessment_agent,
-            description="A function to get market insights, please input question for market insights",
+            executor=executor,
+            description=MARKET_DATA_BATCH_DESCRIPTION,
+        )
+
+    def lookup_figures(query: str) -> str:
+        """Look up exact figures from the research tables."""
+        return lookup_market_figures(query, index)
+
+    table_tool_pairs = (
+        (market_data_agent, portfolio_agent),
+        (market_data_agent, risk_assessment_agent),
+        (risk_assessment_agent, portfolio_agent)
+    )
+    for caller, executor in table_tool_pairs if table_lookup else ():
+        autogen.register_function(
+            lookup_figures,
+            caller=caller,
+            executor=executor,
+            name="lookup_market_figures",
+            description="A function to get exact figures (returns, yields, forecasts) from tables in the market "
+                        "research, please input the index or asset, metric and period, e.g. 'HSI 2025 EPS growth'",
         )
 
-        # Create group chat
-        groupchat = autogen.GroupChat(
-            agents=[user_proxy, advisor, portfolio_agent, market_data_agent, compliance_agent, risk_assessment_agent],
-            messages=[],
-            max_round=30,
-            speaker_selection_method=custom_speaker_selection_func
+    autogen.register_function(
+        assess_portfolio_risk,
+        caller=risk_assessment_agent,
+        executor=portfolio_agent,
+        description="A function to compute expected return, volatility, Sharpe ratio, VaR, max drawdown and stress "
+                    "scenario returns for one or more portfolio allocations given as asset class weights, "
+                    "optionally with expected return, volatility and correlation overrides and a VaR confidence "
+                    f"level. Asset classes: {', '.join(ASSET_ASSUMPTIONS)}",
+    )
+
+    # Record spans for every reply, tool call, speaker selection and index query
+    tracer = None
+    speaker_selection = custom_speaker_selection_func
+    if config.get("trace_log") is not None:
+        tracer = Tracer(
+            open_trace_sink(config["trace_log"]),
+            aggregator=trace_aggregator if config.get("trace_aggregate") else None
         )
+        speaker_selection = trace_speaker_selection(custom_speaker_selection_func, tracer, router=speaker_router)
+
+    # Review a proposal for risk and compliance at the same time, as one turn
+    reviewers = [compliance_agent, risk_assessment_agent]
+    review_panel = None
+    if config.get("review_fanout"):
+        review_panel = ReviewPanelAgent([risk_assessment_agent, compliance_agent], executors=[portfolio_agent])
+        reviewers = [review_panel]
+
+    # Create group chat
+    groupchat = autogen.GroupChat(
+        agents=[user_proxy, advisor, portfolio_agent, market_data_agent, *reviewers],
+        messages=[],
+        max_round=30,
+        speaker_selection_method=speaker_selection
+    )
+    if checkpoint is not None:
+        checkpoint_chat(groupchat, checkpoint)
+
+    # The LLM speaker selection behind routing fallbacks runs on the smallest
+    # model. autogen makes those calls from temporary agents built from this
+    # llm_config, never through manager.client, so they are not tiered,
+    # scheduled or counted in tier metrics.
+    manager = autogen.GroupChatManager(
+        groupchat=groupchat,
+        llm_config=model_router.llm_config_for_tier(model_router.order[0]),
+        silent=silent
+    )
+
+    # Queue requests behind the shared rate limits, and escalate to a larger
+    # tier on long prompts, failures and unusable replies
+    for agent in (advisor, portfolio_agent, market_data_agent, compliance_agent, risk_assessment_agent):
+        if scheduler is not None:
+            schedule_client(agent.client, scheduler)
+        model_router.attach(agent)
+
+    # Stream agent replies as they are generated, deciding the next speaker
+    # as soon as a routing keyword appears
+    if token_channel is not None:
+        for agent in (advisor, portfolio_agent, market_data_agent, compliance_agent, risk_assessment_agent):
+            stream_replies(agent, token_channel, speaker_router)
+        if isinstance(token_channel, ConsoleTokenChannel):
+            token_channel.attach(manager)
+    if tracer is not None:
+        instrument_chat(manager, tracer)
+        for member in review_panel.members if review_panel is not None else ():
+            instrument_agent(member, tracer)
+
+    return manager
+
+def setup_chat_environment(
+    session_id: Optional[str] = None,
+    customer_id: str = DEFAULT_CUSTOMER_ID
+) -> Optional[Tuple[autogen.GroupChatManager, Optional[SessionCheckpoint]]]:
+    """
+    Set up the chat environment with all agents.
+    
+    Args:
+        session_id (Optional[str], optional): Session to checkpoint, or to resume if it has a checkpoint.
+            Defaults to None (no checkpointing).
+        customer_id (str, optional): Customer the session is about. Defaults to DEFAULT_CUSTOMER_ID.
+
+    Returns:
+        Optional[Tuple[autogen.GroupChatManager, Optional[SessionCheckpoint]]]: Configured group chat manager
+        and the session checkpoint, or None if setup fails.
+    """
+    try:
+        # Load configuration
+        config = load_config()
+        if config is None:
+            logger.error("Failed to load configuration")
+            return None
         
-        return autogen.GroupChatManager(groupchat=groupchat, llm_config=config["llm_config"])
+        # Load LlamaIndex in the background so the interview can start right away
+        index = start_index_warmup(config["pdf_dir"], config["index_dir"], config["vector_dtype"])
+        
+        configure_profile_store(config["profile_db"])
+        checkpoint = None
+        if session_id is not None and config.get("checkpoint_dir") is not None:
+            checkpoint = open_checkpoint(config["checkpoint_dir"], session_id)
+        token_channel = ConsoleTokenChannel() if config.get("stream_responses") else None
+        manager = build_chat_manager(
+            config, index, checkpoint=checkpoint, token_channel=token_channel, customer_id=customer_id
+        )
+        return manager, checkpoint
     
     except Exception as e:
         logger.error(f"Error setting up chat environment: {str(e)}")
@@ -110,13 +303,24 @@ def main() -> None:
     Main function to run the financial advisor.
     
     This function initializes the chat environment and starts the conversation
-    with a default investment strategy request.
+    with a default investment strategy request, or resumes an earlier session
+    from its checkpoint.
     """
+    parser = argparse.ArgumentParser(description="Run the Financial Advisor AI")
+    parser.add_argument("--resume", metavar="SESSION_ID", help="Resume a session from its last checkpoint")
+    parser.add_argument(
+        "--customer", default=DEFAULT_CUSTOMER_ID,
+        help="Id of the customer being advised (pass it again with --resume)"
+    )
+    args = parser.parse_args()
+
     try:
-        manager = setup_chat_environment()
-        if manager is None:
+        session_id = args.resume or new_session_id()
+        environment = setup_chat_environment(session_id, args.customer)
+        if environment is None:
             logger.error("Failed to set up chat environment")
             sys.exit(1)
+        manager, checkpoint = environment
             
         user_proxy = next(
             (agent for agent in manager.groupchat.agents if agent.name == "user"),
@@ -125,11 +329,28 @@ def main() -> None:
         if user_proxy is None:
             logger.error("User proxy agent not found in group chat")
             sys.exit(1)
-            
-        user_proxy.initiate_chat(
-            manager,
-            message="I want to review my portfolio and make new investment strategy for 2025"
-        )
+
+        if args.resume:
+            if checkpoint is None or not checkpoint.messages:
+                logger.error(f"No checkpoint found for session {session_id}")
+                sys.exit(1)
+            if checkpoint.finished:
+                logger.error(f"Session {session_id} has already finished")
+                sys.exit(1)
+            logger.info(f"Resuming session {session_id} at round {len(checkpoint.messages)}")
+            if checkpoint.pending_approval is not None:
+                logger.info(f"Awaiting client approval requested by {checkpoint.pending_approval['agent']}")
+            last_agent, last_message = manager.resume(messages=checkpoint.messages)
+            last_agent.initiate_chat(manager, message=last_message, clear_history=False)
+        else:
+            logger.info(f"Session {session_id} (resume with --resume {session_id})")
+            user_proxy.initiate_chat(
+                manager,
+                message="I want to review my portfolio and make new investment strategy for 2025"
+            )
+        if checkpoint is not None:
+            checkpoint.finish()
+            checkpoint.close()
         
     except Exception as e:
         logger.error(f"Error running Financial Advisor AI: {str(e)}")
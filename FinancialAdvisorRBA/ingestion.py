@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Parallel, streaming document ingestion for the market research index."""
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from llama_index.core import Settings, SimpleDirectoryReader, VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from .retrieval import METADATA_KEYS, KeywordIndex, detect_regions, extract_document_metadata
+from .tables import TableStore, candidate_pages, extract_tables
+
+logger = logging.getLogger(__name__)
+
+# Chunk batches each parser process may have queued ahead of embedding
+QUEUED_BATCHES_PER_WORKER = 2
+
+# How often the main process checks for parser processes that died, in seconds
+_WORKER_POLL_SECONDS = 1.0
+
+# How long a closed ingestion keeps draining the queue for late messages, in seconds
+_DRAIN_SECONDS = 0.2
+
+# Queue a parser process streams its messages back on, set by _init_worker
+_RESULTS: Optional["multiprocessing.Queue"] = None
+
+def _init_worker(results: "multiprocessing.Queue") -> None:
+    """Give a parser process the queue it streams chunks back on."""
+    global _RESULTS
+    _RESULTS = results
+
+def _parse_file(path: str, chunk_size: int, chunk_overlap: int, batch_size: int) -> None:
+    """
+    Parse and chunk a single file, tagging it with filterable metadata and
+    extracting its numeric tables. Runs inside a worker process.
+
+    Chunks are sent back on the results queue in batches of batch_size as
+    each page is split, so neither process holds all of a large file's
+    chunks at once. The messages for a file are ("start", path, info) with
+    its doc ids and metadata, any number of ("nodes", path, batch), then
+    ("done", path, info) with its tables, parse time and error message (None
+    on success). A file that fails before "start" only sends "done".
+
+    Args:
+        path (str): File to parse.
+        chunk_size (int): Target chunk size in tokens.
+        chunk_overlap (int): Overlap between consecutive chunks in tokens.
+        batch_size (int): Number of chunks per "nodes" message.
+    """
+    start = time.perf_counter()
+    tables, error = [], None
+    try:
+        documents = SimpleDirectoryReader(input_files=[path], raise_on_error=True).load_data()
+        metadata = extract_document_metadata(Path(path), [document.text for document in documents])
+        for document in documents:
+            document.metadata.update(metadata)
+            document.excluded_embed_metadata_keys.extend(METADATA_KEYS)
+            document.excluded_llm_metadata_keys.extend(METADATA_KEYS)
+        _RESULTS.put(("start", path, {"doc_ids": [document.doc_id for document in documents], "metadata": metadata}))
+
+        splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        batch: List[BaseNode] = []
+        for document in documents:
+            for node in splitter.get_nodes_from_documents([document]):
+                # Tag each chunk with the regions it mentions, falling back to the document's
+                node.metadata["regions"] = detect_regions(node.get_content()) or metadata["regions"]
+                batch.append(node)
+                if len(batch) >= batch_size:
+                    _RESULTS.put(("nodes", path, batch))
+                    batch = []
+        if batch:
+            _RESULTS.put(("nodes", path, batch))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    if error is None:
+        # Tables are a bonus; a file whose layout cannot be read is still indexed as text
+        try:
+            if len(documents) > 1:
+                tables = extract_tables(Path(path), candidate_pages([document.text for document in documents]))
+            else:
+                tables = extract_tables(Path(path))
+        except Exception as e:
+            logger.warning("Could not extract tables from %s: %s", path, e)
+    _RESULTS.put(("done", path, {"tables": tables, "parse_seconds": time.perf_counter() - start, "error": error}))
+
+def _embed_and_insert(
+    nodes: List[BaseNode],
+    index: VectorStoreIndex,
+    keyword_index: Optional[KeywordIndex] = None
+) -> None:
+    """
+    Embed a batch of chunks in one request and insert them into the index.
+
+    Args:
+        nodes (List[BaseNode]): Chunks of one file.
+        index (VectorStoreIndex): Index receiving the nodes.
+        keyword_index (Optional[KeywordIndex], optional): Keyword index kept in step with the index. Defaults to None.
+    """
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    for node, embedding in zip(nodes, Settings.embed_model.get_text_embedding_batch(texts)):
+        node.embedding = embedding
+    index.insert_nodes(nodes)
+    if keyword_index is not None:
+        keyword_index.add_nodes(nodes)
+
+def _remove_docs(doc_ids: List[str], index: VectorStoreIndex, keyword_index: Optional[KeywordIndex] = None) -> None:
+    """Remove a file's documents again, so the index never holds half a document."""
+    for doc_id in doc_ids:
+        index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        if keyword_index is not None:
+            keyword_index.remove_ref_doc(doc_id)
+
+def ingest_files(
+    paths: List[Path],
+    index: VectorStoreIndex,
+    max_workers: Optional[int] = None,
+    embed_batch_size: int = 64,
+    keyword_index: Optional[KeywordIndex] = None,
+    table_store: Optional[TableStore] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Parse files in a process pool and stream their chunks into the index.
+
+    At most two files per worker are in flight at any time. Workers send
+    each file's chunks back in batches of embed_batch_size while they are
+    still parsing it, and the queue between them holds only a few batches
+    per worker, so memory stays flat no matter how large a file or the
+    corpus is. If a file fails part-way, its chunks already inserted are
+    removed again. Unparsable files are reported and skipped rather than
+    aborting ingestion. If the caller stops iterating early, queued files
+    are cancelled and files not yet reported are removed again.
+
+    Parser processes are started with forkserver (spawn where it is not
+    available), never fork: ingestion runs on the warm-up thread while
+    other threads hold locks and open HTTP clients, which a forked child
+    would inherit in an unusable state.
+
+    Args:
+        paths (List[Path]): Files to ingest.
+        index (VectorStoreIndex): Index receiving the nodes.
+        max_workers (Optional[int], optional): Parser processes. Defaults to None (CPU count).
+        embed_batch_size (int, optional): Number of nodes embedded per request. Defaults to 64.
+        keyword_index (Optional[KeywordIndex], optional): Keyword index kept in step with the index. Defaults to None.
+        table_store (Optional[TableStore], optional): Store receiving extracted tables. Defaults to None.
+
+    Yields:
+        Dict[str, Any]: Per-file report with file name, doc ids, document metadata, node and table counts,
+        parse/embed timings and error message (None on success).
+    """
+    if not paths:
+        return
+
+    max_workers = max_workers or min(len(paths), os.cpu_count() or 1)
+    max_in_flight = max_workers * 2
+    chunk_size, chunk_overlap = Settings.chunk_size, Settings.chunk_overlap
+    remaining = iter(paths)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # The server process imports the parsers once; each worker forks from it single-threaded
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    results = context.Queue(maxsize=max_workers * QUEUED_BATCHES_PER_WORKER)
+    futures: Dict[str, Future] = {}
+    reports: Dict[str, Dict[str, Any]] = {}
+
+    def report_for(path: str) -> Dict[str, Any]:
+        if path not in reports:
+            reports[path] = {
+                "file": Path(path).name, "doc_ids": [], "metadata": {}, "nodes": 0, "tables": 0,
+                "parse_seconds": 0.0, "embed_seconds": 0.0, "error": None
+            }
+        return reports[path]
+
+    def finish(path: str, tables: List[Dict[str, Any]]) -> Dict[str, Any]:
+        futures.pop(path, None)
+        report = reports.pop(path)
+        if report["error"] is None:
+            if table_store is not None:
+                table_store.add(report["file"], tables)
+            report["tables"] = len(tables)
+            logger.info(
+                "Ingested %s: %d chunks, %d tables, parse %.2fs, embed %.2fs",
+                report["file"], report["nodes"], report["tables"], report["parse_seconds"], report["embed_seconds"]
+            )
+        else:
+            _remove_docs(report["doc_ids"], index, keyword_index)
+            report["doc_ids"] = []
+            logger.warning("Skipped %s: %s", report["file"], report["error"])
+        return report
+
+    pool = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=context, initializer=_init_worker, initargs=(results,)
+    )
+
+    def submit_next() -> None:
+        path = next(remaining, None)
+        if path is not None:
+            futures[str(path)] = pool.submit(_parse_file, str(path), chunk_size, chunk_overlap, embed_batch_size)
+
+    try:
+        for _ in range(max_in_flight):
+            submit_next()
+
+        while futures:
+            try:
+                kind, path, payload = results.get(timeout=_WORKER_POLL_SECONDS)
+            except queue.Empty:
+                # A worker that died mid-file never sends "done"
+                for path, future in list(futures.items()):
+                    if future.done() and future.exception() is not None:
+                        report_for(path)["error"] = f"{type(future.exception()).__name__}: {future.exception()}"
+                        yield finish(path, [])
+                        submit_next()
+                continue
+            if path not in futures:
+                continue
+            report = report_for(path)
+            if kind == "start":
+                report.update(payload)
+            elif kind == "nodes":
+                if report["error"] is not None:
+                    continue
+                start = time.perf_counter()
+                try:
+                    _embed_and_insert(payload, index, keyword_index)
+                    report["nodes"] += len(payload)
+                except Exception as e:
+                    report["error"] = f"{type(e).__name__}: {e}"
+                report["embed_seconds"] += time.perf_counter() - start
+            else:
+                report["parse_seconds"] = payload["parse_seconds"]
+                report["error"] = report["error"] or payload["error"]
+                yield finish(path, payload["tables"])
+                submit_next()
+    finally:
+        # Closed early: workers may be blocked putting into the full queue,
+        # so keep draining it until they finish or the pool never shuts down
+        for future in futures.values():
+            future.cancel()
+        while not all(future.done() for future in futures.values()):
+            try:
+                results.get(timeout=_DRAIN_SECONDS)
+            except queue.Empty:
+                pass
+        while futures:
+            try:
+                results.get(timeout=_DRAIN_SECONDS)
+            except queue.Empty:
+                break
+        for path in list(reports):
+            _remove_docs(reports.pop(path)["doc_ids"], index, keyword_index)
+        pool.shutdown(wait=True)
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tiered model routing for the advisory agents.
+
+Each agent is assigned a model tier in config (cheapest first). Turns that
+do not need the largest model - short advisor follow-ups, market data
+summaries - run on a small model, and a turn moves up
+to the next tier when its prompt is larger than its tier allows, when the
+call fails, or when the reply looks unreliable (truncated, empty, or a
+tool call whose arguments are not valid JSON). Latency, tokens, cost and
+escalations are recorded per tier in tier_metrics.
+"""
+
+import copy
+import functools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import autogen
+from autogen.token_count_utils import count_token
+
+from .scheduler import LLMScheduler, schedule_client
+from .streaming import use_streaming_client
+from .tracing import _percentile, trace_span
+
+def _with_model(llm_config: Dict[str, Any], model: str, scheduled: bool = False) -> Dict[str, Any]:
+    """
+    Copy an llm_config with every config_list entry pointed at a model.
+
+    Clients whose requests go through an LLMScheduler get max_retries 0,
+    since the scheduler's backoff replaces the OpenAI client's own retries.
+    """
+    llm_config = copy.deepcopy(llm_config)
+    for entry in llm_config["config_list"]:
+        entry["model"] = model
+        if scheduled:
+            entry["max_retries"] = 0
+    return llm_config
+
+def low_confidence_reason(response: Any) -> Optional[str]:
+    """
+    Check a completion for signs that a larger model should retry the turn.
+
+    Args:
+        response (Any): Completion returned by OpenAIWrapper.create.
+
+    Returns:
+        Optional[str]: "truncated", "empty" or "malformed_tool_call", or None if the reply looks usable.
+    """
+    for choice in getattr(response, "choices", None) or []:
+        if choice.finish_reason == "length":
+            return "truncated"
+        message = choice.message
+        tool_calls = getattr(message, "tool_calls", None) or []
+        for call in tool_calls:
+            try:
+                json.loads(call.function.arguments or "{}")
+            except ValueError:
+                return "malformed_tool_call"
+        if not tool_calls and not getattr(message, "function_call", None) and not (message.content or "").strip():
+            return "empty"
+    return None
+
+class TierMetrics:
+    """In-process latency, token, cost and escalation statistics per model tier."""
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = {}
+        self._totals: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        tier: str,
+        model: str,
+        duration_ms: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        cost: float = 0.0,
+        escalation: Optional[str] = None
+    ) -> None:
+        """
+        Record one call on a tier.
+
+        Args:
+            tier (str): Tier the call ran on.
+            model (str): Model the tier maps to.
+            duration_ms (float): Call latency in milliseconds.
+            prompt_tokens (int, optional): Prompt tokens used. Defaults to 0.
+            completion_tokens (int, optional): Completion tokens used. Defaults to 0.
+            cost (float, optional): Cost in USD. Defaults to 0.0.
+            escalation (Optional[str], optional): Why the turn was passed up to the next tier
+                after this call, if it was. Defaults to None.
+        """
+        with self._lock:
+            self._durations.setdefault(tier, []).append(duration_ms)
+            totals = self._totals.setdefault(tier, {
+                "model": model, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "escalations": Counter()
+            })
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost_usd"] += cost
+            if escalation is not None:
+                totals["escalations"][escalation] += 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-tier statistics.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Per tier, the model, call count, p50/p95/total latency in
+            milliseconds, token totals, cost in USD and escalations away from the tier by reason.
+        """
+        with self._lock:
+            return {
+                tier: {
+                    "model": self._totals[tier]["model"],
+                    "calls": len(durations),
+                    "p50_ms": round(_percentile(durations, 0.50), 3),
+                    "p95_ms": round(_percentile(durations, 0.95), 3),
+                    "total_ms": round(sum(durations), 3),
+                    "prompt_tokens": self._totals[tier]["prompt_tokens"],
+                    "completion_tokens": self._totals[tier]["completion_tokens"],
+                    "cost_usd": round(self._totals[tier]["cost_usd"], 6),
+                    "escalations": dict(self._totals[tier]["escalations"])
+                }
+                for tier, durations in self._durations.items()
+            }
+
+    def reset(self) -> None:
+        """Forget all recorded calls."""
+        with self._lock:
+            self._durations.clear()
+            self._totals.clear()
+
+# Process-wide tier statistics, fed by every ModelRouter
+tier_metrics = TierMetrics()
+
+class ModelRouter:
+    """
+    Picks a model tier for each LLM call from the agent's role and the prompt size.
+
+    Agents are created with the llm_config of their assigned tier, so their
+    own client serves the common case; the router only steps in to send a
+    turn to a larger tier, through clients it creates on first use.
+    """
+
+    def __init__(
+        self,
+        llm_config: Dict[str, Any],
+        tiers: Dict[str, Dict[str, Any]],
+        agent_tiers: Dict[str, str],
+        metrics: Optional[TierMetrics] = tier_metrics,
+        token_model: str = "gpt-4",
+        scheduler: Optional[LLMScheduler] = None,
+        streaming: bool = False
+    ):
+        """
+        Args:
+            llm_config (Dict[str, Any]): Base LLM configuration (credentials, endpoint, caching).
+            tiers (Dict[str, Dict[str, Any]]): Tiers from cheapest to largest, each with a "model",
+                "prompt_price" and "completion_price" in USD per 1K tokens, and optionally
+                "max_prompt_tokens" above which a prompt goes to the next tier.
+            agent_tiers (Dict[str, str]): Tier for each agent name; unlisted agents use the largest tier.
+            metrics (Optional[TierMetrics], optional): Statistics to update. Defaults to tier_metrics.
+            token_model (str, optional): Model used for counting prompt tokens. Defaults to "gpt-4".
+            scheduler (Optional[LLMScheduler], optional): Scheduler for the escalation clients' requests.
+                Defaults to None.
+            streaming (bool, optional): Let the escalation clients stream turns whose agents stream
+                their replies (see streaming.stream_replies). Defaults to False.
+
+        Raises:
+            ValueError: If no tiers are given or an agent is assigned an unknown tier.
+        """
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        unknown = set(agent_tiers.values()) - set(tiers)
+        if unknown:
+            raise ValueError(f"Unknown model tiers: {', '.join(sorted(unknown))}")
+        self.llm_config = llm_config
+        self.tiers = tiers
+        self.order = list(tiers)
+        self.agent_tiers = agent_tiers
+        self.metrics = metrics
+        self.token_model = token_model
+        self.scheduler = scheduler
+        self.streaming = streaming
+        self._clients: Dict[Tuple[str, str], autogen.OpenAIWrapper] = {}
+        self._lock = threading.Lock()
+
+    def tier_for(self, agent_name: Optional[str]) -> str:
+        """Get the tier assigned to an agent."""
+        return self.agent_tiers.get(agent_name, self.order[-1])
+
+    def llm_config_for(self, agent_name: str) -> Dict[str, Any]:
+        """
+        Get the llm_config an agent should be created with.
+
+        Args:
+            agent_name (str): Agent name.
+
+        Returns:
+            Dict[str, Any]: Copy of the base llm_config using the model of the agent's tier.
+        """
+        return self.llm_config_for_tier(self.tier_for(agent_name))
+
+    def llm_config_for_tier(self, tier: str) -> Dict[str, Any]:
+        """
+        Get an llm_config for a tier's model, for LLM users that cannot be attached.
+
+        Args:
+            tier (str): Tier name.
+
+        Returns:
+            Dict[str, Any]: Copy of the base llm_config using the tier's model.
+        """
+        return _with_model(self.llm_config, self.tiers[tier]["model"], self.scheduler is not None)
+
+    def select(self, agent_name: Optional[str], messages: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """
+        Pick the tier for a call.
+
+        Args:
+            agent_name (Optional[str]): Name of the calling agent.
+            messages (List[Dict[str, Any]]): Prompt messages.
+
+        Returns:
+            Tuple[str, str]: The tier and why it was chosen ("role" or "prompt_size").
+        """
+        tier, reason = self.tier_for(agent_name), "role"
+        position = self.order.index(tier)
+        tokens = None
+        while position < len(self.order) - 1:
+            limit = self.tiers[tier].get("max_prompt_tokens")
+            if limit is None:
+                break
+            if tokens is None:
+                tokens = count_token(messages, self.token_model)
+            if tokens <= limit:
+                break
+            position += 1
+            tier, reason = self.order[position], "prompt_size"
+        return tier, reason
+
+    def cost(self, tier: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Cost of a call on a tier in USD."""
+        spec = self.tiers[tier]
+        return (prompt_tokens * spec.get("prompt_price", 0.0) + completion_tokens * spec.get("completion_price", 0.0)) / 1000
+
+    def _client(self, agent: autogen.ConversableAgent, tier: str) -> autogen.OpenAIWrapper:
+        """Get the client that runs an agent's calls on another tier, keeping its tools."""
+        key = (json.dumps(agent.llm_config, sort_keys=True, default=str), tier)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = autogen.OpenAIWrapper(
+                    **_with_model(agent.llm_config, self.tiers[tier]["model"], self.scheduler is not None)
+                )
+                if self.scheduler is not None:
+                    schedule_client(client, self.scheduler)
+                if self.streaming:
+                    use_streaming_client(client)
+                self._clients[key] = client
+            return client
+
+    def attach(self, agent: autogen.ConversableAgent) -> None:
+        """
+        Route an agent's LLM calls across tiers. Safe to call repeatedly.
+
+        Call after registering the agent's tools, since registration replaces its client.
+
+        Args:
+            agent (autogen.ConversableAgent): Agent created with llm_config_for(agent.name).
+        """
+        client = getattr(agent, "client", None)
+        if client is None or getattr(client, "_routed", False):
+            return
+        create = client.create
+
+        @functools.wraps(create)
+        def routed_create(**config):
+            caller = config.get("agent") or agent
+            home = self.tier_for(caller.name)
+            tier, reason = self.select(caller.name, config.get("messages") or [])
+            while True:
+                last = tier == self.order[-1]
+                model = self.tiers[tier]["model"]
+                start = time.perf_counter()
+                with trace_span("model_tier", tier, model=model, reason=reason) as span:
+                    try:
+                        if tier == home:
+                            response = create(**config)
+                        else:
+                            response = self._client(caller, tier).create(**config)
+                    except Exception as e:
+                        if last:
+                            raise
+                        response, escalation = None, "error"
+                        if span is not None:
+                            span.set(error=f"{type(e).__name__}: {e}")
+                    else:
+                        escalation = None if last else low_confidence_reason(response)
+                    if span is not None and escalation is not None:
+                        span.set(escalation=escalation)
+                usage = getattr(response, "usage", None)
+                prompt_tokens = (usage.prompt_tokens or 0) if usage is not None else 0
+                completion_tokens = (usage.completion_tokens or 0) if usage is not None else 0
+                if self.metrics is not None:
+                    self.metrics.record(
+                        tier, model, (time.perf_counter() - start) * 1000, prompt_tokens, completion_tokens,
+                        self.cost(tier, prompt_tokens, completion_tokens), escalation
+                    )
+                if escalation is None:
+                    return response
+                tier, reason = self.order[self.order.index(tier) + 1], "escalation"
+
+        client.create = routed_create
+        client._routed = True
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Customer Profile Store
+----------------------
+SQLite-backed customer financial profiles with indexed lookups by customer
+id or name, per-thread pooled connections and an in-process LRU cache for
+hot profiles. Only found profiles are cached, so a customer imported after a
+failed lookup is served on the next request.
+
+Bulk import a CSV of customers with:
+
+    python -m FinancialAdvisorRBA.profiles customers.csv
+
+The CSV needs customer_id, name, currency, monthly_income and
+monthly_expense columns; every column prefixed with "asset_" (for example
+asset_saving or asset_Bitcoin) becomes an asset holding.
+"""
+
+import argparse
+import csv
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_DB_PATH = Path(__file__).parent / "customers.db"
+DEFAULT_CUSTOMER_ID = "DEMO"
+
+# Profile served when the agent asks for the current customer without naming them
+DEMO_PROFILE: Dict[str, Any] = {
+    "customer_id": DEFAULT_CUSTOMER_ID,
+    "name": "Demo Customer",
+    "currency": "HKD",
+    "monthly_income": 50000.0,
+    "monthly_expense": 20000.0,
+    "asset": {
+        "saving": 100000.0,
+        "fixed_income": 100000.0,
+        "high_risk_stock": 500000.0,
+        "Bitcoin": 100000.0
+    }
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    monthly_income REAL NOT NULL,
+    monthly_expense REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_customers_name_key ON customers (name_key);
+CREATE TABLE IF NOT EXISTS assets (
+    customer_id TEXT NOT NULL,
+    asset_type TEXT NOT NULL,
+    amount REAL NOT NULL,
+    PRIMARY KEY (customer_id, asset_type)
+) WITHOUT ROWID;
+"""
+
+ASSET_PREFIX = "asset_"
+
+class AmbiguousCustomerError(LookupError):
+    """Raised when a name lookup matches more than one customer."""
+
+def _name_key(name: str) -> str:
+    """Case- and whitespace-insensitive lookup key for a customer name."""
+    return " ".join(name.lower().split())
+
+class ProfileStore:
+    """SQLite customer profile store with pooled connections and an LRU cache."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH, cache_size: int = 1024):
+        """
+        Args:
+            db_path (Path, optional): SQLite database file. Defaults to DEFAULT_DB_PATH.
+            cache_size (int, optional): Number of profiles kept in the in-process cache. Defaults to 1024.
+        """
+        self.db_path = Path(db_path)
+        self.cache_size = cache_size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._connections: List[sqlite3.Connection] = []
+        self._generation = 0
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+        if self._load_profile(DEFAULT_CUSTOMER_ID) is None:
+            self.upsert_profiles([DEMO_PROFILE])
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use or after close()."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.generation != self._generation:
+            # check_same_thread is off only so close() can release every
+            # thread's connection; each connection is still used by one thread
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                self._connections.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+        return conn
+
+    def get_profile(self, customer: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a profile by customer id or name.
+
+        Args:
+            customer (str): Customer id, or the customer's name.
+
+        Returns:
+            Optional[Dict[str, Any]]: The profile, or None if the customer is unknown.
+
+        Raises:
+            AmbiguousCustomerError: If customer is a name shared by several customers.
+        """
+        with self._lock:
+            profile = self._cache.get(customer)
+            if profile is not None:
+                self._cache.move_to_end(customer)
+                return profile
+        profile = self._load_profile(customer)
+        if profile is not None:
+            with self._lock:
+                self._cache[customer] = profile
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return profile
+
+    def clear_cache(self) -> None:
+        """Drop all cached profiles."""
+        with self._lock:
+            self._cache.clear()
+
+    def _load_profile(self, customer: str) -> Optional[Dict[str, Any]]:
+        """Read a profile by customer id, falling back to a name that matches exactly one customer."""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT customer_id, name, currency, monthly_income, monthly_expense FROM customers WHERE customer_id = ?",
+            (customer,)
+        ).fetchone()
+        if row is None:
+            rows = conn.execute(
+                "SELECT customer_id, name, currency, monthly_income, monthly_expense FROM customers WHERE name_key = ?",
+                (_name_key(customer),)
+            ).fetchall()
+            if len(rows) > 1:
+                raise AmbiguousCustomerError(f"{len(rows)} customers are named '{customer}'")
+            row = rows[0] if rows else None
+        if row is None:
+            return None
+
+        customer_id, name, currency, income, expense = row
+        assets = conn.execute(
+            "SELECT asset_type, amount FROM assets WHERE customer_id = ?",
+            (customer_id,)
+        ).fetchall()
+        return {
+            "customer_id": customer_id,
+            "name": name,
+            "currency": currency,
+            "monthly_income": income,
+            "monthly_expense": expense,
+            "asset": dict(assets)
+        }
+
+    def upsert_profiles(self, profiles: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace profiles.
+
+        Args:
+            profiles (List[Dict[str, Any]]): Profiles in the format returned by get_profile.
+        """
+        self._write_batch([
+            (
+                (p["customer_id"], p["name"], _name_key(p["name"]), p["currency"],
+                 float(p["monthly_income"]), float(p["monthly_expense"])),
+                [(p["customer_id"], asset, float(amount)) for asset, amount in p["asset"].items()]
+            )
+            for p in profiles
+        ])
+
+    def import_csv(self, csv_path: Path, batch_size: int = 10000) -> int:
+        """
+        Bulk import customers from a CSV file in a single transaction.
+
+        Rows are streamed and written in batches, so files with hundreds of
+        thousands of customers import without loading them into memory.
+
+        Args:
+            csv_path (Path): CSV file to import.
+            batch_size (int, optional): Rows written per executemany call. Defaults to 10000.
+
+        Returns:
+            int: Number of customers imported.
+        """
+        count = 0
+        conn = self._connection()
+        with open(csv_path, newline="", encoding="utf-8") as f, conn:
+            batch = []
+            for row in self._csv_rows(csv.DictReader(f)):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._write_batch(batch, commit=False)
+                    count += len(batch)
+                    batch = []
+            self._write_batch(batch, commit=False)
+            count += len(batch)
+        self.clear_cache()
+        return count
+
+    def _csv_rows(self, reader: csv.DictReader) -> Iterator[Tuple[tuple, List[tuple]]]:
+        """Convert CSV rows into customer and asset rows."""
+        asset_columns = [col for col in reader.fieldnames or [] if col.startswith(ASSET_PREFIX)]
+        for row in reader:
+            customer_id = row["customer_id"]
+            yield (
+                (customer_id, row["name"], _name_key(row["name"]), row.get("currency") or "HKD",
+                 float(row["monthly_income"] or 0), float(row["monthly_expense"] or 0)),
+                [
+                    (customer_id, col[len(ASSET_PREFIX):], float(row[col]))
+                    for col in asset_columns if row[col] not in (None, "")
+                ]
+            )
+
+    def _write_batch(self, batch: List[Tuple[tuple, List[tuple]]], commit: bool = True) -> None:
+        """Write customer and asset rows, replacing existing holdings."""
+        if not batch:
+            return
+        conn = self._connection()
+        conn.executemany("INSERT OR REPLACE INTO customers VALUES (?, ?, ?, ?, ?, ?)", [c for c, _ in batch])
+        conn.executemany("DELETE FROM assets WHERE customer_id = ?", [(c[0],) for c, _ in batch])
+        conn.executemany("INSERT INTO assets VALUES (?, ?, ?)", [a for _, assets in batch for a in assets])
+        if commit:
+            conn.commit()
+            self.clear_cache()
+
+    def close(self) -> None:
+        """
+        Close the connections of every thread that used the store.
+
+        Call this once no lookup is in flight; a later lookup opens a fresh
+        connection.
+        """
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+            self._cache.clear()
+        for conn in connections:
+            conn.close()
+
+def main() -> None:
+    """Import a customer CSV into the profile store."""
+    parser = argparse.ArgumentParser(description="Bulk import customer profiles from CSV")
+    parser.add_argument("csv_path", type=Path, help="CSV file of customers")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="SQLite database file")
+    args = parser.parse_args()
+    store = ProfileStore(args.db)
+    try:
+        count = store.import_csv(args.csv_path)
+    finally:
+        store.close()
+    print(f"Imported {count} customers into {args.db}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Bounded answer cache for market data queries with exact and semantic matching."""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .retrieval import infer_filters
+
+Embedding = List[float]
+# Regions, period, figures and tickers a query names; see query_signature
+Signature = Tuple[Tuple[str, ...], Optional[Tuple[str, str]], FrozenSet[str], FrozenSet[str]]
+
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_TICKER = re.compile(r"\b[A-Z][A-Z0-9&.]{1,9}\b")
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a query for exact-match lookups.
+
+    Args:
+        query (str): Natural language question.
+
+    Returns:
+        str: Lower-cased query with collapsed whitespace and trailing punctuation removed.
+    """
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+def _scoped_key(query: str, scope: str) -> str:
+    """Cache key of a query within a scope; unscoped keys are the normalized query."""
+    return f"{scope}\x00{normalize_query(query)}" if scope else normalize_query(query)
+
+def query_signature(query: str) -> Signature:
+    """
+    Extract what must match exactly for two queries to share an answer.
+
+    Embeddings of "RBA outlook 2024" and "RBA outlook 2025" are nearly
+    identical, so a semantic hit also requires the same inferred regions
+    and period, numbers (years, quarters, figures) and upper-case tickers.
+
+    Args:
+        query (str): Natural language question.
+
+    Returns:
+        Signature: Regions, period, numbers and tickers named in the query.
+    """
+    filters = infer_filters(query)
+    return (
+        tuple(sorted(filters.get("regions", []))),
+        filters.get("period"),
+        frozenset(_NUMBER.findall(query)),
+        frozenset(_TICKER.findall(query))
+    )
+
+class SemanticQueryCache:
+    """
+    LRU + TTL cache of query answers.
+
+    Lookups first try the normalized query text, then fall back to the
+    most similar cached query embedding above a similarity threshold among
+    entries with the same scope and query_signature. Embeddings are kept
+    normalized in a NumPy matrix, so the similarity search is one
+    matrix-vector product, done outside the lock. The cache is tied to an
+    index version and clears itself when the version moves on, so answers
+    never outlive the documents behind them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95,
+        embed_fn: Optional[Callable[[str], Embedding]] = None
+    ):
+        """
+        Args:
+            max_entries (int, optional): Maximum number of cached answers. Defaults to 256.
+            ttl_seconds (float, optional): Lifetime of an entry in seconds. Defaults to 3600.
+            similarity_threshold (float, optional): Minimum cosine similarity for a semantic hit. Defaults to 0.95.
+            embed_fn (Optional[Callable[[str], Embedding]], optional): Query embedding function. Defaults to None (exact matching only).
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self.version: Any = None
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str, Optional[Embedding]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One matrix row per entry with an embedding; rows are tagged with
+        # the entry's key and (scope, signature) and reused once freed
+        self._matrix: Optional[np.ndarray] = None
+        self._rows: Dict[str, int] = {}
+        self._row_keys: List[Optional[str]] = [None] * max_entries
+        self._row_tags: List[Optional[Tuple[str, Signature]]] = [None] * max_entries
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+
+    def bind_version(self, version: Any) -> None:
+        """
+        Associate the cache with an index version, clearing it on change.
+
+        Args:
+            version (Any): Current version of the underlying index.
+        """
+        with self._lock:
+            if version != self.version:
+                self._clear()
+                self.version = version
+
+    def lookup(
+        self,
+        query: str,
+        scope: str = "",
+        embedding: Optional[Embedding] = None
+    ) -> Tuple[Optional[str], Optional[Embedding]]:
+        """
+        Look up a cached answer for a query.
+
+        Args:
+            query (str): Natural language question.
+            scope (str, optional): Partition of the cache to search, e.g. the query's filters;
+                answers only match queries with the same scope. Defaults to "".
+            embedding (Optional[Embedding], optional): Query embedding computed by the caller, used
+                instead of embed_fn for semantic matching. Defaults to None.
+
+        Returns:
+            Tuple[Optional[str], Optional[Embedding]]: The cached answer (or None on a miss)
+            and the query embedding if one was computed, so callers can reuse it for retrieval.
+        """
+        key = _scoped_key(query, scope)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], entry[2]
+
+        if embedding is None and self.embed_fn is None:
+            with self._lock:
+                self.misses += 1
+            return None, None
+
+        if embedding is None:
+            embedding = self.embed_fn(query)
+        tag = (scope, query_signature(query))
+        with self._lock:
+            matrix = self._matrix
+            rows = [row for row, row_tag in enumerate(self._row_tags) if row_tag == tag]
+            candidates = [(self._row_keys[row], row) for row in rows]
+
+        ranked: List[Tuple[str, int]] = []
+        if rows and matrix is not None and len(embedding) == matrix.shape[1]:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                scores = matrix[rows] @ (vector / norm)
+                ranked = [candidates[i] for i in np.argsort(-scores) if scores[i] >= self.similarity_threshold]
+
+        with self._lock:
+            # Rows may have been evicted or reused while the lock was released
+            for cached_key, row in ranked:
+                if self._rows.get(cached_key) == row and cached_key in self._entries:
+                    self._entries.move_to_end(cached_key)
+                    self.hits += 1
+                    self.semantic_hits += 1
+                    return self._entries[cached_key][1], embedding
+            self.misses += 1
+        return None, embedding
+
+    def store(
+        self,
+        query: str,
+        answer: str,
+        embedding: Optional[Embedding] = None,
+        scope: str = "",
+        version: Any = None
+    ) -> None:
+        """
+        Cache the answer to a query.
+
+        Args:
+            query (str): Natural language question.
+            answer (str): Answer to cache.
+            embedding (Optional[Embedding], optional): Query embedding for semantic matching. Defaults to None.
+            scope (str, optional): Partition of the cache the answer belongs to. Defaults to "".
+            version (Any, optional): Index version the answer was computed from, as bound when it was
+                looked up. The answer is dropped if the cache has since moved to another version.
+                Defaults to None (store unconditionally).
+        """
+        key = _scoped_key(query, scope)
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._remove(key)
+            while self._entries and len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, answer, embedding)
+            if embedding is not None:
+                self._add_row(key, embedding, (scope, query_signature(query)))
+
+    def clear(self) -> None:
+        """Drop all cached answers."""
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dict[str, Any]: Hit, semantic hit and miss counts, hit rate and current size.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self._entries)
+            }
+
+    def _evict_expired(self, now: float) -> None:
+        """Remove expired entries. Caller must hold the lock."""
+        expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+
+    def _add_row(self, key: str, embedding: Embedding, tag: Tuple[str, Signature]) -> None:
+        """Put an entry's normalized embedding in a free matrix row. Caller must hold the lock."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm or not self._free_rows:
+            return
+        if self._matrix is None or self._matrix.shape[1] != vector.shape[0]:
+            # First embedding, or the embedding model changed: start an empty matrix
+            for row_key in list(self._rows):
+                self._drop_row(row_key)
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+        row = self._free_rows.pop()
+        self._matrix[row] = vector / norm
+        self._rows[key] = row
+        self._row_keys[row] = key
+        self._row_tags[row] = tag
+
+    def _drop_row(self, key: str) -> None:
+        """Free an entry's matrix row, if it has one. Caller must hold the lock."""
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._row_keys[row] = None
+            self._row_tags[row] = None
+            self._free_rows.append(row)
+
+    def _remove(self, key: str) -> None:
+        """Remove an entry and its matrix row. Caller must hold the lock."""
+        self._entries.pop(key, None)
+        self._drop_row(key)
+
+    def _clear(self) -> None:
+        """Remove every entry. Caller must hold the lock."""
+        for key in list(self._entries):
+            self._remove(key)
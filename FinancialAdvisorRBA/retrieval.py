@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hybrid keyword + vector retrieval for market research queries.
+
+A BM25 inverted index is kept alongside the vector index so queries that
+name tickers, indices or dates ("HSI Q1 2025") find the chunks that
+actually mention them. Keyword and vector rankings are fused with
+reciprocal rank fusion, so a small top-k is enough.
+
+Each document is tagged at ingestion with its source file, publication
+month and the regions it covers. These tags can be passed as pre-filters,
+and filters are inferred from the query when it names a region or period.
+"""
+
+import heapq
+import json
+import math
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from llama_index.core import QueryBundle, VectorStoreIndex
+from llama_index.core.retrievers import BaseRetriever, VectorIndexRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore
+
+# Metadata keys added at ingestion; used for filtering only, never sent to the embedder or synthesizer
+METADATA_KEYS = ("source_file", "publication_month", "publication_year", "regions")
+# Bump when extract_document_metadata changes so indexed files are re-tagged on the next start
+METADATA_VERSION = 2
+
+_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12
+}
+_MONTH_NAMES = "january|february|march|april|june|july|august|september|october|november|december"
+# Full month names may be glued to other words ("commentaryjanuary2025"); abbreviations may not.
+# A four-digit year may follow a day ("December 31, 2024"); a two-digit year
+# must be attached by "-", "_" or "'" ("jan-25") so a bare day is never read as one.
+_MONTH_YEAR = re.compile(
+    r"(?:(?<![a-z])|(?=" + _MONTH_NAMES + r"))"
+    r"(" + _MONTH_NAMES + r"|jan|feb|mar|apr|may|jun|jul|aug|sept|sep|oct|nov|dec)\.?"
+    r"(?:[\s\-_,]*(?:\d{1,2}(?:st|nd|rd|th)?,?[\s\-_]+)?(20\d{2})|[\-_']?(\d{2}))(?![\d%])",
+    re.IGNORECASE
+)
+_QUARTER_YEAR = re.compile(r"\b(?:q([1-4])|([1-4])q)[\s\-_]*(20\d{2})\b", re.IGNORECASE)
+_YEAR = re.compile(r"(?<!\d)(20\d{2})(?!\d)")
+
+# Phrases that mark a document or query as covering a region
+REGION_KEYWORDS: Dict[str, List[str]] = {
+    "hong_kong": ["hong kong", "hang seng", "hsi", "hkex", "hkd", "h-shares"],
+    "china": ["china", "chinese", "greater china", "csi 300", "shanghai", "shenzhen", "a-shares", "renminbi", "rmb"],
+    "us": ["united states", "u.s.", "us equities", "s&p 500", "nasdaq", "federal reserve", "the fed", "treasuries"],
+    "europe": ["europe", "european", "eurozone", "ecb", "stoxx", "uk", "germany"],
+    "japan": ["japan", "japanese", "nikkei", "topix", "boj", "yen"],
+    "asia": ["asia", "asian", "asean", "india", "korea", "taiwan", "singapore"],
+}
+_REGION_PATTERNS = {
+    region: re.compile(
+        r"(?<![a-z0-9])(?:" + "|".join(re.escape(phrase) for phrase in phrases) + r")(?![a-z0-9])",
+        re.IGNORECASE
+    )
+    for region, phrases in REGION_KEYWORDS.items()
+}
+# Mentions needed before a document counts as covering a region, absolute
+# and relative to its most mentioned region
+REGION_MIN_MENTIONS = 3
+REGION_MIN_SHARE = 0.25
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.&'][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in into is it its of on or that the their this to "
+    "was what when where which will with about over than be been can could should would do does".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase keyword terms, keeping tickers and figures such as "s&p" or "3.5" intact.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: Terms with stopwords removed.
+    """
+    return [term for term in _TOKEN.findall(text.lower()) if term not in _STOPWORDS]
+
+def _parse_month(text: str) -> Optional[str]:
+    """Find the first "Month Year" mention in text as "YYYY-MM"."""
+    for match in _MONTH_YEAR.finditer(text):
+        # Lowercase "may" is almost always the verb ("investors may 30%")
+        if match.group(1) == "may":
+            continue
+        year = int(match.group(2)) if match.group(2) else 2000 + int(match.group(3))
+        return f"{year:04d}-{_MONTHS[match.group(1).lower()[:3]]:02d}"
+    return None
+
+def extract_document_metadata(path: Path, texts: Iterable[str]) -> Dict[str, Any]:
+    """
+    Derive filterable metadata for a source file.
+
+    The publication month comes from the file name if it carries one,
+    otherwise from the first page; regions are those mentioned often in
+    the document as a whole.
+
+    Args:
+        path (Path): Source file.
+        texts (Iterable[str]): Text of the file's pages, in order.
+
+    Returns:
+        Dict[str, Any]: source_file, publication_month ("YYYY-MM" or None),
+        publication_year (int or None) and regions (comma-separated, most mentioned first).
+    """
+    texts = list(texts)
+    stem = Path(path).stem.replace("_", " ")
+    first_page = texts[0][:3000] if texts else ""
+    month = _parse_month(stem) or _parse_month(first_page)
+    year_match = _YEAR.search(stem) or _YEAR.search(first_page)
+    year = int(month[:4]) if month else (int(year_match.group(1)) if year_match else None)
+
+    return {
+        "source_file": Path(path).name,
+        "publication_month": month,
+        "publication_year": year,
+        "regions": detect_regions(" ".join(texts), REGION_MIN_MENTIONS, REGION_MIN_SHARE)
+    }
+
+def detect_regions(text: str, min_mentions: int = 1, min_share: float = 0.0) -> str:
+    """
+    List the regions a text covers.
+
+    Args:
+        text (str): Document or chunk text.
+        min_mentions (int, optional): Mentions needed for a region to count. Defaults to 1.
+        min_share (float, optional): Mentions needed relative to the most mentioned region. Defaults to 0.0.
+
+    Returns:
+        str: Comma-separated region names, most mentioned first (empty if none).
+    """
+    mentions = Counter({region: len(pattern.findall(text)) for region, pattern in _REGION_PATTERNS.items()})
+    top = max(mentions.values(), default=0)
+    return ",".join(
+        region for region, count in mentions.most_common()
+        if count >= min_mentions and count >= min_share * top
+    )
+
+def infer_filters(query: str) -> Dict[str, Any]:
+    """
+    Infer metadata filters from regions and periods named in a query.
+
+    Args:
+        query (str): Natural language question.
+
+    Returns:
+        Dict[str, Any]: Filters in the format accepted by KeywordIndex.allowed_ids.
+    """
+    filters: Dict[str, Any] = {}
+    regions = [region for region, pattern in _REGION_PATTERNS.items() if pattern.search(query)]
+    if regions:
+        filters["regions"] = regions
+    quarter = _QUARTER_YEAR.search(query)
+    month = _parse_month(query)
+    if quarter:
+        q, year = int(quarter.group(1) or quarter.group(2)), int(quarter.group(3))
+        filters["period"] = (f"{year}-{3 * q - 2:02d}", f"{year}-{3 * q:02d}")
+    elif month:
+        filters["period"] = (month, month)
+    return filters
+
+class KeywordIndex:
+    """BM25 inverted index over index nodes, with their metadata for pre-filtering."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 length normalization. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.lengths: Dict[str, int] = {}
+        self.node_terms: Dict[str, List[str]] = {}
+        self.ref_docs: Dict[str, List[str]] = defaultdict(list)
+        self.metadata: Dict[str, Tuple[Tuple[str, ...], Optional[str], Optional[int], Optional[str]]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def add_nodes(self, nodes: Iterable[BaseNode]) -> None:
+        """
+        Index nodes' text and metadata.
+
+        Args:
+            nodes (Iterable[BaseNode]): Nodes inserted into the vector index.
+        """
+        for node in nodes:
+            if node.node_id in self.lengths:
+                self._remove_node(node.node_id)
+            counts = Counter(tokenize(node.get_content()))
+            for term, tf in counts.items():
+                self.postings[term][node.node_id] = tf
+            length = sum(counts.values())
+            self.lengths[node.node_id] = length
+            self.node_terms[node.node_id] = list(counts)
+            self._total_length += length
+            if node.ref_doc_id is not None:
+                self.ref_docs[node.ref_doc_id].append(node.node_id)
+            meta = node.metadata
+            regions = tuple(r for r in (meta.get("regions") or "").split(",") if r)
+            self.metadata[node.node_id] = (
+                regions, meta.get("publication_month"), meta.get("publication_year"), meta.get("source_file")
+            )
+
+    def remove_ref_doc(self, ref_doc_id: str) -> None:
+        """
+        Drop every node of a source document.
+
+        Args:
+            ref_doc_id (str): Document id passed to index.delete_ref_doc.
+        """
+        for node_id in self.ref_docs.pop(ref_doc_id, []):
+            self._remove_node(node_id)
+
+    def _remove_node(self, node_id: str) -> None:
+        """Drop one node from the postings."""
+        for term in self.node_terms.pop(node_id, []):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(node_id, None)
+                if not postings:
+                    del self.postings[term]
+        self._total_length -= self.lengths.pop(node_id, 0)
+        self.metadata.pop(node_id, None)
+
+    def allowed_ids(self, filters: Optional[Dict[str, Any]], tagged_only: bool = False) -> Optional[Set[str]]:
+        """
+        Apply metadata pre-filters.
+
+        Supported filters: "regions" (list; a node matches if it covers any),
+        "period" ((start, end) "YYYY-MM" months, inclusive) and "source_file".
+        Nodes without a known region or publication date are kept, since
+        they cannot be ruled out, unless tagged_only is set.
+
+        Args:
+            filters (Optional[Dict[str, Any]]): Filters to apply.
+            tagged_only (bool, optional): Drop nodes whose region or date is unknown
+                instead of keeping them. Defaults to False.
+
+        Returns:
+            Optional[Set[str]]: Matching node ids, or None when no filter applies.
+        """
+        if not filters:
+            return None
+        regions = set(filters.get("regions") or [])
+        period = filters.get("period")
+        source = filters.get("source_file")
+        allowed = set()
+        for node_id, (node_regions, month, year, source_file) in self.metadata.items():
+            if regions and node_regions and not regions.intersection(node_regions):
+                continue
+            if tagged_only and ((regions and not node_regions) or (period and month is None and year is None)):
+                continue
+            if period:
+                if month is not None and not period[0] <= month <= period[1]:
+                    continue
+                if month is None and year is not None and not int(period[0][:4]) <= year <= int(period[1][:4]):
+                    continue
+            if source and source_file != source:
+                continue
+            allowed.add(node_id)
+        return allowed
+
+    def search(self, query: str, top_k: int, allowed: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Rank nodes by BM25 score for a query.
+
+        Args:
+            query (str): Natural language question.
+            top_k (int): Number of results.
+            allowed (Optional[Set[str]], optional): Restrict results to these node ids. Defaults to None.
+
+        Returns:
+            List[Tuple[str, float]]: (node id, score), best first.
+        """
+        if not self.lengths:
+            return []
+        n = len(self.lengths)
+        avg_length = self._total_length / n or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for node_id, tf in postings.items():
+                if allowed is not None and node_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[node_id] / avg_length)
+                scores[node_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def persist(self, path: Path) -> None:
+        """
+        Atomically write the index to a JSON file.
+
+        Args:
+            path (Path): Destination file.
+        """
+        data = {
+            "k1": self.k1,
+            "b": self.b,
+            "nodes": {
+                node_id: {
+                    "terms": {term: self.postings[term][node_id] for term in terms},
+                    "metadata": self.metadata.get(node_id)
+                }
+                for node_id, terms in self.node_terms.items()
+            },
+            "ref_docs": self.ref_docs
+        }
+        tmp_path = Path(path).with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "KeywordIndex":
+        """
+        Load an index written by persist.
+
+        Args:
+            path (Path): JSON file.
+
+        Returns:
+            KeywordIndex: Restored index.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        keyword_index = cls(data["k1"], data["b"])
+        for node_id, entry in data["nodes"].items():
+            for term, tf in entry["terms"].items():
+                keyword_index.postings[term][node_id] = tf
+            length = sum(entry["terms"].values())
+            keyword_index.lengths[node_id] = length
+            keyword_index._total_length += length
+            keyword_index.node_terms[node_id] = list(entry["terms"])
+            if entry["metadata"] is not None:
+                regions, month, year, source = entry["metadata"]
+                keyword_index.metadata[node_id] = (tuple(regions), month, year, source)
+        for ref_doc_id, node_ids in data["ref_docs"].items():
+            keyword_index.ref_docs[ref_doc_id] = list(node_ids)
+        return keyword_index
+
+    @classmethod
+    def from_index(cls, index: VectorStoreIndex) -> "KeywordIndex":
+        """
+        Build a keyword index from the nodes stored in a vector index's docstore.
+
+        Args:
+            index (VectorStoreIndex): Index whose nodes are indexed.
+
+        Returns:
+            KeywordIndex: Index covering every stored node.
+        """
+        keyword_index = cls()
+        keyword_index.add_nodes(index.docstore.docs.values())
+        return keyword_index
+
+class HybridRetriever(BaseRetriever):
+    """Fuses BM25 and vector rankings with reciprocal rank fusion, after metadata pre-filtering."""
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        keyword_index: KeywordIndex,
+        top_k: int = 2,
+        candidate_k: int = 8,
+        rrf_k: int = 60,
+        infer_query_filters: bool = True
+    ):
+        """
+        Args:
+            index (VectorStoreIndex): Vector index to search.
+            keyword_index (KeywordIndex): Keyword index over the same nodes.
+            top_k (int, optional): Nodes passed on to synthesis. Defaults to 2.
+            candidate_k (int, optional): Candidates taken from each ranking before fusion. Defaults to 8.
+            rrf_k (int, optional): Reciprocal rank fusion constant. Defaults to 60.
+            infer_query_filters (bool, optional): Infer region and period filters from the query. Defaults to True.
+        """
+        super().__init__()
+        self.index = index
+        self.keyword_index = keyword_index
+        self.top_k = top_k
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.infer_query_filters = infer_query_filters
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self.search(query_bundle)
+
+    def search(self, query_bundle: QueryBundle, filters: Optional[Dict[str, Any]] = None) -> List[NodeWithScore]:
+        """
+        Retrieve the best nodes for a query.
+
+        Explicit filters are always applied. Each filter inferred from the
+        query is dropped unless some node tagged with a region or date
+        matches it, so a misread period never narrows retrieval to untagged
+        nodes.
+
+        Args:
+            query_bundle (QueryBundle): Query, with its embedding if already computed.
+            filters (Optional[Dict[str, Any]], optional): Metadata filters, see KeywordIndex.allowed_ids.
+                Defaults to None.
+
+        Returns:
+            List[NodeWithScore]: Up to top_k nodes with fused scores, best first.
+        """
+        allowed = self.keyword_index.allowed_ids(filters)
+        if filters is None and self.infer_query_filters:
+            inferred = {
+                key: value for key, value in infer_filters(query_bundle.query_str).items()
+                if self.keyword_index.allowed_ids({key: value}, tagged_only=True)
+            }
+            allowed = self.keyword_index.allowed_ids(inferred)
+            if allowed is not None and not allowed:
+                allowed = None
+        if allowed is not None and not allowed:
+            return []
+
+        keyword_hits = self.keyword_index.search(query_bundle.query_str, self.candidate_k, allowed)
+        vector_retriever = VectorIndexRetriever(
+            self.index,
+            similarity_top_k=self.candidate_k,
+            node_ids=list(allowed) if allowed is not None else None
+        )
+        vector_hits = vector_retriever.retrieve(query_bundle)
+
+        scores: Dict[str, float] = defaultdict(float)
+        nodes: Dict[str, BaseNode] = {}
+        for rank, (node_id, _) in enumerate(keyword_hits):
+            scores[node_id] += 1.0 / (self.rrf_k + rank + 1)
+        for rank, hit in enumerate(vector_hits):
+            scores[hit.node.node_id] += 1.0 / (self.rrf_k + rank + 1)
+            nodes[hit.node.node_id] = hit.node
+
+        best = heapq.nlargest(self.top_k, scores.items(), key=lambda item: item[1])
+        missing = [node_id for node_id, _ in best if node_id not in nodes]
+        if missing:
+            for node in self.index.docstore.get_nodes(missing, raise_error=False):
+                nodes[node.node_id] = node
+        return [NodeWithScore(node=nodes[node_id], score=score) for node_id, score in best if node_id in nodes]
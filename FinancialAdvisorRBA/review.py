@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Parallel risk and compliance review.
+
+A draft allocation used to be reviewed in sequence: the risk agent
+reported, the portfolio agent took a turn to pass the proposal on, then
+the compliance agent gave its verdict. Both reviews only need the
+proposal, so the ReviewPanel runs them at the same time and posts one
+message holding the risk report and the compliance verdict. The
+portfolio agent's extra turn and a routing hop disappear from every
+revision cycle.
+
+The reviewers are members of the panel rather than of the group chat.
+Routing-table targets naming a member resolve to the panel, and a
+member's tool calls are run by the panel through the agent registered
+to execute them.
+"""
+
+import contextvars
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import autogen
+
+from .compliance import APPROVED, REQUIRES_CHANGES
+from .tracing import trace_span
+
+REVIEW_PANEL_NAME = "ReviewPanel"
+
+# Tool call/result exchanges a reviewer may make before it must give its report
+MAX_TOOL_ROUNDS = 4
+
+# Section header of one reviewer's report in the panel's message
+_SECTION = re.compile(r"^=== (\S+) ===$", re.MULTILINE)
+
+class ReviewPanelAgent(autogen.ConversableAgent):
+    """Group chat member that fans a proposal out to several reviewers and merges their replies."""
+
+    def __init__(
+        self,
+        members: Sequence[autogen.ConversableAgent],
+        executors: Sequence[autogen.ConversableAgent],
+        name: str = REVIEW_PANEL_NAME,
+        verdict_member: str = "RegulatoryComplianceAgent",
+        max_tool_rounds: int = MAX_TOOL_ROUNDS
+    ):
+        """
+        Args:
+            members (Sequence[autogen.ConversableAgent]): Reviewers, run concurrently on every turn.
+            executors (Sequence[autogen.ConversableAgent]): Agents that may execute the reviewers' tool calls.
+            name (str, optional): Agent name. Defaults to REVIEW_PANEL_NAME.
+            verdict_member (str, optional): Reviewer whose APPROVED / REQUIRES CHANGES verdict heads the
+                merged message. Defaults to "RegulatoryComplianceAgent".
+            max_tool_rounds (int, optional): Tool exchanges allowed per reviewer and turn. Defaults to MAX_TOOL_ROUNDS.
+        """
+        super().__init__(
+            name=name,
+            llm_config=False,
+            human_input_mode="NEVER",
+            code_execution_config=False,
+            description="Reviews a proposed allocation for risk and compliance at the same time."
+        )
+        self.members = list(members)
+        self.executors = list(executors)
+        self.verdict_member = verdict_member
+        self.max_tool_rounds = max_tool_rounds
+        self.register_reply([autogen.Agent, None], ReviewPanelAgent._review_reply, position=0)
+
+    def _review_reply(
+        self,
+        messages: Optional[List[Dict[str, Any]]] = None,
+        sender: Optional[autogen.Agent] = None,
+        config: Optional[Any] = None
+    ) -> Tuple[bool, str]:
+        """Run every member on the conversation so far and merge their replies."""
+        # Earlier panel reports are someone else's turns from a member's point of view
+        history = [
+            {**m, "role": "user"} if m.get("name") == self.name else m
+            for m in (messages if messages is not None else self.chat_messages.get(sender, []))
+        ]
+        with trace_span("review_fanout", self.name, members=len(self.members)):
+            with ThreadPoolExecutor(max_workers=len(self.members), thread_name_prefix="review") as pool:
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._run_member, member, history)
+                    for member in self.members
+                ]
+                reports = [(member.name, future.result()) for member, future in zip(self.members, futures)]
+        return True, self.merge(reports)
+
+    def _run_member(self, member: autogen.ConversableAgent, history: List[Dict[str, Any]]) -> str:
+        """Get one member's report, running its tool calls until it answers in text."""
+        messages = list(history)
+        with trace_span("review", member.name) as span:
+            for _ in range(self.max_tool_rounds + 1):
+                # Asked by the panel, so members can tell a review turn from other traffic
+                reply = member.generate_reply(messages=messages, sender=self)
+                if not isinstance(reply, dict) or not reply.get("tool_calls"):
+                    break
+                call = {"role": "assistant", "content": reply.get("content"), "tool_calls": reply["tool_calls"]}
+                messages += [call, self._execute(call)]
+            else:
+                reply = f"No report: tool calls did not finish within {self.max_tool_rounds} rounds."
+            if span is not None:
+                span.set(tool_rounds=sum(1 for m in messages[len(history):] if m.get("tool_calls")))
+        content = reply.get("content") if isinstance(reply, dict) else reply
+        return content or "No report."
+
+    def _execute(self, call: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a member's tool calls on the agent registered to execute them."""
+        responses = []
+        for tool_call in call["tool_calls"]:
+            name = tool_call["function"]["name"]
+            executor = next((agent for agent in self.executors if agent.can_execute_function(name)), None)
+            if executor is None:
+                content = f"Error: no agent can execute {name}."
+            else:
+                _, result = executor.generate_tool_calls_reply(messages=[{**call, "tool_calls": [tool_call]}])
+                content = result["tool_responses"][0]["content"]
+            responses.append({"tool_call_id": tool_call["id"], "role": "tool", "content": content})
+        return {"role": "tool", "tool_responses": responses, "content": "\n\n".join(r["content"] for r in responses)}
+
+    def merge(self, reports: List[Tuple[str, str]]) -> str:
+        """
+        Combine the members' reports into one message.
+
+        Args:
+            reports (List[Tuple[str, str]]): Member name and report, in member order.
+
+        Returns:
+            str: Header with the overall verdict, then one "=== name ===" section per member.
+        """
+        verdict = next((text for name, text in reports if name == self.verdict_member), "")
+        if REQUIRES_CHANGES in verdict:
+            verdict = REQUIRES_CHANGES
+        elif APPROVED in verdict:
+            verdict = APPROVED
+        else:
+            verdict = "NONE"
+        lines = [
+            f"Review Panel: {', '.join(name for name, _ in reports)} reviewed the proposal in parallel.",
+            f"Compliance verdict: {verdict}"
+        ]
+        for name, text in reports:
+            lines += ["", f"=== {name} ===", text.strip()]
+        return "\n".join(lines)
+
+def split_review(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Expand a review panel message into one message per member report.
+
+    Args:
+        message (Dict[str, Any]): Group chat message.
+
+    Returns:
+        List[Dict[str, Any]]: The member reports, each with the member's "name" and "content",
+        or just the message itself if it is not a panel report.
+    """
+    content = message.get("content")
+    if message.get("name") != REVIEW_PANEL_NAME or not isinstance(content, str):
+        return [message]
+    parts = _SECTION.split(content)
+    return [
+        {**message, "name": name, "content": text.strip()}
+        for name, text in zip(parts[1::2], parts[2::2])
+    ] or [message]
+
+def with_panel_members(agents: Sequence[autogen.Agent]) -> List[autogen.Agent]:
+    """
+    List agents together with the members of any review panel among them.
+
+    Args:
+        agents (Sequence[autogen.Agent]): Group chat agents.
+
+    Returns:
+        List[autogen.Agent]: The agents followed by the panel members.
+    """
+    return [*agents, *(member for agent in agents for member in getattr(agent, "members", ()))]
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Quantitative portfolio risk engine.
+
+All metrics are computed with vectorized NumPy over a batch of candidate
+allocations, so the RiskAssessmentAgent can evaluate many portfolios in a
+single tool call and only has to narrate the results.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Illustrative long-term capital market assumptions: annual expected return,
+# annual volatility and loadings on (equity, duration) risk factors.
+ASSET_ASSUMPTIONS: Dict[str, Tuple[float, float, Tuple[float, float]]] = {
+    "cash": (0.030, 0.005, (0.00, 0.10)),
+    "government_bonds": (0.040, 0.050, (-0.20, 0.80)),
+    "investment_grade_bonds": (0.050, 0.070, (0.20, 0.70)),
+    "high_yield_bonds": (0.065, 0.100, (0.60, 0.30)),
+    "developed_equities": (0.075, 0.160, (0.90, 0.00)),
+    "us_equities": (0.075, 0.170, (0.90, 0.00)),
+    "hong_kong_equities": (0.080, 0.240, (0.80, 0.00)),
+    "china_equities": (0.085, 0.270, (0.75, 0.00)),
+    "emerging_equities": (0.085, 0.220, (0.85, 0.00)),
+    "gold": (0.045, 0.150, (0.10, 0.30)),
+    "real_estate": (0.060, 0.180, (0.60, 0.20)),
+    "crypto": (0.150, 0.700, (0.40, 0.00)),
+}
+
+ASSET_ALIASES: Dict[str, str] = {
+    "bonds": "government_bonds",
+    "fixed_income": "investment_grade_bonds",
+    "saving": "cash",
+    "savings": "cash",
+    "equities": "developed_equities",
+    "stocks": "developed_equities",
+    "high_risk_stock": "emerging_equities",
+    "s&p_500": "us_equities",
+    "hk_equities": "hong_kong_equities",
+    "hsi": "hong_kong_equities",
+    "international_etfs": "developed_equities",
+    "reits": "real_estate",
+    "bitcoin": "crypto",
+}
+
+# Keyword patterns for fund and asset descriptions, checked in order
+ASSET_KEYWORDS: List[Tuple["re.Pattern[str]", str]] = [
+    (re.compile(pattern), asset) for pattern, asset in [
+        (r"crypto|bitcoin|ethereum|\bbtc\b|\beth\b", "crypto"),
+        (r"gold|precious metal", "gold"),
+        (r"reit|real estate|property", "real_estate"),
+        (r"high[ -]yield|junk", "high_yield_bonds"),
+        (r"corporate|investment[ -]grade", "investment_grade_bonds"),
+        (r"bond|treasur|gilt|fixed income|sovereign", "government_bonds"),
+        (r"cash|money market|deposit|saving", "cash"),
+        (r"hong kong|hang seng|\bhsi\b|\bhk\b", "hong_kong_equities"),
+        (r"china|csi 300|a[ -]share", "china_equities"),
+        (r"emerging", "emerging_equities"),
+        (r"s&p|nasdaq|\bus\b|u\.s\.|american", "us_equities"),
+        (r"equit|stock|share|etf|index fund|msci", "developed_equities"),
+    ]
+]
+
+# Instantaneous per-asset shocks; assets not listed are unaffected
+STRESS_SCENARIOS: Dict[str, Dict[str, float]] = {
+    "equity_crash": {
+        "developed_equities": -0.35, "us_equities": -0.35, "hong_kong_equities": -0.40,
+        "china_equities": -0.45, "emerging_equities": -0.40, "high_yield_bonds": -0.12,
+        "real_estate": -0.25, "crypto": -0.60, "government_bonds": 0.05, "gold": 0.08
+    },
+    "rate_hike": {
+        "government_bonds": -0.08, "investment_grade_bonds": -0.10, "high_yield_bonds": -0.08,
+        "developed_equities": -0.10, "us_equities": -0.12, "hong_kong_equities": -0.12,
+        "real_estate": -0.15, "crypto": -0.25, "gold": -0.05
+    },
+    "inflation_shock": {
+        "government_bonds": -0.10, "investment_grade_bonds": -0.09, "developed_equities": -0.08,
+        "us_equities": -0.08, "real_estate": 0.02, "gold": 0.12, "crypto": -0.15
+    },
+    "china_slowdown": {
+        "hong_kong_equities": -0.25, "china_equities": -0.30, "emerging_equities": -0.15,
+        "developed_equities": -0.05, "gold": 0.03
+    },
+    "crypto_crash": {"crypto": -0.75},
+}
+
+def _correlation_matrix(assets: List[str]) -> np.ndarray:
+    """Build a positive semi-definite correlation matrix from factor loadings."""
+    loadings = np.array([ASSET_ASSUMPTIONS[asset][2] for asset in assets])
+    corr = loadings @ loadings.T
+    np.fill_diagonal(corr, 1.0)
+    return corr
+
+def classify_asset(name: str) -> Optional[str]:
+    """
+    Map a free-form asset or fund name to an asset class key.
+
+    Exact keys and aliases are tried first, then keyword patterns, so
+    descriptions like "S&P 500 Index Fund" or "Hang Seng ETF" are recognized.
+
+    Args:
+        name (str): Asset name as written by an agent, e.g. "HK Equities".
+
+    Returns:
+        Optional[str]: Asset class key in ASSET_ASSUMPTIONS, or None if unrecognized.
+    """
+    key = "_".join(name.strip().lower().replace("-", " ").split())
+    key = ASSET_ALIASES.get(key, key)
+    if key in ASSET_ASSUMPTIONS:
+        return key
+    text = name.lower()
+    for pattern, asset in ASSET_KEYWORDS:
+        if pattern.search(text):
+            return asset
+    return None
+
+def resolve_asset(name: str) -> str:
+    """
+    Map a free-form asset name to an asset class key.
+
+    Args:
+        name (str): Asset name as written by the agent, e.g. "HK Equities".
+
+    Returns:
+        str: Asset class key in ASSET_ASSUMPTIONS.
+
+    Raises:
+        ValueError: If the name matches no known asset class.
+    """
+    key = classify_asset(name)
+    if key is None:
+        raise ValueError(f"Unknown asset class '{name}'. Known classes: {', '.join(ASSET_ASSUMPTIONS)}")
+    return key
+
+def build_inputs(
+    allocations: List[Dict[str, float]],
+    expected_returns: Optional[Dict[str, float]] = None,
+    volatilities: Optional[Dict[str, float]] = None,
+    correlations: Optional[Dict[str, Dict[str, float]]] = None
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Convert allocations and assumption overrides into arrays.
+
+    Weights may be given as fractions or percentages and are normalized to sum to one.
+
+    Args:
+        allocations (List[Dict[str, float]]): Candidate portfolios as asset -> weight.
+        expected_returns (Optional[Dict[str, float]], optional): Annual expected return overrides. Defaults to None.
+        volatilities (Optional[Dict[str, float]], optional): Annual volatility overrides. Defaults to None.
+        correlations (Optional[Dict[str, Dict[str, float]]], optional): Pairwise correlation overrides as
+            asset -> asset -> correlation; pairs not given keep the factor model's value. Defaults to None.
+
+    Returns:
+        Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]: Asset keys, weights (k, n),
+        expected returns (n,) and covariance matrix (n, n).
+
+    Raises:
+        ValueError: If an asset is unknown, an allocation has no weight, or the correlations are
+            outside [-1, 1] or do not form a positive semi-definite matrix.
+    """
+    resolved = [[(resolve_asset(name), weight) for name, weight in allocation.items()] for allocation in allocations]
+    assets = sorted({asset for allocation in resolved for asset, _ in allocation})
+    column = {asset: i for i, asset in enumerate(assets)}
+
+    # Several holdings may map to the same asset class, so weights accumulate
+    weights = np.zeros((len(resolved), len(assets)))
+    for row, allocation in enumerate(resolved):
+        for asset, weight in allocation:
+            weights[row, column[asset]] += weight
+    totals = weights.sum(axis=1, keepdims=True)
+    if np.any(totals <= 0):
+        raise ValueError("Every allocation must have a positive total weight")
+    weights /= totals
+
+    overrides_mu = {resolve_asset(k): v for k, v in (expected_returns or {}).items()}
+    overrides_vol = {resolve_asset(k): v for k, v in (volatilities or {}).items()}
+    mu = np.array([overrides_mu.get(asset, ASSET_ASSUMPTIONS[asset][0]) for asset in assets])
+    vol = np.array([overrides_vol.get(asset, ASSET_ASSUMPTIONS[asset][1]) for asset in assets])
+    corr = _correlation_matrix(assets)
+    for first, row in (correlations or {}).items():
+        for second, value in row.items():
+            i, j = column.get(resolve_asset(first)), column.get(resolve_asset(second))
+            if i is None or j is None or i == j:
+                continue
+            if not -1.0 <= value <= 1.0:
+                raise ValueError(f"Correlation of {first} and {second} must be between -1 and 1")
+            corr[i, j] = corr[j, i] = value
+    if correlations and np.linalg.eigvalsh(corr).min() < -1e-8:
+        raise ValueError("The correlations are inconsistent: they do not form a positive semi-definite matrix")
+    cov = corr * np.outer(vol, vol)
+    return assets, weights, mu, cov
+
+def portfolio_metrics(
+    weights: np.ndarray,
+    mu: np.ndarray,
+    cov: np.ndarray,
+    risk_free_rate: float = 0.03,
+    confidence: float = 0.95,
+    n_simulations: int = 10000,
+    n_path_simulations: int = 2000,
+    steps_per_year: int = 12,
+    stress_shocks: Optional[np.ndarray] = None,
+    seed: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Compute one-year risk metrics for a batch of portfolios.
+
+    Args:
+        weights (np.ndarray): Portfolio weights, shape (k, n).
+        mu (np.ndarray): Annual expected asset returns, shape (n,).
+        cov (np.ndarray): Annual asset return covariance, shape (n, n).
+        risk_free_rate (float, optional): Annual risk-free rate for the Sharpe ratio. Defaults to 0.03.
+        confidence (float, optional): VaR/CVaR confidence level. Defaults to 0.95.
+        n_simulations (int, optional): Monte Carlo draws of the one-year return. Defaults to 10000.
+        n_path_simulations (int, optional): Simulated monthly paths for drawdown. Defaults to 2000.
+        steps_per_year (int, optional): Path resolution for drawdown. Defaults to 12.
+        stress_shocks (Optional[np.ndarray], optional): Scenario shocks, shape (s, n). Defaults to None.
+        seed (Optional[int], optional): Random seed for reproducible simulations. Defaults to None.
+
+    Returns:
+        Dict[str, np.ndarray]: Arrays of shape (k,) per metric, plus "stress" of shape (k, s) when shocks are given.
+    """
+    weights = np.atleast_2d(weights)
+    rng = np.random.default_rng(seed)
+    # Tiny jitter keeps the factorization stable for singular covariances
+    chol = np.linalg.cholesky(cov + np.eye(len(mu)) * 1e-12)
+
+    expected = weights @ mu
+    volatility = np.sqrt(np.einsum("kn,nm,km->k", weights, cov, weights))
+    sharpe = np.divide(expected - risk_free_rate, volatility, out=np.zeros_like(expected), where=volatility > 0)
+
+    # One-year Monte Carlo returns for every portfolio from a shared set of asset draws
+    asset_returns = mu + rng.standard_normal((n_simulations, len(mu))) @ chol.T
+    portfolio_returns = asset_returns @ weights.T
+    tail_cut = np.quantile(portfolio_returns, 1 - confidence, axis=0)
+    tail = portfolio_returns <= tail_cut
+    value_at_risk = -tail_cut
+    conditional_var = -(portfolio_returns * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+
+    # Monthly paths for maximum drawdown
+    step_mu, step_chol = mu / steps_per_year, chol / np.sqrt(steps_per_year)
+    step_returns = step_mu + rng.standard_normal((n_path_simulations, steps_per_year, len(mu))) @ step_chol.T
+    wealth = np.cumprod(1 + np.einsum("psn,kn->psk", step_returns, weights), axis=1)
+    peaks = np.maximum.accumulate(np.maximum(wealth, 1.0), axis=1)
+    drawdown = (wealth / peaks - 1).min(axis=1)
+
+    metrics = {
+        "expected_return": expected,
+        "volatility": volatility,
+        "sharpe_ratio": sharpe,
+        "value_at_risk": value_at_risk,
+        "conditional_var": conditional_var,
+        "expected_max_drawdown": drawdown.mean(axis=0),
+        "tail_max_drawdown": np.quantile(drawdown, 1 - confidence, axis=0),
+    }
+    if stress_shocks is not None:
+        metrics["stress"] = weights @ np.atleast_2d(stress_shocks).T
+    return metrics
+
+def assess_portfolio_risk(
+    allocations: List[Dict[str, float]],
+    expected_returns: Optional[Dict[str, float]] = None,
+    volatilities: Optional[Dict[str, float]] = None,
+    correlations: Optional[Dict[str, Dict[str, float]]] = None,
+    confidence: float = 0.95
+) -> str:
+    """
+    Compute risk metrics for one or more candidate portfolio allocations.
+
+    Args:
+        allocations (List[Dict[str, float]]): Candidate portfolios as asset class -> weight (fraction or percent).
+        expected_returns (Optional[Dict[str, float]], optional): Annual expected return overrides per asset class.
+        volatilities (Optional[Dict[str, float]], optional): Annual volatility overrides per asset class.
+        correlations (Optional[Dict[str, Dict[str, float]]], optional): Pairwise correlation overrides as
+            asset class -> asset class -> correlation. Together with the volatilities they give the covariance.
+        confidence (float, optional): VaR/CVaR and tail drawdown confidence level. Defaults to 0.95.
+
+    Returns:
+        str: JSON report with expected return, volatility, Sharpe ratio, VaR/CVaR at the confidence level,
+        maximum drawdown and stress scenario returns for each allocation.
+    """
+    if not 0.5 <= confidence < 1.0:
+        return json.dumps({"error": "confidence must be at least 0.5 and below 1"})
+    try:
+        assets, weights, mu, cov = build_inputs(allocations, expected_returns, volatilities, correlations)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+
+    scenarios = list(STRESS_SCENARIOS)
+    shocks = np.array([[STRESS_SCENARIOS[name].get(asset, 0.0) for asset in assets] for name in scenarios])
+    metrics = portfolio_metrics(weights, mu, cov, confidence=confidence, stress_shocks=shocks, seed=0)
+
+    reports: List[Dict[str, Any]] = []
+    for k in range(len(weights)):
+        report = {name: round(float(values[k]), 4) for name, values in metrics.items() if name != "stress"}
+        report["weights"] = {asset: round(float(w), 4) for asset, w in zip(assets, weights[k]) if w}
+        report["stress_scenarios"] = {name: round(float(metrics["stress"][k, s]), 4) for s, name in enumerate(scenarios)}
+        reports.append(report)
+    return json.dumps({"confidence": confidence, "horizon_years": 1, "portfolios": reports})
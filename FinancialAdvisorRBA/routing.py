@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Table-driven speaker routing for the advisory group chat."""
+
+import re
+import threading
+import weakref
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+import autogen
+
+# Resolves to the speaker of the message before the last one
+PREVIOUS_SPEAKER = "@previous"
+
+# Keyword sets found while replies streamed, kept until the reply is routed
+STREAMED_MATCHES = 256
+
+# Per-speaker routing table. Keywords are checked in priority order; the
+# default applies when no keyword appears in the speaker's message.
+DEFAULT_TRANSITIONS: Dict[str, Dict[str, Any]] = {
+    "user": {
+        # Other replies answer whoever spoke before: the advisor's questions, or
+        # feedback on a finished proposal for the portfolio agent
+        "keywords": [("APPROVE", "PortfolioRecommendationAgent")],
+        "default": PREVIOUS_SPEAKER
+    },
+    "FinancialAdvisor": {
+        "keywords": [],
+        "default": "user"
+    },
+    "PortfolioRecommendationAgent": {
+        "keywords": [
+            ("PROPOSAL DONE", "user"),
+            ("CHECK NEEDED", "RegulatoryComplianceAgent"),
+            ("RISK EVALUATION NEEDED", "RiskAssessmentAgent"),
+            ("MARKET DATA NEEDED", "MarketDataAgent")
+        ],
+        "default": "RiskAssessmentAgent"
+    },
+    "RiskAssessmentAgent": {
+        "keywords": [("MARKET DATA REQUIRED", "MarketDataAgent")],
+        "default": "PortfolioRecommendationAgent"
+    },
+    "MarketDataAgent": {
+        "keywords": [],
+        "default": PREVIOUS_SPEAKER
+    },
+    "RegulatoryComplianceAgent": {
+        "keywords": [
+            ("APPROVED", "PortfolioRecommendationAgent"),
+            ("REQUIRES CHANGES", "PortfolioRecommendationAgent")
+        ],
+        "default": "PortfolioRecommendationAgent"
+    },
+    # Risk and compliance reviewed in parallel (review.ReviewPanelAgent); routes to
+    # the risk or compliance agent reach the panel when they are its members
+    "ReviewPanel": {
+        "keywords": [("MARKET DATA REQUIRED", "MarketDataAgent")],
+        "default": "PortfolioRecommendationAgent"
+    }
+}
+
+class KeywordScanner:
+    """
+    Finds routing keywords in a reply that arrives in pieces.
+
+    Each piece is scanned once, together with just enough of the previous
+    text to catch a keyword split across pieces.
+    """
+
+    def __init__(self, pattern: Optional["re.Pattern[str]"], longest: int):
+        """
+        Args:
+            pattern (Optional[re.Pattern[str]]): Alternation of the keywords, or None if there are none.
+            longest (int): Length of the longest keyword.
+        """
+        self.pattern = pattern
+        self.overlap = max(0, longest - 1)
+        self.found: set = set()
+        self._tail = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Scan the next piece of the reply.
+
+        Args:
+            text (str): Text that arrived since the last call.
+
+        Returns:
+            List[str]: Keywords seen for the first time.
+        """
+        if self.pattern is None or not text:
+            return []
+        window = self._tail + text
+        new = []
+        for m in self.pattern.finditer(window):
+            if m.group(0) not in self.found:
+                self.found.add(m.group(0))
+                new.append(m.group(0))
+        self._tail = window[-self.overlap:] if self.overlap else ""
+        return new
+
+class _CompiledRoute:
+    """Keyword matcher and fallback target for a single speaker."""
+
+    def __init__(self, keywords: List[Tuple[str, str]], default: Optional[str]):
+        self.targets = dict(keywords)
+        self.priority = {keyword: rank for rank, (keyword, _) in enumerate(keywords)}
+        self.default = default
+        # Longest keywords first so a keyword is never shadowed by one of its prefixes
+        alternatives = sorted(self.targets, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, alternatives))) if alternatives else None
+        self.longest = len(alternatives[0]) if alternatives else 0
+
+    def match(self, content: str) -> Optional[str]:
+        """Return the highest-priority keyword in content, scanning it once."""
+        if self.pattern is None:
+            return None
+        return self.best(m.group(0) for m in self.pattern.finditer(content))
+
+    def best(self, keywords: Iterable[str]) -> Optional[str]:
+        """Return the highest-priority keyword of those found, if any."""
+        return min(keywords, key=self.priority.__getitem__, default=None)
+
+    def scanner(self) -> KeywordScanner:
+        """Start an incremental scan of a reply that is still being generated."""
+        return KeywordScanner(self.pattern, self.longest)
+
+class SpeakerRouter:
+    """
+    Deterministic speaker selection compiled from a transition table.
+
+    Tool calls are routed to the agent registered to execute them, tool
+    results go back to the caller, and every other turn is routed by the
+    speaker's keyword table. A target that is not in the group chat but is
+    a member of an agent that is (such as a review panel) resolves to that
+    agent. Only speakers or targets missing from the
+    table fall back to the GroupChatManager's LLM ("auto"), and each such
+    fallback is counted.
+    """
+
+    def __init__(self, transitions: Optional[Dict[str, Dict[str, Any]]] = None, initial_speaker: str = "FinancialAdvisor"):
+        """
+        Args:
+            transitions (Optional[Dict[str, Dict[str, Any]]], optional): Routing table. Defaults to DEFAULT_TRANSITIONS.
+            initial_speaker (str, optional): Agent that opens the conversation. Defaults to "FinancialAdvisor".
+        """
+        transitions = DEFAULT_TRANSITIONS if transitions is None else transitions
+        self.initial_speaker = initial_speaker
+        self.routes = {
+            speaker: _CompiledRoute(spec.get("keywords", []), spec.get("default"))
+            for speaker, spec in transitions.items()
+        }
+        self.counts: Counter = Counter()
+        # Per thread (and context), so concurrent sessions sharing the router don't see each other's decisions
+        self._last_decision: ContextVar[Dict[str, Optional[str]]] = ContextVar(f"last_decision_{id(self)}", default={})
+        self._agent_maps: Dict[int, Tuple[Any, Dict[str, autogen.Agent]]] = {}
+        self._streamed: "OrderedDict[Tuple[str, str], FrozenSet[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __call__(self, last_speaker: autogen.Agent, groupchat: autogen.GroupChat) -> Union[autogen.Agent, str]:
+        """
+        Select the next speaker; usable as a GroupChat speaker_selection_method.
+
+        Args:
+            last_speaker (autogen.Agent): The agent who spoke last.
+            groupchat (autogen.GroupChat): The group chat containing all agents.
+
+        Returns:
+            Union[autogen.Agent, str]: The next agent to speak, or "auto" to defer to the LLM.
+        """
+        target, rule, keyword = self.decide(last_speaker, groupchat)
+        agent = self._agents(groupchat).get(target) if target else None
+        with self._lock:
+            if agent is None:
+                rule = "fallback"
+            self.counts[rule] += 1
+        self._last_decision.set({
+            "speaker": last_speaker.name,
+            "target": agent.name if agent is not None else "auto",
+            "rule": rule,
+            "keyword": keyword
+        })
+        return agent if agent is not None else "auto"
+
+    @property
+    def last_decision(self) -> Dict[str, Optional[str]]:
+        """The latest decision made on the calling thread: speaker, target, rule and keyword."""
+        return self._last_decision.get()
+
+    def decide(self, last_speaker: autogen.Agent, groupchat: autogen.GroupChat) -> Tuple[Optional[str], str, Optional[str]]:
+        """
+        Work out the next speaker's name without resolving it to an agent.
+
+        Args:
+            last_speaker (autogen.Agent): The agent who spoke last.
+            groupchat (autogen.GroupChat): The group chat containing all agents.
+
+        Returns:
+            Tuple[Optional[str], str, Optional[str]]: Target agent name (None if unknown),
+            the rule that fired and the keyword that matched, if any.
+        """
+        messages = groupchat.messages
+        if len(messages) <= 1:
+            return self.initial_speaker, "initial", None
+
+        last = messages[-1]
+        previous = messages[-2].get("name")
+
+        if last.get("tool_calls") or last.get("function_call"):
+            return self._executor_for(last, previous, groupchat), "tool_call", None
+        if last.get("tool_responses") or last.get("role") == "tool":
+            return previous, "tool_result", None
+
+        route = self.routes.get(last_speaker.name)
+        if route is None:
+            return None, "fallback", None
+
+        content = last.get("content") or ""
+        with self._lock:
+            streamed = self._streamed.pop((last_speaker.name, content), None)
+        keyword = route.best(streamed) if streamed is not None else route.match(content)
+        if keyword is not None:
+            return route.targets[keyword], "keyword", keyword
+        target = previous if route.default == PREVIOUS_SPEAKER else route.default
+        return target, "default", None
+
+    def note_streamed(self, speaker: str, content: str, keywords: Iterable[str]) -> None:
+        """
+        Remember the keywords found while a reply was streamed, so routing it needs no second scan.
+
+        Args:
+            speaker (str): Agent that produced the reply.
+            content (str): The complete reply.
+            keywords (Iterable[str]): Keywords the incremental scan found in it.
+        """
+        with self._lock:
+            self._streamed[(speaker, content)] = frozenset(keywords)
+            while len(self._streamed) > STREAMED_MATCHES:
+                self._streamed.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get routing counters.
+
+        Returns:
+            Dict[str, int]: Number of decisions per rule, including "fallback" LLM selections.
+        """
+        with self._lock:
+            return dict(self.counts)
+
+    def _executor_for(self, message: Dict[str, Any], previous: Optional[str], groupchat: autogen.GroupChat) -> Optional[str]:
+        """Pick the agent that executes the tool call in message, preferring the previous speaker."""
+        calls = message.get("tool_calls") or [{"function": message["function_call"]}]
+        function_name = calls[0]["function"]["name"]
+        executors = [
+            agent.name for agent in groupchat.agents
+            if hasattr(agent, "can_execute_function") and agent.can_execute_function(function_name)
+        ]
+        if previous in executors:
+            return previous
+        return executors[0] if executors else None
+
+    def _agents(self, groupchat: autogen.GroupChat) -> Dict[str, autogen.Agent]:
+        """Get the cached name -> agent map for a group chat."""
+        key = id(groupchat)
+        with self._lock:
+            entry = self._agent_maps.get(key)
+            if entry is not None and entry[0]() is groupchat and len(entry[1]) == len(groupchat.agents):
+                return entry[1]
+            agents = {
+                member.name: agent for agent in groupchat.agents for member in getattr(agent, "members", ())
+            }
+            agents.update((agent.name, agent) for agent in groupchat.agents)
+            ref = weakref.ref(groupchat, lambda _, key=key: self._agent_maps.pop(key, None))
+            self._agent_maps[key] = (ref, agents)
+            return agents
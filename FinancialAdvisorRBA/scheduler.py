@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Rate-limit-aware scheduling of LLM requests.
+
+All sessions in a process share one LLMScheduler. Before a request goes
+out it reserves room in the requests-per-minute and tokens-per-minute
+buckets, waiting out any shortfall, and then waits for a concurrency slot
+- interactive agent turns are granted slots ahead of background work such
+as retrieval synthesis. A throttled request never holds a slot. Requests
+that hit a rate limit or a transient server error are retried with
+jittered exponential backoff, honouring Retry-After when the provider
+sends one. Queue depth, wait times and retries are exposed by stats().
+"""
+
+import functools
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import autogen
+import openai
+
+from .tracing import _percentile, trace_span
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            per_minute (float): Refill rate per minute.
+            capacity (Optional[float], optional): Burst size. Defaults to one minute's worth.
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take amount from the bucket, going into debt if it is short.
+
+        Args:
+            amount (float): Units to take.
+
+        Returns:
+            float: Seconds to wait before the reserved units are available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Return units to the bucket (positive) or take more (negative) after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._level = min(self.capacity, self._level + amount)
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM request error is a rate limit or transient failure worth retrying."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds the provider asked us to wait, if it said."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(messages: List[Dict[str, Any]], completion_tokens: int = 512) -> int:
+    """Rough token estimate of a request (4 characters per token plus the expected completion)."""
+    return sum(len(str(message.get("content") or "")) for message in messages) // 4 + completion_tokens
+
+class LLMScheduler:
+    """Shared concurrency, rate limiting and backoff for LLM requests."""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0
+    ):
+        """
+        Args:
+            requests_per_minute (float): Request rate limit.
+            tokens_per_minute (float): Token rate limit (prompt plus completion).
+            max_concurrency (int, optional): Requests in flight at once. Defaults to 8.
+            max_retries (int, optional): Retries of a rate-limited or failed request. Defaults to 5.
+            base_delay (float, optional): Backoff ceiling of the first retry in seconds. Defaults to 1.0.
+            max_delay (float, optional): Largest backoff in seconds. Defaults to 30.0.
+        """
+        self.limits = (requests_per_minute, tokens_per_minute, max_concurrency, max_retries, base_delay, max_delay)
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._waiting: List[Tuple[int, int]] = []
+        self._active = 0
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+        self._waits: Dict[int, List[float]] = {}
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "max_queue_depth": 0, "throttled_ms": 0.0}
+
+    def _acquire(self, priority: int) -> None:
+        """Wait for a concurrency slot; lower priorities go first, FIFO within a priority."""
+        ticket = (priority, next(self._tickets))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], len(self._waiting))
+            while self._active >= self.max_concurrency or self._waiting[0] != ticket:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._active += 1
+            self._cond.notify_all()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Full-jitter exponential backoff for a retry, at least the provider's Retry-After."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error) if error is not None else None
+        return max(delay, min(retry_after, self.max_delay)) if retry_after is not None else delay
+
+    def run(
+        self,
+        request: Callable[[], Any],
+        priority: int = INTERACTIVE,
+        estimated_tokens: int = 0,
+        usage: Optional[Callable[[Any], Optional[int]]] = None
+    ) -> Any:
+        """
+        Run an LLM request once rate budget and a slot are available, retrying transient failures.
+
+        Rate budget is reserved before the slot is requested, so a request
+        waiting on the rate limits does not keep a slot from other work.
+        The reservation is refunded if the request fails.
+
+        Args:
+            request (Callable[[], Any]): Makes the request.
+            priority (int, optional): INTERACTIVE or BACKGROUND. Defaults to INTERACTIVE.
+            estimated_tokens (int, optional): Tokens to reserve up front. Defaults to 0.
+            usage (Optional[Callable[[Any], Optional[int]]], optional): Gets the tokens actually used
+                from the result, to settle the reservation. Defaults to None.
+
+        Returns:
+            Any: The request's result.
+
+        Raises:
+            Exception: The request's error, once it is not retryable or retries are exhausted.
+        """
+        queued = time.perf_counter()
+        attempt = 0
+        while True:
+            throttle = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+            if throttle > 0:
+                time.sleep(throttle)
+            self._acquire(priority)
+            try:
+                if attempt == 0:
+                    self._record_wait(priority, (time.perf_counter() - queued) * 1000, throttle * 1000)
+                result = request()
+            except Exception as e:
+                error = e
+                self.requests.adjust(1)
+                self.tokens.adjust(estimated_tokens)
+            else:
+                used = usage(result) if usage is not None else None
+                if used is not None:
+                    self.tokens.adjust(estimated_tokens - used)
+                return result
+            finally:
+                self._release()
+
+            if attempt >= self.max_retries or not is_retryable(error):
+                with self._cond:
+                    self._counters["failures"] += 1
+                raise error
+            delay = self.backoff(attempt, error)
+            attempt += 1
+            with self._cond:
+                self._counters["retries"] += 1
+            logger.warning("LLM request failed (%s); retry %d in %.2fs", type(error).__name__, attempt, delay)
+            with trace_span("llm_backoff", PRIORITY_NAMES.get(priority, str(priority)), attempt=attempt, delay_s=delay):
+                time.sleep(delay)
+
+    def _record_wait(self, priority: int, wait_ms: float, throttled_ms: float) -> None:
+        with self._cond:
+            self._counters["requests"] += 1
+            self._counters["throttled_ms"] += throttled_ms
+            self._waits.setdefault(priority, []).append(wait_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get scheduler metrics.
+
+        Returns:
+            Dict[str, Any]: Current queue depth and active requests, the largest queue seen,
+            request, retry and failure counts, total time spent throttled by the rate limits,
+            and wait time percentiles per priority.
+        """
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "active": self._active,
+                **{key: round(value, 3) if isinstance(value, float) else value for key, value in self._counters.items()},
+                "wait_ms": {
+                    PRIORITY_NAMES.get(priority, str(priority)): {
+                        "count": len(waits),
+                        "p50": round(_percentile(waits, 0.50), 3),
+                        "p95": round(_percentile(waits, 0.95), 3),
+                        "max": round(max(waits), 3)
+                    }
+                    for priority, waits in sorted(self._waits.items())
+                }
+            }
+
+    def reset_stats(self) -> None:
+        """Forget recorded waits and counters."""
+        with self._cond:
+            self._waits.clear()
+            self._counters.update(requests=0, retries=0, failures=0, max_queue_depth=len(self._waiting), throttled_ms=0.0)
+
+_SCHEDULER: Optional[LLMScheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+def configure_llm_scheduler(
+    requests_per_minute: float,
+    tokens_per_minute: float,
+    max_concurrency: int = 8,
+    max_retries: int = 5,
+    base_delay: float = 1.0,
+    max_delay: float = 30.0
+) -> LLMScheduler:
+    """
+    Get the process-wide scheduler, creating it if none exists with these limits.
+
+    Args:
+        requests_per_minute (float): Request rate limit.
+        tokens_per_minute (float): Token rate limit.
+        max_concurrency (int, optional): Requests in flight at once. Defaults to 8.
+        max_retries (int, optional): Retries of a rate-limited or failed request. Defaults to 5.
+        base_delay (float, optional): Backoff ceiling of the first retry in seconds. Defaults to 1.0.
+        max_delay (float, optional): Largest backoff in seconds. Defaults to 30.0.
+
+    Returns:
+        LLMScheduler: Scheduler shared by every session.
+    """
+    global _SCHEDULER
+    limits = (requests_per_minute, tokens_per_minute, max_concurrency, max_retries, base_delay, max_delay)
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None or _SCHEDULER.limits != limits:
+            _SCHEDULER = LLMScheduler(*limits)
+        return _SCHEDULER
+
+def get_llm_scheduler() -> Optional[LLMScheduler]:
+    """Get the process-wide scheduler, or None if requests are not scheduled."""
+    return _SCHEDULER
+
+def schedule_client(client: autogen.OpenAIWrapper, scheduler: LLMScheduler, priority: int = INTERACTIVE) -> None:
+    """
+    Send a client's completions through a scheduler. Safe to call repeatedly.
+
+    Args:
+        client (autogen.OpenAIWrapper): Client to schedule.
+        scheduler (LLMScheduler): Shared scheduler.
+        priority (int, optional): Priority of the client's requests. Defaults to INTERACTIVE.
+    """
+    if client is None or getattr(client, "_scheduled", False):
+        return
+    create = client.create
+
+    def used_tokens(response: Any) -> Optional[int]:
+        usage = getattr(response, "usage", None)
+        return (usage.prompt_tokens or 0) + (usage.completion_tokens or 0) if usage is not None else None
+
+    @functools.wraps(create)
+    def scheduled_create(**config):
+        return scheduler.run(
+            lambda: create(**config),
+            priority=priority,
+            estimated_tokens=estimate_tokens(config.get("messages") or []),
+            usage=used_tokens
+        )
+
+    client.create = scheduled_create
+    client._scheduled = True
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Concurrent Advisory Session Host
+--------------------------------
+Runs many independent advisory group chats at once on top of a single
+loaded market research index and a shared pool of LLM clients.
+
+Client turns arrive through the async API (send/receive) instead of stdin.
+Each session runs its group chat in a worker thread with its own agents and
+message history, so sessions never see each other's state. A session is
+opened for one customer, and its profile tool can read only that
+customer's profile.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+import autogen
+from llama_index.core import VectorStoreIndex
+
+from .agents import create_user_proxy
+from .config import load_config
+from .financialdemo import build_chat_manager
+from .profiles import DEFAULT_CUSTOMER_ID
+from .review import with_panel_members
+from .streaming import EventTokenChannel
+from .utils import configure_profile_store, get_profile_store, initialize_llama_index
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPENING_MESSAGE = "I want to review my portfolio and make new investment strategy for 2025"
+
+# Seconds a session that ended on its own stays readable before it is dropped
+CLOSED_SESSION_TTL = 300.0
+
+class SessionLimitError(RuntimeError):
+    """Raised when opening a session would exceed the concurrent session limit."""
+
+class LLMClientPool:
+    """
+    Shares one OpenAIWrapper per distinct llm_config across all agents.
+
+    Agents with identical LLM settings reuse the same client and therefore
+    the same HTTP connection pool, however many sessions are open.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, autogen.OpenAIWrapper] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, agents: Iterable[autogen.ConversableAgent]) -> None:
+        """
+        Point each agent at the pooled client for its llm_config.
+
+        Args:
+            agents (Iterable[autogen.ConversableAgent]): Agents to rewire.
+        """
+        with self._lock:
+            for agent in agents:
+                if not getattr(agent, "llm_config", False) or agent.client is None:
+                    continue
+                key = json.dumps(agent.llm_config, sort_keys=True, default=str)
+                agent.client = self._clients.setdefault(key, agent.client)
+
+class AdvisorySession:
+    """State of one client's advisory conversation."""
+
+    def __init__(self, session_id: str, loop: asyncio.AbstractEventLoop, customer_id: str = DEFAULT_CUSTOMER_ID):
+        self.id = session_id
+        self.customer_id = customer_id
+        self.status = "running"
+        self.inbox: "queue.Queue[str]" = queue.Queue()
+        self.outbox: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self.future: Optional[asyncio.Future] = None
+        self._loop = loop
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """Deliver an event to the client from any thread."""
+        self._loop.call_soon_threadsafe(self.outbox.put_nowait, {"session_id": self.id, **event})
+
+    def expire(self, sessions: Dict[str, "AdvisorySession"], delay: float) -> None:
+        """Remove this session from sessions after delay seconds, from any thread."""
+        self._loop.call_soon_threadsafe(self._loop.call_later, delay, sessions.pop, self.id, None)
+
+class AdvisoryServer:
+    """Asyncio host for concurrent advisory sessions."""
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        index: VectorStoreIndex,
+        max_sessions: int = 8,
+        input_timeout: float = 900.0
+    ):
+        """
+        Args:
+            config (Dict[str, Any]): Configuration returned by load_config.
+            index (VectorStoreIndex): Market research index shared by every session.
+            max_sessions (int, optional): Maximum number of concurrently open sessions. Defaults to 8.
+            input_timeout (float, optional): Seconds to wait for a client turn before ending the session. Defaults to 900.
+        """
+        self.config = config
+        self.index = index
+        self.max_sessions = max_sessions
+        self.input_timeout = input_timeout
+        self.client_pool = LLMClientPool()
+        self.sessions: Dict[str, AdvisorySession] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_sessions, thread_name_prefix="advisory-session")
+        self._ids = itertools.count(1)
+
+    async def open_session(
+        self,
+        message: str = DEFAULT_OPENING_MESSAGE,
+        customer_id: str = DEFAULT_CUSTOMER_ID
+    ) -> str:
+        """
+        Start a new advisory session.
+
+        Args:
+            message (str, optional): The client's opening message. Defaults to DEFAULT_OPENING_MESSAGE.
+            customer_id (str, optional): Customer the session advises; the session can read only this
+                customer's profile. Defaults to DEFAULT_CUSTOMER_ID.
+
+        Returns:
+            str: Id of the new session.
+
+        Raises:
+            SessionLimitError: If max_sessions sessions are already running.
+            KeyError: If customer_id is not in the profile store.
+            AmbiguousCustomerError: If customer_id is a name shared by several customers.
+        """
+        running = sum(1 for session in self.sessions.values() if session.status == "running")
+        if running >= self.max_sessions:
+            raise SessionLimitError(f"Session limit of {self.max_sessions} reached")
+        if get_profile_store().get_profile(customer_id) is None:
+            raise KeyError(f"Unknown customer: {customer_id}")
+
+        loop = asyncio.get_running_loop()
+        session = AdvisorySession(f"{next(self._ids)}-{uuid.uuid4().hex[:8]}", loop, customer_id)
+        self.sessions[session.id] = session
+        session.future = loop.run_in_executor(self._executor, self._run_session, session, message)
+        return session.id
+
+    async def send(self, session_id: str, text: str) -> None:
+        """
+        Deliver a client turn to a session.
+
+        Args:
+            session_id (str): Target session.
+            text (str): The client's reply.
+        """
+        self._get(session_id).inbox.put(text)
+
+    async def receive(self, session_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Wait for the next event from a session.
+
+        Events are dicts with a "type" of "message" (an agent spoke),
+        "input_request" (the session is waiting for the client) or "closed".
+        With stream_responses on, each agent reply is preceded by "token"
+        events carrying its text as it is generated, a "route" event naming
+        the next speaker once a routing keyword appears, and "restart" if the
+        streamed text is discarded because the reply is being retried.
+
+        A session is forgotten once its "closed" event has been received, or
+        CLOSED_SESSION_TTL seconds after it ended if the client never reads it.
+
+        Args:
+            session_id (str): Source session.
+            timeout (Optional[float], optional): Seconds to wait. Defaults to None (wait indefinitely).
+
+        Returns:
+            Dict[str, Any]: The next event.
+        """
+        event = await asyncio.wait_for(self._get(session_id).outbox.get(), timeout)
+        if event["type"] == "closed":
+            self.sessions.pop(session_id, None)
+        return event
+
+    async def close_session(self, session_id: str) -> None:
+        """
+        End a session and wait for its group chat to stop.
+
+        Closing a session that has already ended and been forgotten is a no-op.
+
+        Args:
+            session_id (str): Session to close.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return
+        session.inbox.put("exit")
+        if session.future is not None:
+            await session.future
+        self.sessions.pop(session_id, None)
+
+    async def shutdown(self) -> None:
+        """Close every session and release the worker threads."""
+        await asyncio.gather(*(self.close_session(session_id) for session_id in list(self.sessions)))
+        self._executor.shutdown(wait=True)
+
+    def _get(self, session_id: str) -> AdvisorySession:
+        """Look up a session, raising KeyError for unknown ids."""
+        try:
+            return self.sessions[session_id]
+        except KeyError:
+            raise KeyError(f"Unknown session: {session_id}") from None
+
+    def _run_session(self, session: AdvisorySession, message: str) -> None:
+        """Run one group chat to completion. Executes in a worker thread."""
+        def read_input(prompt: str) -> str:
+            session.emit({"type": "input_request", "prompt": prompt})
+            try:
+                return session.inbox.get(timeout=self.input_timeout)
+            except queue.Empty:
+                logger.info("Session %s timed out waiting for input", session.id)
+                return "exit"
+
+        def forward(sender, message, recipient, silent):
+            if recipient is manager:
+                content = message.get("content") if isinstance(message, dict) else message
+                session.emit({"type": "message", "speaker": sender.name, "content": content})
+            return message
+
+        error = None
+        try:
+            user_proxy = create_user_proxy(input_fn=read_input)
+            token_channel = EventTokenChannel(session.emit) if self.config.get("stream_responses") else None
+            manager = build_chat_manager(
+                self.config, self.index, user_proxy, token_channel=token_channel, customer_id=session.customer_id
+            )
+            self.client_pool.attach([manager, *with_panel_members(manager.groupchat.agents)])
+            for agent in manager.groupchat.agents:
+                agent.register_hook("process_message_before_send", forward)
+            user_proxy.initiate_chat(manager, message=message)
+        except Exception as e:
+            logger.error(f"Session {session.id} failed: {str(e)}")
+            error = str(e)
+        finally:
+            session.status = "closed"
+            session.emit({"type": "closed", "error": error})
+            # Sessions that end by exit or input timeout are not closed by the
+            # client, so drop them here once the client has had time to drain
+            session.expire(self.sessions, CLOSED_SESSION_TTL)
+
+async def create_server(max_sessions: int = 8) -> AdvisoryServer:
+    """
+    Load configuration and the shared index, then build a session host.
+
+    Args:
+        max_sessions (int, optional): Maximum number of concurrently open sessions. Defaults to 8.
+
+    Returns:
+        AdvisoryServer: Ready-to-use session host.
+
+    Raises:
+        RuntimeError: If configuration or the index cannot be loaded.
+    """
+    config = load_config()
+    if config is None:
+        raise RuntimeError("Failed to load configuration")
+    index = await asyncio.to_thread(
+        initialize_llama_index, config["pdf_dir"], config["index_dir"], config["vector_dtype"]
+    )
+    if index is None:
+        raise RuntimeError("Failed to initialize LlamaIndex")
+    configure_profile_store(config["profile_db"])
+    return AdvisoryServer(config, index, max_sessions=max_sessions)
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Token streaming of agent replies.
+
+Agent turns are requested from the API as a stream, and each piece of the
+reply is passed to a TokenChannel (the console, or a session's event
+queue) as it arrives, instead of the whole message appearing once the
+completion ends. The reply is scanned for the speaker's routing keywords
+while it streams, so the next speaker is known - and announced to the
+channel - as soon as the trigger phrase appears; the speaker router then
+reuses that result instead of scanning the finished message again.
+
+Usage, token counts and the returned completion are the same as for a
+non-streamed call, so model tiers, the scheduler and tracing are
+unaffected.
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import autogen
+from autogen.formatting_utils import colored
+from autogen.io.base import IOStream
+from autogen.oai.client import OpenAIClient
+from openai.types.chat import ChatCompletion
+
+from .tracing import trace_span
+
+class TokenChannel:
+    """
+    Receives agent replies as they are generated. Override the callbacks you need.
+
+    For each reply the callbacks run in order: start, then any number of token,
+    route and restart, then end. They run on the thread generating the reply,
+    so replies generated concurrently (a review panel's) may interleave.
+    """
+
+    def start(self, speaker: str) -> None:
+        """An agent has sent a request for its reply."""
+
+    def token(self, speaker: str, text: str) -> None:
+        """The next piece of the reply has arrived."""
+
+    def route(self, speaker: str, keyword: str, target: Optional[str]) -> None:
+        """A routing keyword appeared in the reply, deciding the next speaker."""
+
+    def restart(self, speaker: str) -> None:
+        """The text streamed so far is discarded and the reply is being generated again (retry or larger model)."""
+
+    def end(self, speaker: str, content: str) -> None:
+        """The reply is complete; content is everything streamed, or "" if nothing was."""
+
+class ConsoleTokenChannel(TokenChannel):
+    """
+    Prints replies to the console as they stream, in the group chat manager's usual format.
+
+    Replies streamed at the same time, such as a review panel's, are printed
+    one after another: the first to produce text is shown live and the others
+    are held back until it ends.
+    """
+
+    def __init__(self):
+        self.recipient = "chat_manager"
+        self._shown: Dict[str, str] = {}
+        self._open: Optional[str] = None
+        self._held: Dict[str, List[str]] = {}
+        self._ended: Dict[str, str] = {}
+        self._lock = threading.RLock()
+
+    def attach(self, manager: autogen.GroupChatManager) -> None:
+        """
+        Stop the manager from printing replies a second time once they have streamed.
+
+        Args:
+            manager (autogen.GroupChatManager): Manager of the streamed group chat.
+        """
+        self.recipient = manager.name
+        print_received = manager._print_received_message
+
+        @functools.wraps(print_received)
+        def print_unless_streamed(message, sender):
+            with self._lock:
+                shown = self._shown.pop(sender.name, None)
+            content = message
+            if isinstance(message, dict):
+                if message.get("tool_calls") or message.get("function_call"):
+                    shown = None
+                content = message.get("content")
+            if shown is None or content != shown:
+                print_received(message, sender)
+
+        manager._print_received_message = print_unless_streamed
+
+    def token(self, speaker: str, text: str) -> None:
+        with self._lock:
+            if self._open is None:
+                self._open_reply(speaker)
+            if self._open == speaker:
+                IOStream.get_default().print(text, end="", flush=True)
+            else:
+                self._held.setdefault(speaker, []).append(text)
+
+    def restart(self, speaker: str) -> None:
+        with self._lock:
+            if self._open == speaker:
+                IOStream.get_default().print("\n", colored("(retrying the reply)", "red"), flush=True, sep="")
+                self._open = None
+                self._release_held()
+            else:
+                self._held.pop(speaker, None)
+
+    def end(self, speaker: str, content: str) -> None:
+        with self._lock:
+            if self._open == speaker:
+                self._close_reply(speaker, content)
+                self._release_held()
+            elif speaker in self._held:
+                self._ended[speaker] = content
+            else:
+                self._shown.pop(speaker, None)
+
+    def _open_reply(self, speaker: str) -> None:
+        IOStream.get_default().print(colored(speaker, "yellow"), "(to", f"{self.recipient}):\n", flush=True)
+        self._open = speaker
+
+    def _close_reply(self, speaker: str, content: str) -> None:
+        IOStream.get_default().print("\n\n", "-" * 80, flush=True, sep="")
+        self._shown[speaker] = content
+        self._open = None
+
+    def _release_held(self) -> None:
+        """Print held replies in arrival order, leaving the first unfinished one streaming live."""
+        while self._held and self._open is None:
+            speaker = next(iter(self._held))
+            self._open_reply(speaker)
+            IOStream.get_default().print("".join(self._held.pop(speaker)), end="", flush=True)
+            if speaker in self._ended:
+                self._close_reply(speaker, self._ended.pop(speaker))
+
+class EventTokenChannel(TokenChannel):
+    """
+    Turns streamed replies into event dicts for a callback, e.g. a session's event queue.
+
+    Events have a "type" of "token" (with "text"), "route" (with "keyword" and
+    "next_speaker") or "restart", and the "speaker" they belong to.
+    """
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        """
+        Args:
+            emit (Callable[[Dict[str, Any]], None]): Called with each event.
+        """
+        self.emit = emit
+
+    def token(self, speaker: str, text: str) -> None:
+        self.emit({"type": "token", "speaker": speaker, "text": text})
+
+    def route(self, speaker: str, keyword: str, target: Optional[str]) -> None:
+        self.emit({"type": "route", "speaker": speaker, "keyword": keyword, "next_speaker": target})
+
+    def restart(self, speaker: str) -> None:
+        self.emit({"type": "restart", "speaker": speaker})
+
+class _ReplyStream:
+    """One agent turn being streamed: forwards tokens and scans them for routing keywords."""
+
+    def __init__(self, speaker: str, channel: TokenChannel, router: Optional[Any]):
+        self.speaker = speaker
+        self.channel = channel
+        self.router = router
+        self.route = router.routes.get(speaker) if router is not None else None
+        self.started = time.perf_counter()
+        self.first_token_ms: Optional[float] = None
+        self.route_ms: Optional[float] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pieces = []
+        self.keyword: Optional[str] = None
+        self.scanner = self.route.scanner() if self.route is not None else None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.pieces)
+
+    def begin(self) -> None:
+        """A streamed request is starting; discard the text of an earlier, abandoned attempt."""
+        if self.pieces:
+            self.channel.restart(self.speaker)
+            self._reset()
+
+    def token(self, text: str) -> None:
+        """Forward a piece of the reply and check whether it settles the next speaker."""
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self.started) * 1000
+        self.pieces.append(text)
+        self.channel.token(self.speaker, text)
+        if self.scanner is not None and self.scanner.feed(text):
+            keyword = self.route.best(self.scanner.found)
+            if keyword != self.keyword:
+                self.keyword = keyword
+                self.route_ms = (time.perf_counter() - self.started) * 1000
+                self.channel.route(self.speaker, keyword, self.route.targets[keyword])
+
+    def finish(self) -> None:
+        """Hand the complete reply to the channel and its keywords to the router."""
+        text = self.text
+        if text and self.scanner is not None:
+            self.router.note_streamed(self.speaker, text, self.scanner.found)
+        self.channel.end(self.speaker, text)
+
+# The turn being streamed on this thread, read by StreamingOpenAIClient
+_ACTIVE_STREAM: ContextVar[Optional[_ReplyStream]] = ContextVar("active_stream", default=None)
+
+class StreamingOpenAIClient(OpenAIClient):
+    """
+    OpenAI client that streams chat completions while an agent turn is being streamed.
+
+    Outside a streamed turn, and for requests it cannot stream (several choices,
+    legacy function calling), it behaves exactly like OpenAIClient. Streamed
+    requests ask for usage in the final chunk, so token counts and cost match a
+    non-streamed call.
+    """
+
+    def create(self, params: Dict[str, Any]) -> ChatCompletion:
+        stream = _ACTIVE_STREAM.get()
+        if stream is None or "messages" not in params or params.get("n", 1) != 1 or params.get("functions"):
+            return super().create(params)
+
+        params = {**params, "stream": True, "stream_options": {"include_usage": True}}
+        stream.begin()
+        pieces, tool_calls = [], {}
+        finish_reason, usage, last = None, None, None
+        for chunk in self._oai_client.chat.completions.create(**params):
+            last = chunk
+            if chunk.usage is not None:
+                usage = chunk.usage.model_dump()
+            for choice in chunk.choices:
+                finish_reason = choice.finish_reason or finish_reason
+                delta = choice.delta
+                if delta.content:
+                    pieces.append(delta.content)
+                    stream.token(delta.content)
+                for call in delta.tool_calls or []:
+                    entry = tool_calls.setdefault(
+                        call.index, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}}
+                    )
+                    entry["id"] = call.id or entry["id"]
+                    if call.function is not None:
+                        entry["function"]["name"] += call.function.name or ""
+                        entry["function"]["arguments"] += call.function.arguments or ""
+        if last is None:
+            raise RuntimeError("The completion stream ended without any chunks")
+
+        message = {"role": "assistant", "content": "".join(pieces) if pieces or not tool_calls else None}
+        if tool_calls:
+            message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+        return ChatCompletion.model_validate({
+            "id": last.id,
+            "object": "chat.completion",
+            "created": last.created,
+            "model": last.model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason or "stop", "logprobs": None}],
+            "usage": usage
+        })
+
+def use_streaming_client(client: autogen.OpenAIWrapper) -> None:
+    """
+    Let an OpenAIWrapper's OpenAI clients stream agent turns. Safe to call repeatedly.
+
+    Args:
+        client (autogen.OpenAIWrapper): Wrapper whose OpenAIClient instances are replaced.
+    """
+    client._clients = [
+        StreamingOpenAIClient(c._oai_client) if type(c) is OpenAIClient else c
+        for c in client._clients
+    ]
+
+@contextmanager
+def streamed_reply(speaker: str, channel: TokenChannel, router: Optional[Any] = None) -> Iterator[_ReplyStream]:
+    """
+    Stream the completions requested on this thread to a channel until the block exits.
+
+    Args:
+        speaker (str): Agent whose reply is being generated.
+        channel (TokenChannel): Where the reply goes as it arrives.
+        router (Optional[Any], optional): SpeakerRouter whose keyword table is scanned. Defaults to None.
+
+    Yields:
+        _ReplyStream: The turn being streamed.
+    """
+    stream = _ReplyStream(speaker, channel, router)
+    token = _ACTIVE_STREAM.set(stream)
+    channel.start(speaker)
+    try:
+        yield stream
+    finally:
+        _ACTIVE_STREAM.reset(token)
+        stream.finish()
+
+def stream_replies(agent: autogen.ConversableAgent, channel: TokenChannel, router: Optional[Any] = None) -> None:
+    """
+    Stream an agent's LLM replies to a channel.
+
+    Call after registering the agent's tools, since registration replaces its
+    client. The channel is looked up on the calling agent, so clients shared
+    between sessions still deliver each session's replies to its own channel.
+
+    Args:
+        agent (autogen.ConversableAgent): Agent whose replies are streamed.
+        channel (TokenChannel): Where the replies go as they arrive.
+        router (Optional[Any], optional): SpeakerRouter deciding the next speaker from the reply's
+            keywords. Defaults to None (no incremental routing).
+    """
+    agent._token_stream = (channel, router)
+    client = getattr(agent, "client", None)
+    if client is None or getattr(client, "_streaming", False):
+        return
+    use_streaming_client(client)
+    create = client.create
+
+    @functools.wraps(create)
+    def streaming_create(**config):
+        caller = config.get("agent") or agent
+        target = getattr(caller, "_token_stream", None)
+        if target is None or _ACTIVE_STREAM.get() is not None:
+            return create(**config)
+        with trace_span("stream", caller.name) as span, streamed_reply(caller.name, *target) as stream:
+            try:
+                return create(**config)
+            finally:
+                if span is not None:
+                    span.set(first_token_ms=stream.first_token_ms, route_ms=stream.route_ms, keyword=stream.keyword)
+
+    client.create = streaming_create
+    client._streaming = True
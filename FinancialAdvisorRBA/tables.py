@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Numeric tables from research PDFs, held in a columnar store.
+
+Tables of returns, yields and forecasts are detected in the layout-preserving
+text of each PDF page at ingestion time. Every numeric cell becomes one row
+of a set of NumPy column arrays (source, page, table title, row label,
+column label, value), persisted as a single .npz file next to the index.
+
+lookup_figures answers questions such as "HSI 2025 EPS growth forecast"
+with the exact tabulated figures, without retrieval or an LLM call.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from pypdf import PdfReader
+
+from .retrieval import tokenize
+
+# Name of the persisted table store inside an index directory
+TABLE_STORE_FILE = "tables.npz"
+
+# Columns of the store and their dtypes
+_COLUMNS = {
+    "source": object,
+    "page": np.int32,
+    "title": object,
+    "row": object,
+    "column": object,
+    "value": np.float64,
+    "text": object,
+}
+
+_CELL_SPLIT = re.compile(r"\s{2,}")
+_FIGURE = re.compile(r"(?<![\w.])\(?[-+–−]?\d[\d,]*(?:\.\d+)?\)?%?(?![\w])")
+_NUMBER = re.compile(r"^\(?[-+–−]?\$?\d[\d,]*(?:\.\d+)?\)?\s*(%|x|bp|bps|pp)?$", re.IGNORECASE)
+_MISSING = frozenset({"-", "–", "n/a", "na", "n.a.", "nm", "n.m."})
+# Forecast and estimate suffixes on years ("2025F", "2025E") are matched as the plain year
+_YEAR_SUFFIX = re.compile(r"^(20\d{2})[fe]$")
+_YEAR = re.compile(r"^(?:19|20)\d{2}$")
+# Row labels and header cells longer than this are prose beside a chart, not a table
+MAX_LABEL_WORDS = 8
+
+def _is_number(cell: str) -> bool:
+    """Whether a cell holds a figure or a missing-figure marker."""
+    return bool(_NUMBER.match(cell)) or cell.lower() in _MISSING
+
+def _parse_number(cell: str) -> float:
+    """Convert a figure cell to a float; parentheses mean negative, markers mean NaN."""
+    if cell.lower() in _MISSING:
+        return float("nan")
+    negative = cell.startswith("(") and ")" in cell
+    digits = re.sub(r"[^\d.\-+]", "", cell.replace("–", "-").replace("−", "-"))
+    value = float(digits)
+    return -abs(value) if negative else value
+
+def _data_row(line: str) -> Optional[Tuple[str, List[str]]]:
+    """
+    Split a layout line into a label and its trailing run of figure cells.
+
+    Returns None for lines that are not table rows: header lines whose only
+    figures are years, and prose lines that happen to end in numbers.
+    """
+    cells = [cell for cell in _CELL_SPLIT.split(line.strip()) if cell]
+    count = 0
+    while count < len(cells) and _is_number(cells[-1 - count]):
+        count += 1
+    label, figures = " ".join(cells[:len(cells) - count]), cells[len(cells) - count:]
+    if not label or not figures or all(_YEAR.match(cell) for cell in figures):
+        return None
+    if len(label.split()) > MAX_LABEL_WORDS or label.rstrip().endswith((".", ",", ";")):
+        return None
+    return label, figures
+
+def parse_layout_tables(text: str, page: int = 0) -> List[Dict[str, Any]]:
+    """
+    Find numeric tables in layout-preserving page text.
+
+    A table is a header line followed by at least two rows that start with a
+    label and end with the same number of figure cells; single blank lines
+    between rows are allowed. Header cells are aligned to the figure columns
+    from the right, and the nearest line above the header is taken as the title.
+
+    Args:
+        text (str): Page text with columns separated by runs of spaces.
+        page (int, optional): Page number recorded on each table. Defaults to 0.
+
+    Returns:
+        List[Dict[str, Any]]: Tables with page, title, columns and rows of (label, figure cells).
+    """
+    lines = text.splitlines()
+    tables = []
+    i = 0
+    while i < len(lines):
+        row = _data_row(lines[i])
+        if row is None:
+            i += 1
+            continue
+        width = len(row[1])
+        start = i
+        rows = []
+        while i < len(lines):
+            row = _data_row(lines[i])
+            if row is not None and len(row[1]) == width:
+                rows.append(row)
+                i += 1
+                continue
+            following = _data_row(lines[i + 1]) if i + 1 < len(lines) else None
+            if not lines[i].strip() and following is not None and len(following[1]) == width:
+                i += 1
+                continue
+            break
+        if len(rows) < 2:
+            i = start + 1
+            continue
+
+        header, title = None, ""
+        above = [line.strip() for line in lines[max(0, start - 4):start] if line.strip()]
+        if above:
+            cells = [cell for cell in _CELL_SPLIT.split(above[-1]) if cell]
+            if len(cells) >= width and all(len(cell.split()) <= MAX_LABEL_WORDS for cell in cells[-width:]):
+                header = cells[-width:]
+                above = above[:-1]
+            if above:
+                title = _CELL_SPLIT.sub(" ", above[-1])
+        tables.append({
+            "page": page,
+            "title": title,
+            "columns": header or [f"column {n + 1}" for n in range(width)],
+            "rows": rows
+        })
+    return tables
+
+def candidate_pages(texts: List[str], min_rows: int = 3) -> List[int]:
+    """
+    Pick the pages worth a layout pass, from their plain extracted text.
+
+    Args:
+        texts (List[str]): Plain text of each page, in order.
+        min_rows (int, optional): Short lines with two or more figures a page needs. Defaults to 3.
+
+    Returns:
+        List[int]: 1-based numbers of pages that may hold numeric tables.
+    """
+    def is_row(line: str) -> bool:
+        figures = len(_FIGURE.findall(line))
+        return figures >= 2 and len(line.split()) - figures <= MAX_LABEL_WORDS
+
+    return [
+        number for number, text in enumerate(texts, start=1)
+        if sum(map(is_row, text.splitlines())) >= min_rows
+    ]
+
+def extract_tables(path: Path, pages: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Extract numeric tables from a PDF.
+
+    Layout-preserving extraction is several times slower than plain text,
+    so callers that already have the page texts should pass candidate_pages.
+
+    Args:
+        path (Path): PDF file.
+        pages (Optional[List[int]], optional): 1-based pages to scan. Defaults to None (every page).
+
+    Returns:
+        List[Dict[str, Any]]: Tables as returned by parse_layout_tables; empty for non-PDF files.
+    """
+    if Path(path).suffix.lower() != ".pdf":
+        return []
+    reader = PdfReader(str(path))
+    numbers = pages if pages is not None else range(1, len(reader.pages) + 1)
+    tables = []
+    for number in numbers:
+        text = reader.pages[number - 1].extract_text(extraction_mode="layout")
+        tables.extend(parse_layout_tables(text, number))
+    return tables
+
+def _terms(text: str) -> List[str]:
+    """Lookup terms for a label: keyword terms plus the acronym of multi-word labels ("Hang Seng Index" -> "hsi")."""
+    terms = [_YEAR_SUFFIX.sub(r"\1", term) for term in tokenize(text)]
+    words = re.findall(r"[A-Za-z]+", text)
+    if len(words) >= 2:
+        terms.append("".join(word[0] for word in words).lower())
+    return terms
+
+class TableStore:
+    """Columnar store of tabulated figures with a term index for lookups."""
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Args:
+            columns (Optional[Dict[str, np.ndarray]], optional): Column arrays, as saved by save. Defaults to None (empty).
+        """
+        self.columns = columns or {name: np.empty(0, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._terms: Optional[Dict[str, Dict[str, np.ndarray]]] = None
+
+    def __len__(self) -> int:
+        return len(self.columns["value"])
+
+    def sources(self) -> List[str]:
+        """Source files with figures in the store."""
+        return sorted(set(self.columns["source"]))
+
+    def add(self, source: str, tables: List[Dict[str, Any]]) -> None:
+        """
+        Add a file's tables, replacing any figures previously stored for it.
+
+        Args:
+            source (str): Source file name.
+            tables (List[Dict[str, Any]]): Tables from extract_tables.
+        """
+        self.remove(source)
+        records = {name: [] for name in _COLUMNS}
+        for table in tables:
+            for label, figures in table["rows"]:
+                for column, cell in zip(table["columns"], figures):
+                    records["source"].append(source)
+                    records["page"].append(table["page"])
+                    records["title"].append(table["title"])
+                    records["row"].append(label)
+                    records["column"].append(column)
+                    records["value"].append(_parse_number(cell))
+                    records["text"].append(cell)
+        if records["value"]:
+            self.columns = {
+                name: np.concatenate([self.columns[name], np.array(values, dtype=_COLUMNS[name])])
+                for name, values in records.items()
+            }
+            self._terms = None
+
+    def remove(self, source: str) -> None:
+        """
+        Drop every figure from a source file.
+
+        Args:
+            source (str): Source file name.
+        """
+        keep = self.columns["source"] != source
+        if not keep.all():
+            self.columns = {name: values[keep] for name, values in self.columns.items()}
+            self._terms = None
+
+    def save(self, path: Path) -> None:
+        """
+        Atomically write the store as a compressed .npz file.
+
+        Args:
+            path (Path): Destination file.
+        """
+        tmp_path = Path(path).with_suffix(".tmp.npz")
+        # Text columns are stored as fixed-width unicode so the file loads without pickle
+        np.savez_compressed(tmp_path, **{
+            name: values.astype(str) if _COLUMNS[name] is object else values
+            for name, values in self.columns.items()
+        })
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "TableStore":
+        """
+        Load a store written by save.
+
+        Args:
+            path (Path): .npz file.
+
+        Returns:
+            TableStore: Restored store.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls({
+                name: data[name].astype(object) if dtype is object else data[name].astype(dtype)
+                for name, dtype in _COLUMNS.items()
+            })
+
+    def _term_index(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """Map each term to the record numbers whose row, column or title contain it."""
+        if self._terms is None:
+            index: Dict[str, Dict[str, List[int]]] = {"row": {}, "column": {}, "title": {}}
+            for field, postings in index.items():
+                cache: Dict[str, List[str]] = {}
+                for record, text in enumerate(self.columns[field]):
+                    terms = cache.get(text)
+                    if terms is None:
+                        terms = cache[text] = list(set(_terms(text)))
+                    for term in terms:
+                        postings.setdefault(term, []).append(record)
+            self._terms = {
+                field: {term: np.array(records, dtype=np.int64) for term, records in postings.items()}
+                for field, postings in index.items()
+            }
+        return self._terms
+
+    def lookup(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find the figures best matching a question.
+
+        Row and column label matches weigh twice as much as title matches;
+        a figure must match the question on its row label to be returned.
+
+        Args:
+            query (str): Question naming an index, metric and period, e.g. "HSI 2025 EPS growth forecast".
+            limit (int, optional): Maximum figures returned. Defaults to 5.
+
+        Returns:
+            List[Dict[str, Any]]: Figures with source, page, title, row, column, value and text, best first.
+        """
+        if not len(self):
+            return []
+        index = self._term_index()
+        scores = np.zeros(len(self), dtype=np.float64)
+        row_hits = np.zeros(len(self), dtype=bool)
+        for term in set(_terms(query)):
+            for field, weight in (("row", 2.0), ("column", 2.0), ("title", 1.0)):
+                records = index[field].get(term)
+                if records is not None:
+                    scores[records] += weight
+                    if field == "row":
+                        row_hits[records] = True
+        scores[~row_hits] = 0.0
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return []
+        best = candidates[np.argsort(-scores[candidates], kind="stable")[:limit]]
+        return [
+            {
+                "source": self.columns["source"][i],
+                "page": int(self.columns["page"][i]),
+                "table": self.columns["title"][i],
+                "row": self.columns["row"][i],
+                "column": self.columns["column"][i],
+                "value": None if np.isnan(self.columns["value"][i]) else float(self.columns["value"][i]),
+                "text": self.columns["text"][i]
+            }
+            for i in best
+        ]
+
+def lookup_figures(store: Optional[TableStore], query: str, limit: int = 5) -> str:
+    """
+    Answer a question with exact tabulated figures.
+
+    Args:
+        store (Optional[TableStore]): Table store of the market research index.
+        query (str): Question naming an index, metric and period.
+        limit (int, optional): Maximum figures returned. Defaults to 5.
+
+    Returns:
+        str: JSON list of matching figures, or a message if none match.
+    """
+    matches = store.lookup(query, limit) if store is not None else []
+    if not matches:
+        return f"No tabulated figure matches '{query}'. Use query_market_data for a narrative answer."
+    return json.dumps(matches)
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Span tracing for advisory sessions.
+
+Every agent reply, LLM call, tool call, speaker-selection decision and
+index query is recorded as a span with its duration and attributes
+(token counts, cache hits, the routing rule and keyword that fired).
+Spans are appended to a JSONL file and can optionally be fed to an
+in-process aggregator that reports p50/p95 latency per agent and tool.
+
+Spans nest through a context variable, so code deep inside a tool (such
+as the index query) can open a child span with trace_span() without
+being handed a tracer. Outside a traced chat, trace_span() is a no-op.
+
+Summarize a trace file with:
+    python -m FinancialAdvisorRBA.tracing traces.jsonl
+"""
+
+import argparse
+import functools
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import autogen
+
+_CURRENT_SPAN: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+class Span:
+    """One timed operation and its attributes."""
+
+    __slots__ = ("tracer", "kind", "name", "span_id", "parent_id", "start", "attributes")
+
+    def __init__(self, tracer: Optional["Tracer"], kind: str, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.kind = kind
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.attributes = attributes
+
+    def set(self, **attributes: Any) -> None:
+        """Attach attributes to the span."""
+        self.attributes.update(attributes)
+
+    def add_tokens(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Accumulate token counts on the span."""
+        self.attributes["prompt_tokens"] = self.attributes.get("prompt_tokens", 0) + prompt_tokens
+        self.attributes["completion_tokens"] = self.attributes.get("completion_tokens", 0) + completion_tokens
+
+class TraceSink:
+    """Append-only JSONL file of finished spans, shared by every session."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Append one span record."""
+        line = json.dumps(record, default=str)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+@lru_cache(maxsize=None)
+def open_trace_sink(path: Path) -> TraceSink:
+    """
+    Get the shared trace writer for a path.
+
+    Args:
+        path (Path): JSONL trace file.
+
+    Returns:
+        TraceSink: Writer shared by every session in the process.
+    """
+    return TraceSink(path)
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+class SpanAggregator:
+    """In-process latency and token statistics per span kind and name."""
+
+    def __init__(self):
+        self._durations: Dict[str, List[float]] = {}
+        self._tokens: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Add a finished span record."""
+        key = f"{record['kind']}:{record['name']}"
+        with self._lock:
+            self._durations.setdefault(key, []).append(record["duration_ms"])
+            tokens = self._tokens.setdefault(key, [0, 0])
+            tokens[0] += record.get("prompt_tokens", 0)
+            tokens[1] += record.get("completion_tokens", 0)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get latency percentiles and token totals.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Per "kind:name" key, the span count, p50/p95/max and
+            total duration in milliseconds, and prompt/completion token totals.
+        """
+        with self._lock:
+            return {
+                key: {
+                    "count": len(durations),
+                    "p50_ms": round(_percentile(durations, 0.50), 3),
+                    "p95_ms": round(_percentile(durations, 0.95), 3),
+                    "max_ms": round(max(durations), 3),
+                    "total_ms": round(sum(durations), 3),
+                    "prompt_tokens": self._tokens[key][0],
+                    "completion_tokens": self._tokens[key][1]
+                }
+                for key, durations in sorted(self._durations.items())
+            }
+
+    def reset(self) -> None:
+        """Forget all recorded spans."""
+        with self._lock:
+            self._durations.clear()
+            self._tokens.clear()
+
+# Process-wide aggregator, fed by tracers created with aggregate enabled
+trace_aggregator = SpanAggregator()
+
+class Tracer:
+    """Creates spans for one advisory session and exports them when they finish."""
+
+    def __init__(
+        self,
+        sink: Optional[TraceSink] = None,
+        aggregator: Optional[SpanAggregator] = None,
+        trace_id: Optional[str] = None
+    ):
+        """
+        Args:
+            sink (Optional[TraceSink], optional): Where finished spans are written. Defaults to None.
+            aggregator (Optional[SpanAggregator], optional): In-process statistics to update. Defaults to None.
+            trace_id (Optional[str], optional): Id shared by every span of the session. Defaults to a random id.
+        """
+        self.sink = sink
+        self.aggregator = aggregator
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time a block of code as a child of the current span.
+
+        Args:
+            kind (str): Span category, e.g. "agent_reply", "llm", "tool", "speaker_selection", "index_query".
+            name (str): Agent, tool or component name.
+            **attributes: Initial span attributes.
+
+        Yields:
+            Span: The open span, for attaching attributes.
+        """
+        span = Span(self, kind, name, _CURRENT_SPAN.get(), attributes)
+        token = _CURRENT_SPAN.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _CURRENT_SPAN.reset(token)
+            self._export(span, duration_ms)
+
+    def _export(self, span: Span, duration_ms: float) -> None:
+        """Send a finished span to the sink and aggregator."""
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "kind": span.kind,
+            "name": span.name,
+            "start": span.start,
+            "duration_ms": round(duration_ms, 3),
+            **span.attributes
+        }
+        if self.sink is not None:
+            self.sink.write(record)
+        if self.aggregator is not None:
+            self.aggregator.add(record)
+
+@contextmanager
+def trace_span(kind: str, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Open a child span of the current span, if any.
+
+    Args:
+        kind (str): Span category.
+        name (str): Component name.
+        **attributes: Initial span attributes.
+
+    Yields:
+        Optional[Span]: The open span, or None when no trace is active.
+    """
+    parent = _CURRENT_SPAN.get()
+    if parent is None or parent.tracer is None:
+        yield None
+        return
+    with parent.tracer.span(kind, name, **attributes) as span:
+        yield span
+
+def _instrument_client(client: autogen.OpenAIWrapper) -> None:
+    """Record each completion as an "llm" span with its token usage. Safe to call repeatedly."""
+    if client is None or getattr(client, "_traced", False):
+        return
+    create = client.create
+
+    @functools.wraps(create)
+    def traced_create(**config):
+        agent = config.get("agent")
+        with trace_span("llm", getattr(agent, "name", "unknown")) as span:
+            response = create(**config)
+            usage = getattr(response, "usage", None)
+            if span is not None:
+                span.set(model=getattr(response, "model", None))
+                if usage is not None:
+                    span.add_tokens(usage.prompt_tokens or 0, usage.completion_tokens or 0)
+            return response
+
+    client.create = traced_create
+    client._traced = True
+
+def instrument_agent(agent: autogen.ConversableAgent, tracer: Tracer) -> None:
+    """
+    Trace an agent's replies, LLM calls and tool executions.
+
+    Args:
+        agent (autogen.ConversableAgent): Agent to instrument.
+        tracer (Tracer): Session tracer.
+    """
+    generate_reply = agent.generate_reply
+    execute_function = agent.execute_function
+
+    @functools.wraps(generate_reply)
+    def traced_generate_reply(*args, **kwargs):
+        sender = kwargs.get("sender")
+        with tracer.span("agent_reply", agent.name, sender=getattr(sender, "name", None)) as span:
+            reply = generate_reply(*args, **kwargs)
+            if isinstance(reply, dict) and reply.get("tool_calls"):
+                span.set(tool_calls=[call["function"]["name"] for call in reply["tool_calls"]])
+            return reply
+
+    @functools.wraps(execute_function)
+    def traced_execute_function(func_call, *args, **kwargs):
+        with tracer.span("tool", func_call.get("name", "unknown"), executor=agent.name) as span:
+            success, result = execute_function(func_call, *args, **kwargs)
+            span.set(success=success, result_chars=len(str(result.get("content", ""))))
+            return success, result
+
+    agent.generate_reply = traced_generate_reply
+    agent.execute_function = traced_execute_function
+    _instrument_client(getattr(agent, "client", None))
+
+def instrument_chat(manager: autogen.GroupChatManager, tracer: Tracer) -> None:
+    """
+    Trace a whole group chat: the chat itself and every agent in it.
+
+    Speaker selection is traced separately with trace_speaker_selection, because
+    the manager keeps its own copy of the GroupChat once it is created.
+
+    Args:
+        manager (autogen.GroupChatManager): Manager of the session's group chat.
+        tracer (Tracer): Session tracer.
+    """
+    groupchat = manager.groupchat
+    for agent in groupchat.agents:
+        instrument_agent(agent, tracer)
+
+    run_chat = manager.generate_reply
+
+    @functools.wraps(run_chat)
+    def traced_run_chat(*args, **kwargs):
+        with tracer.span("chat", manager.name, agents=len(groupchat.agents)) as span:
+            reply = run_chat(*args, **kwargs)
+            span.set(rounds=len(groupchat.messages))
+            return reply
+
+    manager.generate_reply = traced_run_chat
+
+def trace_speaker_selection(select: Callable, tracer: Tracer, router: Optional[Any] = None) -> Callable:
+    """
+    Wrap a speaker selection function so each decision is recorded as a span.
+
+    Args:
+        select (Callable): Speaker selection function for a GroupChat.
+        tracer (Tracer): Session tracer.
+        router (Optional[Any], optional): Speaker router whose last_decision, kept per thread,
+            gives the rule and keyword behind each selection. Defaults to None.
+
+    Returns:
+        Callable: Traced selection function to pass as speaker_selection_method.
+    """
+    @functools.wraps(select)
+    def traced_select(last_speaker, groupchat):
+        with tracer.span("speaker_selection", last_speaker.name) as span:
+            choice = select(last_speaker, groupchat)
+            span.set(target=getattr(choice, "name", choice))
+            decision = getattr(router, "last_decision", None)
+            if decision and decision.get("speaker") == last_speaker.name:
+                span.set(rule=decision.get("rule"), keyword=decision.get("keyword"))
+            return choice
+
+    return traced_select
+
+def summarize_trace_file(path: Path) -> Dict[str, Dict[str, float]]:
+    """
+    Aggregate a JSONL trace file.
+
+    Args:
+        path (Path): Trace file written by a TraceSink.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Same format as SpanAggregator.summary.
+    """
+    aggregator = SpanAggregator()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                aggregator.add(json.loads(line))
+    return aggregator.summary()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summarize span latency and tokens from a trace file")
+    parser.add_argument("trace_file", type=Path, help="JSONL trace file")
+    parser.add_argument("--kind", help="Only show spans of this kind, e.g. agent_reply")
+    args = parser.parse_args()
+
+    print(f"{'span':<48} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'total ms':>11} {'tokens':>9}")
+    for key, stats in summarize_trace_file(args.trace_file).items():
+        if args.kind and not key.startswith(f"{args.kind}:"):
+            continue
+        tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+        print(
+            f"{key:<48} {stats['count']:>6} {stats['p50_ms']:>10.1f} {stats['p95_ms']:>10.1f} "
+            f"{stats['total_ms']:>11.1f} {tokens:>9}"
+        )
+
+if __name__ == "__main__":
+    main()
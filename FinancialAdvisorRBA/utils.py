@@ -3,39 +3,359 @@
 
 """Utility functions for the Financial Advisor AI system."""
 
-from typing import Dict, Any, Optional
-from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+from typing import Callable, Dict, Any, List, Optional, Union
+from llama_index.core import (
+    VectorStoreIndex,
+    Settings,
+    StorageContext,
+    QueryBundle,
+    load_index_from_storage
+)
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.schema import NodeWithScore
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+import atexit
+import copy
+import functools
+import hashlib
+import json
+import re
 import sys
+import threading
+import time
+import weakref
 import autogen
+from .ingestion import ingest_files
+from .profiles import DEFAULT_CUSTOMER_ID, AmbiguousCustomerError, ProfileStore
+from .query_cache import SemanticQueryCache
+from .retrieval import METADATA_VERSION, HybridRetriever, KeywordIndex
+from .tables import TABLE_STORE_FILE, TableStore, extract_tables, lookup_figures
+from .vector_store import MmapVectorStore
+from .routing import SpeakerRouter
+from .scheduler import BACKGROUND, get_llm_scheduler
+from .tracing import trace_span
+
+# Name of the file recording which source files are embedded in a persisted index
+INDEX_MANIFEST = "manifest.json"
+
+# Name of the persisted keyword index stored next to the vector index
+KEYWORD_INDEX_FILE = "keyword_index.json"
+
+# Name under which the storage context persists the default vector store (ids; the matrix is the .npy beside it)
+VECTOR_STORE_FILE = "default__vector_store.json"
+
+# Label of each answer in a combined answer to a batch of market data questions
+_BATCH_ANSWER_LABEL = re.compile(r"^\s*\[(\d+)\][:.]?\s*", re.MULTILINE)
+
+# Long-lived query engines, keyword indexes, table stores, answer caches and versions, keyed by index
+_QUERY_ENGINES: "weakref.WeakKeyDictionary[VectorStoreIndex, Any]" = weakref.WeakKeyDictionary()
+_KEYWORD_INDEXES: "weakref.WeakKeyDictionary[VectorStoreIndex, KeywordIndex]" = weakref.WeakKeyDictionary()
+_TABLE_STORES: "weakref.WeakKeyDictionary[VectorStoreIndex, TableStore]" = weakref.WeakKeyDictionary()
+_ANSWER_CACHES: "weakref.WeakKeyDictionary[VectorStoreIndex, SemanticQueryCache]" = weakref.WeakKeyDictionary()
+_INDEX_VERSIONS: "weakref.WeakKeyDictionary[VectorStoreIndex, int]" = weakref.WeakKeyDictionary()
+_QUERY_STATE_LOCK = threading.Lock()
+
+# Customer profile store behind get_customer_profile, opened lazily
+_PROFILE_STORE: Optional[ProfileStore] = None
+_PROFILE_STORE_LOCK = threading.Lock()
+
+# Shared router behind custom_speaker_selection_func; stats() reports LLM fallbacks
+speaker_router = SpeakerRouter()
+
+def get_profile_store() -> ProfileStore:
+    """
+    Get the shared customer profile store, opening the default database on first use.
+
+    Returns:
+        ProfileStore: Store backing get_customer_profile.
+    """
+    global _PROFILE_STORE
+    with _PROFILE_STORE_LOCK:
+        if _PROFILE_STORE is None:
+            _PROFILE_STORE = ProfileStore()
+        return _PROFILE_STORE
+
+def configure_profile_store(db_path: Path) -> ProfileStore:
+    """
+    Point get_customer_profile at a profile database, closing the store it replaces.
+
+    Args:
+        db_path (Path): SQLite database file.
+
+    Returns:
+        ProfileStore: The newly opened store.
+    """
+    global _PROFILE_STORE
+    with _PROFILE_STORE_LOCK:
+        previous, _PROFILE_STORE = _PROFILE_STORE, ProfileStore(db_path)
+    if previous is not None:
+        previous.close()
+    return _PROFILE_STORE
+
+@atexit.register
+def close_profile_store() -> None:
+    """Close the shared customer profile store's connections, if it was opened."""
+    global _PROFILE_STORE
+    with _PROFILE_STORE_LOCK:
+        store, _PROFILE_STORE = _PROFILE_STORE, None
+    if store is not None:
+        store.close()
 
 def get_customer_profile(name: str = "") -> Dict[str, Any]:
     """
     Get the customer's financial profile.
     
     Args:
-        name (str, optional): Customer name. Defaults to empty string.
+        name (str, optional): Customer id or name. Defaults to empty string (the current demo customer).
         
     Returns:
-        Dict[str, Any]: Customer financial profile containing income, expenses, and assets.
+        Dict[str, Any]: Customer financial profile containing currency, numeric income, expenses and assets,
+        or an error entry if the customer is unknown or the name matches several customers.
     """
-    return {
-        "monthly_income": "50000HKD",
-        "monthly_expense": "20000HKD",
-        "asset": {
-            "saving": "100000HKD",
-            "fixed_income": "100000HKD",
-            "high_risk_stock": "500000HKD",
-            "Bitcoin": "100000HKD"
+    try:
+        profile = get_profile_store().get_profile(name.strip() or DEFAULT_CUSTOMER_ID)
+    except AmbiguousCustomerError:
+        return {"error": f"Several customers are named '{name}', ask for the customer id"}
+    if profile is None:
+        return {"error": f"No customer profile found for '{name}'"}
+    return copy.deepcopy(profile)
+
+def customer_profile_tool(customer_id: str = DEFAULT_CUSTOMER_ID) -> Callable[[], Dict[str, Any]]:
+    """
+    Bind the profile lookup to one session's customer, for registering as an agent tool.
+
+    The tool takes no arguments, so the model can only read the profile of
+    the customer the session was opened for.
+
+    Args:
+        customer_id (str, optional): The session's customer. Defaults to DEFAULT_CUSTOMER_ID.
+
+    Returns:
+        Callable[[], Dict[str, Any]]: Tool returning that customer's profile, or an error entry.
+    """
+    def get_current_customer_profile() -> Dict[str, Any]:
+        return get_customer_profile(customer_id)
+    return get_current_customer_profile
+
+def _file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 content hash of a file.
+
+    Args:
+        path (Path): File to hash.
+        chunk_size (int, optional): Read size in bytes. Defaults to 1 MiB.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _list_source_files(pdf_dir: Path) -> List[Path]:
+    """
+    List the files SimpleDirectoryReader would load from a directory.
+
+    Args:
+        pdf_dir (Path): Directory containing documents.
+
+    Returns:
+        List[Path]: Non-hidden files directly inside the directory, sorted by name.
+    """
+    return sorted(
+        path for path in pdf_dir.iterdir()
+        if path.is_file() and not path.name.startswith(".")
+    )
+
+def _load_manifest(persist_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the manifest of indexed files from a persisted index directory.
+
+    Args:
+        persist_dir (Path): Directory holding the persisted index.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Mapping of file name to its content hash, document ids, metadata and table count.
+    """
+    manifest_path = persist_dir / INDEX_MANIFEST
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(persist_dir: Path, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Atomically write the manifest of indexed files.
+
+    Args:
+        persist_dir (Path): Directory holding the persisted index.
+        manifest (Dict[str, Dict[str, Any]]): Mapping of file name to its content hash and document ids.
+    """
+    manifest_path = persist_dir / INDEX_MANIFEST
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    tmp_path.replace(manifest_path)
+
+def _empty_index(vector_dtype: str) -> VectorStoreIndex:
+    """Create an empty index over a compact vector store."""
+    storage_context = StorageContext.from_defaults(vector_store=MmapVectorStore(dtype=vector_dtype))
+    index = VectorStoreIndex.from_documents([], storage_context=storage_context)
+    _track_index_updates(index)
+    return index
+
+def _sync_persistent_index(pdf_dir: Path, persist_dir: Path, vector_dtype: str = "float32") -> VectorStoreIndex:
+    """
+    Load a persisted index and bring it in line with the documents on disk.
+
+    Files are tracked by content hash: new or changed files are parsed and
+    embedded through the parallel ingestion pipeline, files that disappeared
+    are evicted, and unchanged files are served straight from the persisted
+    store without being re-read. The keyword index and table store are
+    updated and persisted in step with the vector index. Files tagged by
+    an older version of the metadata extraction are re-ingested once; files
+    whose tables are missing only have their tables re-extracted.
+
+    Embeddings are kept in a memory-mapped MmapVectorStore. An index
+    persisted with SimpleVectorStore, or with another vector dtype, is
+    converted and written back once.
+
+    Args:
+        pdf_dir (Path): Directory containing PDF documents to index.
+        persist_dir (Path): Directory where the index and its manifest are stored.
+        vector_dtype (str, optional): Storage type of the embeddings ("float32", "float16" or "int8").
+            Defaults to "float32".
+
+    Returns:
+        VectorStoreIndex: Index reflecting the current contents of pdf_dir.
+    """
+    manifest = _load_manifest(persist_dir)
+    vector_store = None
+    if manifest and (persist_dir / "docstore.json").exists():
+        vector_store = MmapVectorStore.from_persist_path(str(persist_dir / VECTOR_STORE_FILE), vector_dtype)
+        storage_context = StorageContext.from_defaults(persist_dir=str(persist_dir), vector_store=vector_store)
+        index = load_index_from_storage(storage_context)
+        _track_index_updates(index)
+        keyword_index = _load_keyword_index(persist_dir, index)
+        table_store = _load_table_store(persist_dir)
+    else:
+        manifest = {}
+        index = _empty_index(vector_dtype)
+        keyword_index = KeywordIndex()
+        table_store = TableStore()
+    _KEYWORD_INDEXES[index] = keyword_index
+    _TABLE_STORES[index] = table_store
+
+    current = {path.name: (path, _file_digest(path)) for path in _list_source_files(pdf_dir)}
+    changed = not (persist_dir / INDEX_MANIFEST).exists() or (vector_store is not None and vector_store.needs_persist)
+
+    # Evict files that were removed, whose contents changed or whose metadata tags are outdated
+    for name in list(manifest):
+        if (name not in current or current[name][1] != manifest[name]["sha256"]
+                or manifest[name].get("metadata_version") != METADATA_VERSION):
+            for doc_id in manifest.pop(name)["doc_ids"]:
+                index.delete_ref_doc(doc_id, delete_from_docstore=True)
+                keyword_index.remove_ref_doc(doc_id)
+            table_store.remove(name)
+            changed = True
+
+    # Re-extract tables that are missing from the table store, without re-embedding
+    stored_sources = set(table_store.sources())
+    for name, entry in manifest.items():
+        if entry.get("tables") is None or (entry["tables"] and name not in stored_sources):
+            try:
+                tables = extract_tables(current[name][0])
+            except Exception as e:
+                print(f"Warning: could not extract tables from {name}: {str(e)}")
+                tables = []
+            table_store.add(name, tables)
+            entry["tables"] = len(tables)
+            changed = True
+
+    # Parse and embed only new or changed files; unparsable files are logged by
+    # ingest_files and left out of the manifest so they are retried on the next start
+    new_paths = [path for name, (path, _) in current.items() if name not in manifest]
+    for report in ingest_files(new_paths, index, keyword_index=keyword_index, table_store=table_store):
+        if report["error"] is not None:
+            continue
+        manifest[report["file"]] = {
+            "sha256": current[report["file"]][1],
+            "doc_ids": report["doc_ids"],
+            "metadata": report["metadata"],
+            "metadata_version": METADATA_VERSION,
+            "tables": report["tables"]
         }
-    }
+        changed = True
+
+    if changed:
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        index.storage_context.persist(persist_dir=str(persist_dir))
+        keyword_index.persist(persist_dir / KEYWORD_INDEX_FILE)
+        table_store.save(persist_dir / TABLE_STORE_FILE)
+        _save_manifest(persist_dir, manifest)
+
+    return index
+
+def _load_keyword_index(persist_dir: Path, index: VectorStoreIndex) -> KeywordIndex:
+    """
+    Load the persisted keyword index, rebuilding it from the docstore if it is missing or out of step.
+
+    Args:
+        persist_dir (Path): Directory holding the persisted index.
+        index (VectorStoreIndex): The loaded vector index.
 
-def initialize_llama_index(pdf_dir: Path) -> Optional[VectorStoreIndex]:
+    Returns:
+        KeywordIndex: Keyword index covering the same nodes as the vector index.
+    """
+    path = persist_dir / KEYWORD_INDEX_FILE
+    if path.exists():
+        try:
+            keyword_index = KeywordIndex.load(path)
+            if len(keyword_index) == len(index.docstore.docs):
+                return keyword_index
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: rebuilding keyword index: {str(e)}")
+    return KeywordIndex.from_index(index)
+
+def _load_table_store(persist_dir: Path) -> TableStore:
+    """
+    Load the persisted table store, or start an empty one if it is missing or unreadable.
+
+    Args:
+        persist_dir (Path): Directory holding the persisted index.
+
+    Returns:
+        TableStore: Stored figures; files missing from it are re-extracted by the caller.
+    """
+    path = persist_dir / TABLE_STORE_FILE
+    if path.exists():
+        try:
+            return TableStore.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: rebuilding table store: {str(e)}")
+    return TableStore()
+
+def initialize_llama_index(
+    pdf_dir: Path,
+    persist_dir: Optional[Path] = None,
+    vector_dtype: str = "float32"
+) -> Optional[VectorStoreIndex]:
     """
     Initialize the LlamaIndex with document data.
     
+    When persist_dir is given the index is stored on disk and updated
+    incrementally, so a warm start only loads the persisted index and maps
+    its embedding matrix, shared with every other process using the same
+    directory.
+    
     Args:
         pdf_dir (Path): Directory containing PDF documents to index.
+        persist_dir (Optional[Path], optional): Directory for the persisted index. Defaults to None (in-memory only).
+        vector_dtype (str, optional): Storage type of the embeddings ("float32", "float16" or "int8").
+            Defaults to "float32".
         
     Returns:
         Optional[VectorStoreIndex]: Initialized index or None if initialization fails.
@@ -48,26 +368,442 @@ def initialize_llama_index(pdf_dir: Path) -> Optional[VectorStoreIndex]:
         sys.exit(1)
     
     try:
-        documents = SimpleDirectoryReader(str(pdf_dir)).load_data()
-        return VectorStoreIndex.from_documents(documents)
+        if persist_dir is not None:
+            return _sync_persistent_index(pdf_dir, persist_dir, vector_dtype)
+        index = _empty_index(vector_dtype)
+        keyword_index = KeywordIndex()
+        table_store = TableStore()
+        _KEYWORD_INDEXES[index] = keyword_index
+        _TABLE_STORES[index] = table_store
+        # Skipped files are logged by ingest_files
+        for _ in ingest_files(
+            _list_source_files(pdf_dir), index, keyword_index=keyword_index, table_store=table_store
+        ):
+            pass
+        return index
     except Exception as e:
         print(f"Error initializing LlamaIndex: {str(e)}")
         return None
 
-def llama_index_query(query: str, index: VectorStoreIndex) -> str:
+class BackgroundIndex:
+    """
+    Handle to an index that is being loaded on a background thread.
+
+    Lets agents be created and the client interview start while the index
+    loads; anything that needs the index calls wait() to block until it is ready.
+    """
+
+    def __init__(self, pdf_dir: Path, persist_dir: Optional[Path] = None, vector_dtype: str = "float32"):
+        """
+        Args:
+            pdf_dir (Path): Directory containing PDF documents to index.
+            persist_dir (Optional[Path], optional): Directory for the persisted index. Defaults to None (in-memory only).
+            vector_dtype (str, optional): Storage type of the embeddings. Defaults to "float32".
+        """
+        self.pdf_dir = pdf_dir
+        self.persist_dir = persist_dir
+        self.vector_dtype = vector_dtype
+        self.load_seconds: Optional[float] = None
+        self._index: Optional[VectorStoreIndex] = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._load, name="index-warmup", daemon=True)
+        self._thread.start()
+
+    def _load(self) -> None:
+        """Load the index and signal readiness, even on failure."""
+        start = time.perf_counter()
+        try:
+            self._index = initialize_llama_index(self.pdf_dir, self.persist_dir, self.vector_dtype)
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._ready.set()
+
+    def ready(self) -> bool:
+        """Whether loading has finished."""
+        return self._ready.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[VectorStoreIndex]:
+        """
+        Block until the index is loaded.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait. Defaults to None (wait indefinitely).
+
+        Returns:
+            Optional[VectorStoreIndex]: The loaded index, or None if loading failed.
+
+        Raises:
+            TimeoutError: If the index is not ready within timeout.
+        """
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Index is still loading")
+        return self._index
+
+def start_index_warmup(
+    pdf_dir: Path,
+    persist_dir: Optional[Path] = None,
+    vector_dtype: str = "float32"
+) -> BackgroundIndex:
+    """
+    Start loading the index on a background thread.
+
+    Args:
+        pdf_dir (Path): Directory containing PDF documents to index.
+        persist_dir (Optional[Path], optional): Directory for the persisted index. Defaults to None (in-memory only).
+        vector_dtype (str, optional): Storage type of the embeddings. Defaults to "float32".
+
+    Returns:
+        BackgroundIndex: Handle that query functions wait on.
+
+    Raises:
+        SystemExit: If the PDF directory does not exist.
+    """
+    if not pdf_dir.exists():
+        print(f"Error: {pdf_dir} directory does not exist.")
+        sys.exit(1)
+    return BackgroundIndex(pdf_dir, persist_dir, vector_dtype)
+
+def resolve_index(index: Union[VectorStoreIndex, BackgroundIndex]) -> Optional[VectorStoreIndex]:
+    """
+    Get a usable index, waiting for a background load to finish if needed.
+
+    Args:
+        index (Union[VectorStoreIndex, BackgroundIndex]): Loaded index or background handle.
+
+    Returns:
+        Optional[VectorStoreIndex]: The index, or None if background loading failed.
+    """
+    return index.wait() if isinstance(index, BackgroundIndex) else index
+
+def mark_index_updated(index: VectorStoreIndex) -> None:
+    """
+    Record that an index's contents changed.
+
+    Drops the cached query engine and invalidates cached answers for the index.
+    Inserts and deletes made through an index built or queried here call this
+    automatically (see _track_index_updates).
+
+    Args:
+        index (VectorStoreIndex): Index whose documents were inserted or deleted.
+    """
+    with _QUERY_STATE_LOCK:
+        _INDEX_VERSIONS[index] = _INDEX_VERSIONS.get(index, 0) + 1
+        _QUERY_ENGINES.pop(index, None)
+
+def _track_index_updates(index: VectorStoreIndex) -> None:
+    """
+    Make every insert or delete on an index mark it updated, whoever calls it.
+
+    index.insert, update_ref_doc and refresh_ref_docs all go through
+    insert_nodes or delete_ref_doc, so wrapping those covers every change.
+    Safe to call repeatedly.
+
+    Args:
+        index (VectorStoreIndex): Index whose answers and query engine are cached.
+    """
+    with _QUERY_STATE_LOCK:
+        if getattr(index, "_versioned", False):
+            return
+        index._versioned = True
+    # The wrappers live on the index, so they hold it weakly to keep the caches' weak keys collectable
+    ref = weakref.ref(index)
+    for name in ("insert_nodes", "delete_nodes", "delete_ref_doc"):
+        method = getattr(index, name)
+
+        @functools.wraps(method)
+        def versioned(*args, _method=method, **kwargs):
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                target = ref()
+                if target is not None:
+                    mark_index_updated(target)
+
+        setattr(index, name, versioned)
+
+def get_keyword_index(index: VectorStoreIndex) -> KeywordIndex:
+    """
+    Get the keyword index kept alongside an index, building it from the docstore if there is none.
+
+    Args:
+        index (VectorStoreIndex): Initialized LlamaIndex instance.
+
+    Returns:
+        KeywordIndex: BM25 index over the index's nodes.
+    """
+    with _QUERY_STATE_LOCK:
+        keyword_index = _KEYWORD_INDEXES.get(index)
+        if keyword_index is None:
+            keyword_index = KeywordIndex.from_index(index)
+            _KEYWORD_INDEXES[index] = keyword_index
+        return keyword_index
+
+def get_table_store(index: VectorStoreIndex) -> Optional[TableStore]:
+    """
+    Get the table store filled when an index was built.
+
+    Args:
+        index (VectorStoreIndex): Initialized LlamaIndex instance.
+
+    Returns:
+        Optional[TableStore]: Extracted research tables, or None if the index was built elsewhere.
+    """
+    with _QUERY_STATE_LOCK:
+        return _TABLE_STORES.get(index)
+
+def get_query_engine(index: VectorStoreIndex) -> RetrieverQueryEngine:
+    """
+    Get the long-lived hybrid query engine for an index, creating it on first use.
+
+    Args:
+        index (VectorStoreIndex): Initialized LlamaIndex instance.
+
+    Returns:
+        RetrieverQueryEngine: Query engine over a HybridRetriever bound to the index.
+    """
+    _track_index_updates(index)
+    keyword_index = get_keyword_index(index)
+    with _QUERY_STATE_LOCK:
+        engine = _QUERY_ENGINES.get(index)
+        if engine is None:
+            engine = RetrieverQueryEngine.from_args(HybridRetriever(index, keyword_index))
+            _QUERY_ENGINES[index] = engine
+        return engine
+
+def get_answer_cache(index: VectorStoreIndex) -> SemanticQueryCache:
+    """
+    Get the answer cache for an index, bound to the index's current version.
+
+    Pass the cache's version at this point to SemanticQueryCache.store, so an
+    answer computed while the index changes is not cached under the new version.
+
+    Args:
+        index (VectorStoreIndex): Initialized LlamaIndex instance.
+
+    Returns:
+        SemanticQueryCache: Cache of answers produced from this index.
+    """
+    _track_index_updates(index)
+    with _QUERY_STATE_LOCK:
+        cache = _ANSWER_CACHES.get(index)
+        if cache is None:
+            cache = SemanticQueryCache(embed_fn=Settings.embed_model.get_query_embedding)
+            _ANSWER_CACHES[index] = cache
+        version = _INDEX_VERSIONS.get(index, 0)
+    cache.bind_version(version)
+    return cache
+
+def _synthesize(query_engine: RetrieverQueryEngine, query_bundle: QueryBundle, nodes: List[NodeWithScore]) -> str:
+    """Synthesize an answer from retrieved nodes, as background work when requests are scheduled."""
+    scheduler = get_llm_scheduler()
+    if scheduler is None:
+        return query_engine.synthesize(query_bundle, nodes).response
+    # Synthesis is background work: agent turns the client is waiting on go first
+    return scheduler.run(
+        lambda: query_engine.synthesize(query_bundle, nodes),
+        priority=BACKGROUND,
+        estimated_tokens=sum(len(node.get_content()) for node in nodes) // 4 + 512
+    ).response
+
+def _split_batch_answer(text: str, count: int) -> Dict[int, str]:
+    """Split a combined answer into its "[n]"-labelled parts, keyed by question position."""
+    matches = list(_BATCH_ANSWER_LABEL.finditer(text))
+    parts: Dict[int, str] = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        number = int(match.group(1))
+        answer = text[match.end():following.start() if following is not None else len(text)].strip()
+        if 1 <= number <= count and answer:
+            parts.setdefault(number - 1, answer)
+    return parts
+
+def llama_index_query(
+    query: str,
+    index: Union[VectorStoreIndex, BackgroundIndex],
+    filters: Optional[Dict[str, Any]] = None
+) -> str:
     """
     Query the LlamaIndex engine for financial market insights.
 
+    Chunks are retrieved with hybrid keyword + vector search, restricted to
+    documents matching the metadata filters (or the region and period named
+    in the query when no filters are given). Answers are served from the
+    index's semantic cache when an identical or sufficiently similar question
+    with the same filters was answered before, so sessions and batch
+    customers share retrieval results. If the index is still loading in the
+    background, the query waits for it.
+
     Args:
         query (str): Natural language question related to financial markets.
-        index (VectorStoreIndex): Initialized LlamaIndex instance.
+        index (Union[VectorStoreIndex, BackgroundIndex]): Initialized LlamaIndex instance or background handle.
+        filters (Optional[Dict[str, Any]], optional): Metadata pre-filters with "regions", "period"
+            and/or "source_file". Defaults to None.
 
     Returns:
         str: Structured response containing financial insights.
     """
-    query_engine = index.as_query_engine()
-    result = query_engine.query(query)
-    return result.response
+    index = resolve_index(index)
+    if index is None:
+        return "Market data is unavailable: the research index failed to load."
+
+    with trace_span("index_query", "llama_index", filtered=bool(filters)) as span:
+        cache = get_answer_cache(index)
+        version = cache.version
+        # Filtered answers are cached separately per filter set
+        scope = json.dumps(filters, sort_keys=True) if filters else ""
+        answer, embedding = cache.lookup(query, scope)
+        if span is not None:
+            span.set(cache_hit=answer is not None)
+        if answer is not None:
+            return answer
+
+        query_engine = get_query_engine(index)
+        query_bundle = QueryBundle(query_str=query, embedding=embedding)
+        # Retrieve and synthesize separately so each shows up in the trace
+        with trace_span("retrieve", "llama_index") as retrieve_span:
+            nodes = query_engine.retriever.search(query_bundle, filters)
+            if retrieve_span is not None:
+                retrieve_span.set(nodes=len(nodes))
+        if not nodes:
+            return "No market research matches the requested region or period."
+        with trace_span("synthesize", "llama_index"):
+            answer = _synthesize(query_engine, query_bundle, nodes)
+        cache.store(query, answer, embedding, scope, version)
+        return answer
+
+def llama_index_batch_query(
+    queries: List[str],
+    index: Union[VectorStoreIndex, BackgroundIndex],
+    filters: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Answer several market data questions in one call.
+
+    The questions are embedded in one request and looked up in the answer
+    cache. The rest are retrieved concurrently, and their chunks are
+    deduplicated and synthesized together in a single pass that answers
+    each question under its own label. Questions the combined answer
+    leaves out are synthesized on their own.
+
+    Args:
+        queries (List[str]): Natural language questions related to financial markets.
+        index (Union[VectorStoreIndex, BackgroundIndex]): Initialized LlamaIndex instance or background handle.
+        filters (Optional[Dict[str, Any]], optional): Metadata pre-filters applied to every question,
+            see llama_index_query. Defaults to None.
+
+    Returns:
+        str: JSON list with one {"question", "answer", "sources"} entry per distinct question.
+    """
+    index = resolve_index(index)
+    if index is None:
+        return "Market data is unavailable: the research index failed to load."
+    questions = list(dict.fromkeys(query.strip() for query in queries if query and query.strip()))
+    if not questions:
+        return "No questions were given."
+
+    with trace_span("index_batch_query", "llama_index", questions=len(questions), filtered=bool(filters)) as span:
+        cache = get_answer_cache(index)
+        version = cache.version
+        scope = json.dumps(filters, sort_keys=True) if filters else ""
+        # OpenAI embeddings use the same model for queries and texts, so one batch request covers all questions
+        embeddings = Settings.embed_model.get_text_embedding_batch(questions)
+        answers: Dict[int, str] = {}
+        sources: Dict[int, List[str]] = {}
+        for i, (question, embedding) in enumerate(zip(questions, embeddings)):
+            answer, _ = cache.lookup(question, scope, embedding)
+            if answer is not None:
+                answers[i] = answer
+        if span is not None:
+            span.set(cache_hits=len(answers))
+
+        pending = [i for i in range(len(questions)) if i not in answers]
+        if pending:
+            query_engine = get_query_engine(index)
+            bundles = {i: QueryBundle(query_str=questions[i], embedding=embeddings[i]) for i in pending}
+            with trace_span("retrieve", "llama_index", questions=len(pending)) as retrieve_span:
+                with ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="batch-retrieve") as pool:
+                    retrieved = dict(zip(pending, pool.map(
+                        lambda i: query_engine.retriever.search(bundles[i], filters), pending
+                    )))
+                # Questions on the same topic retrieve overlapping chunks; each is sent to the synthesizer once
+                unique: Dict[str, NodeWithScore] = {}
+                for i in pending:
+                    for hit in retrieved[i]:
+                        unique.setdefault(hit.node.node_id, hit)
+                    sources[i] = sorted({
+                        str(hit.node.metadata.get("source_file", "")) for hit in retrieved[i]
+                    } - {""})
+                if retrieve_span is not None:
+                    retrieve_span.set(
+                        nodes=sum(len(nodes) for nodes in retrieved.values()),
+                        unique_nodes=len(unique)
+                    )
+
+            for i in pending:
+                if not retrieved[i]:
+                    answers[i] = "No market research matches the requested region or period."
+            to_synthesize = [i for i in pending if i not in answers]
+            with trace_span("synthesize", "llama_index", questions=len(to_synthesize)):
+                if len(to_synthesize) > 1:
+                    combined = QueryBundle(query_str=(
+                        "Answer each question below separately from the context. Start each answer on a new "
+                        "line with the question's label, e.g. [1].\n"
+                        + "\n".join(f"[{n}] {questions[i]}" for n, i in enumerate(to_synthesize, start=1))
+                    ))
+                    nodes = [unique[node_id] for node_id in dict.fromkeys(
+                        hit.node.node_id for i in to_synthesize for hit in retrieved[i]
+                    )]
+                    parts = _split_batch_answer(_synthesize(query_engine, combined, nodes), len(to_synthesize))
+                    for n, i in enumerate(to_synthesize):
+                        if n in parts:
+                            answers[i] = parts[n]
+                for i in to_synthesize:
+                    if i not in answers:
+                        answers[i] = _synthesize(query_engine, bundles[i], retrieved[i])
+                    cache.store(questions[i], answers[i], embeddings[i], scope, version)
+
+    return json.dumps([
+        {"question": question, "answer": answers[i], "sources": sources.get(i, [])}
+        for i, question in enumerate(questions)
+    ], indent=2)
+
+def lookup_market_figures(query: str, index: Union[VectorStoreIndex, BackgroundIndex]) -> str:
+    """
+    Look up exact figures in the tables extracted from the market research.
+
+    Answers come straight from the table store, with no retrieval or LLM call.
+
+    Args:
+        query (str): Question naming an index, metric and period, e.g. "HSI 2025 EPS growth forecast".
+        index (Union[VectorStoreIndex, BackgroundIndex]): Initialized LlamaIndex instance or background handle.
+
+    Returns:
+        str: JSON list of matching figures with their source, or a message if none match.
+    """
+    index = resolve_index(index)
+    if index is None:
+        return "Market data is unavailable: the research index failed to load."
+    with trace_span("table_lookup", "tables"):
+        return lookup_figures(get_table_store(index), query)
+
+def has_research_tables(index: Union[VectorStoreIndex, BackgroundIndex]) -> bool:
+    """
+    Whether any tables were extracted from the market research, without waiting for a background load.
+
+    While a background index is still loading, its persisted table store
+    is checked instead, so the answer is False on a first run before
+    anything has been persisted.
+
+    Args:
+        index (Union[VectorStoreIndex, BackgroundIndex]): Initialized LlamaIndex instance or background handle.
+
+    Returns:
+        bool: True if lookup_market_figures can return any figures.
+    """
+    if isinstance(index, BackgroundIndex) and not index.ready():
+        return index.persist_dir is not None and len(_load_table_store(Path(index.persist_dir))) > 0
+    index = resolve_index(index)
+    table_store = get_table_store(index) if index is not None else None
+    return table_store is not None and len(table_store) > 0
 
 def get_agent_by_name(groupchat: autogen.GroupChat, agent_name: str) -> Optional[autogen.Agent]:
     """
@@ -89,65 +825,14 @@ def custom_speaker_selection_func(last_speaker: autogen.Agent, groupchat: autoge
     """
     Define a customized speaker selection function to control agent interactions.
     
+    Routing is delegated to the precompiled SpeakerRouter, which handles every
+    known path without an LLM call; see routing.DEFAULT_TRANSITIONS.
+    
     Args:
         last_speaker (autogen.Agent): The agent who spoke last.
         groupchat (autogen.GroupChat): The group chat containing all agents.
         
     Returns:
-        Union[autogen.Agent, str]: The next agent to speak, or a string from ['auto', 'manual', 'random', 'round_robin'].
-    """
-    messages = groupchat.messages
-
-    # Initial stage - Financial Advisor starts the conversation
-    if len(messages) <= 1:
-        return get_agent_by_name(groupchat, "FinancialAdvisor")
-
-    # User interaction stage (Approval Handling)
-    if last_speaker.name == "user":
-        if "APPROVE" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "PortfolioRecommendationAgent")
-        elif len(messages) >= 2 and messages[-2]["name"] == "FinancialAdvisor":
-            return get_agent_by_name(groupchat, "FinancialAdvisor")
-        else:
-            return "auto"
-
-    # Portfolio Recommendation Process
-    elif last_speaker.name == "PortfolioRecommendationAgent":
-        if "PROPOSAL DONE" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "user")
-        elif "CHECK NEEDED" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "RegulatoryComplianceAgent")
-        elif "RISK EVALUATION NEEDED" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "RiskAssessmentAgent")
-        elif "MARKET DATA NEEDED" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "MarketDataAgent")
-        else:
-            return "auto"
-
-    # Risk Assessment Agent Process
-    elif last_speaker.name == "RiskAssessmentAgent":
-        if "MARKET DATA REQUIRED" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "MarketDataAgent")
-        else:
-            return get_agent_by_name(groupchat, "PortfolioRecommendationAgent")
-
-    # Market Data Retrieval (for both Portfolio & Risk Assessment)
-    elif last_speaker.name == "MarketDataAgent":
-        # Determine the agent that made the request
-        if len(messages) >= 2:
-            requesting_agent = messages[-2]["name"]
-            if requesting_agent == "PortfolioRecommendationAgent":
-                return get_agent_by_name(groupchat, "PortfolioRecommendationAgent")
-            elif requesting_agent == "RiskAssessmentAgent":
-                return get_agent_by_name(groupchat, "RiskAssessmentAgent")
-        return "auto"
-
-    # Compliance Review
-    elif last_speaker.name == "RegulatoryComplianceAgent":
-        if "APPROVED" in messages[-1]["content"] or "REQUIRES CHANGES" in messages[-1]["content"]:
-            return get_agent_by_name(groupchat, "PortfolioRecommendationAgent")
-        else:
-            return "auto"
-
-    # Default Fallback
-    return "auto" 
\ No newline at end of file
+        Union[autogen.Agent, str]: The next agent to speak, or "auto" for speakers outside the routing table.
+    """
+    return speaker_router(last_speaker, groupchat)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compact vector store backed by one memory-mapped file.
+
+Embeddings are unit-normalized and kept as rows of a single NumPy matrix,
+optionally quantized to float16 or int8 (one scale per row), instead of the
+Python float lists SimpleVectorStore holds. Persisted, the matrix is a plain
+.npy file that every process maps read-only, so worker processes share one
+copy of the embeddings through the page cache. Node ids, ref doc ids, int8
+scales and the name of the current matrix file live in a small JSON file
+beside it.
+
+Top-k scoring is a blocked matrix-vector product over the candidate rows.
+Metadata filtering is done upstream (see KeywordIndex.allowed_ids) and
+reaches the store as node_ids.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import fsspec
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    VectorStoreQuery,
+    VectorStoreQueryResult
+)
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+# Rows scored per block, bounding the float32 copy made of quantized rows
+SCORE_BLOCK_ROWS = 1024
+
+# Bytes SimpleVectorStore spends per embedding value: a Python float object plus its list slot
+_PYTHON_FLOAT_BYTES = 24 + 8
+
+# Times a loader re-reads the JSON file when the matrix it names was replaced in between
+_LOAD_ATTEMPTS = 3
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Normalize embeddings to unit length and convert them to the storage dtype.
+
+    Args:
+        vectors (np.ndarray): Embeddings, one per row.
+        dtype (str): "float32", "float16" or "int8".
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Stored rows and the per-row scale that turns
+        their dot product with a unit query into cosine similarity.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    if dtype != "int8":
+        return unit.astype(VECTOR_DTYPES[dtype]), np.ones(len(unit), dtype=np.float32)
+    # Symmetric per-row quantization: the largest component maps to +/-127
+    scales = np.abs(unit).max(axis=1) / 127.0
+    safe = np.where(scales > 0, scales, 1.0)
+    rows = np.clip(np.rint(unit / safe[:, None]), -127, 127).astype(np.int8)
+    return rows, scales.astype(np.float32)
+
+def _data_path(persist_path: str, data_file: Optional[str] = None) -> str:
+    """
+    Matrix file stored beside a vector store's JSON file.
+
+    Args:
+        persist_path (str): Vector store JSON file.
+        data_file (Optional[str], optional): Matrix file name recorded in the JSON file.
+            Defaults to None (the unversioned name used before matrix files were versioned).
+
+    Returns:
+        str: Path of the matrix file.
+    """
+    if data_file is None:
+        return os.path.splitext(persist_path)[0] + ".npy"
+    return os.path.join(os.path.dirname(persist_path), data_file)
+
+def _old_data_files(persist_path: str, current: str) -> List[Path]:
+    """Matrix files of earlier persists beside a vector store's JSON file, other than current."""
+    stem = Path(os.path.splitext(persist_path)[0])
+    candidates = [*stem.parent.glob(f"{stem.name}.*.npy"), Path(_data_path(persist_path))]
+    return [path for path in candidates if path.exists() and path.name != current]
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Vector store keeping quantized embeddings in one NumPy matrix, memory-mapped once persisted.
+
+    Additions go to an in-memory copy of the matrix; deletions only mark
+    rows dead. persist() writes the live rows to a new, uniquely named file
+    and then atomically replaces the JSON file that names it, so a loader
+    always sees a matrix together with its own ids, and processes that
+    already mapped the old file are unaffected.
+    """
+
+    stores_text: bool = False
+    dtype: str = "float32"
+
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _rows: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _vectors: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: np.ndarray = PrivateAttr(default_factory=lambda: np.empty(0, dtype=np.float32))
+    _live: np.ndarray = PrivateAttr(default_factory=lambda: np.empty(0, dtype=bool))
+    _count: int = PrivateAttr(default=0)
+    _mapped: bool = PrivateAttr(default=False)
+    _dirty: bool = PrivateAttr(default=False)
+    _lock: Any = PrivateAttr(default_factory=threading.RLock)
+
+    def __init__(self, dtype: str = "float32", **kwargs: Any):
+        """
+        Args:
+            dtype (str, optional): Storage type of the embeddings: "float32", "float16" or "int8".
+                Defaults to "float32".
+
+        Raises:
+            ValueError: If dtype is not supported.
+        """
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype '{dtype}'; use one of {', '.join(VECTOR_DTYPES)}")
+        super().__init__(dtype=dtype, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MmapVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def needs_persist(self) -> bool:
+        """Whether the store holds changes, a migration or a re-quantization not yet written to disk."""
+        return self._dirty
+
+    def _append(self, rows: np.ndarray, scales: np.ndarray) -> None:
+        """Append quantized rows, growing the in-memory matrix geometrically."""
+        if self._vectors is None or self._mapped or self._count + len(rows) > len(self._vectors):
+            capacity = max(64, self._count + len(rows), 2 * (len(self._vectors) if self._vectors is not None else 0))
+            vectors = np.empty((capacity, rows.shape[1]), dtype=VECTOR_DTYPES[self.dtype])
+            resized_scales = np.empty(capacity, dtype=np.float32)
+            live = np.zeros(capacity, dtype=bool)
+            if self._vectors is not None:
+                vectors[:self._count] = self._vectors[:self._count]
+                resized_scales[:self._count] = self._scales[:self._count]
+                live[:self._count] = self._live[:self._count]
+            self._vectors, self._scales, self._live = vectors, resized_scales, live
+            self._mapped = False
+        end = self._count + len(rows)
+        self._vectors[self._count:end] = rows
+        self._scales[self._count:end] = scales
+        self._live[self._count:end] = True
+        self._count = end
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        """
+        Add nodes' embeddings to the store.
+
+        Args:
+            nodes (Sequence[BaseNode]): Nodes with embeddings.
+
+        Returns:
+            List[str]: Ids of the added nodes.
+        """
+        if not nodes:
+            return []
+        rows, scales = quantize(np.array([node.get_embedding() for node in nodes], dtype=np.float32), self.dtype)
+        with self._lock:
+            if self._vectors is not None and rows.shape[1] != self._vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {rows.shape[1]} does not match the store's {self._vectors.shape[1]}")
+            for node in nodes:
+                # Re-adding a node replaces its earlier row
+                previous = self._rows.get(node.node_id)
+                if previous is not None:
+                    self._live[previous] = False
+            start = self._count
+            self._append(rows, scales)
+            for offset, node in enumerate(nodes):
+                self._ids.append(node.node_id)
+                self._ref_doc_ids.append(node.ref_doc_id or "None")
+                self._rows[node.node_id] = start + offset
+            self._dirty = True
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """
+        Delete the embeddings of a document's nodes.
+
+        Args:
+            ref_doc_id (str): The doc_id of the document to delete.
+        """
+        with self._lock:
+            for node_id, row in list(self._rows.items()):
+                if self._ref_doc_ids[row] == ref_doc_id:
+                    self._live[row] = False
+                    del self._rows[node_id]
+                    self._dirty = True
+
+    def clear(self) -> None:
+        """Drop all embeddings."""
+        with self._lock:
+            self._ids, self._ref_doc_ids, self._rows = [], [], {}
+            self._vectors, self._count, self._mapped = None, 0, False
+            self._scales = np.empty(0, dtype=np.float32)
+            self._live = np.empty(0, dtype=bool)
+            self._dirty = True
+
+    def get(self, node_id: str) -> List[float]:
+        """Get a node's stored embedding, dequantized to unit length."""
+        with self._lock:
+            row = self._rows[node_id]
+            return (self._vectors[row].astype(np.float32) * self._scales[row]).tolist()
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """
+        Find the nodes most similar to a query embedding.
+
+        Args:
+            query (VectorStoreQuery): Query embedding, similarity_top_k and optional node_ids to search within.
+
+        Returns:
+            VectorStoreQueryResult: Ids and cosine similarities of the best nodes, best first.
+
+        Raises:
+            ValueError: If metadata filters are given; restrict the search with node_ids instead.
+        """
+        if query.filters is not None:
+            raise ValueError("MmapVectorStore does not filter on metadata; pass node_ids instead")
+        with self._lock:
+            vectors, scales, count = self._vectors, self._scales, self._count
+            if query.node_ids is not None:
+                candidates = np.array(sorted(
+                    self._rows[node_id] for node_id in set(query.node_ids) if node_id in self._rows
+                ), dtype=np.int64)
+            elif len(self._rows) == count:
+                candidates = None
+            else:
+                candidates = np.flatnonzero(self._live[:count])
+            ids = self._ids
+        total = count if candidates is None else len(candidates)
+        if vectors is None or total == 0 or query.query_embedding is None:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+
+        unit_query, _ = quantize(np.array([query.query_embedding], dtype=np.float32), "float32")
+        unit_query = unit_query[0]
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            end = min(total, start + SCORE_BLOCK_ROWS)
+            # Contiguous blocks are read straight from the mapping; candidate subsets are gathered
+            rows = slice(start, end) if candidates is None else candidates[start:end]
+            scores[start:end] = (vectors[rows].astype(np.float32, copy=False) @ unit_query) * scales[rows]
+
+        top_k = min(query.similarity_top_k, total)
+        if top_k <= 0:
+            return VectorStoreQueryResult(similarities=[], ids=[])
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        rows = best if candidates is None else candidates[best]
+        return VectorStoreQueryResult(
+            similarities=[float(scores[i]) for i in best],
+            ids=[ids[row] for row in rows]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get memory use of the store.
+
+        Returns:
+            Dict[str, Any]: Number of live vectors, dimension and dtype, bytes held by the matrix
+            (shared when mapped) and the bytes the same embeddings take as float32 and as the
+            Python float lists of SimpleVectorStore.
+        """
+        with self._lock:
+            dim = self._vectors.shape[1] if self._vectors is not None else 0
+            live = len(self._rows)
+            return {
+                "vectors": live,
+                "dim": dim,
+                "dtype": self.dtype,
+                "mapped": self._mapped,
+                "matrix_bytes": self._count * dim * np.dtype(VECTOR_DTYPES[self.dtype]).itemsize,
+                "float32_bytes": live * dim * 4,
+                "python_float_bytes": live * dim * _PYTHON_FLOAT_BYTES
+            }
+
+    def persist(self, persist_path: str, fs: Optional[fsspec.AbstractFileSystem] = None) -> None:
+        """
+        Write the live rows to a new matrix file, point the JSON file at it, then map it.
+
+        The matrix is written under a fresh name, and only the atomic
+        replacement of the JSON file switches loaders over to it; the
+        previous matrix file is deleted afterwards.
+
+        Args:
+            persist_path (str): JSON file for ids, scales and the matrix file name; the matrix goes beside it.
+            fs (Optional[fsspec.AbstractFileSystem], optional): Ignored; the store is always local.
+        """
+        with self._lock:
+            live = np.flatnonzero(self._live[:self._count]) if self._count else np.empty(0, dtype=np.int64)
+            dim = self._vectors.shape[1] if self._vectors is not None else 0
+            data_file = f"{Path(persist_path).stem}.{uuid.uuid4().hex[:12]}.npy"
+            data_path = _data_path(persist_path, data_file)
+            Path(persist_path).parent.mkdir(parents=True, exist_ok=True)
+
+            matrix = np.lib.format.open_memmap(
+                data_path, mode="w+", dtype=VECTOR_DTYPES[self.dtype], shape=(len(live), dim)
+            )
+            for start in range(0, len(live), SCORE_BLOCK_ROWS):
+                matrix[start:start + SCORE_BLOCK_ROWS] = self._vectors[live[start:start + SCORE_BLOCK_ROWS]]
+            matrix.flush()
+            del matrix
+
+            tmp_meta = persist_path + ".tmp"
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({
+                    "format": self.class_name(),
+                    "dtype": self.dtype,
+                    "dim": dim,
+                    "data_file": data_file,
+                    "ids": [self._ids[row] for row in live],
+                    "ref_doc_ids": [self._ref_doc_ids[row] for row in live],
+                    "scales": self._scales[live].tolist() if self.dtype == "int8" else None
+                }, f)
+            os.replace(tmp_meta, persist_path)
+            self._load_persisted(persist_path)
+            # Processes that mapped an old file keep their mapping after it is unlinked
+            for old_path in _old_data_files(persist_path, data_file):
+                try:
+                    old_path.unlink()
+                except OSError as e:
+                    logger.warning("Could not delete old vector matrix %s: %s", old_path, e)
+
+    def _load_persisted(self, persist_path: str) -> None:
+        """Map a persisted matrix read-only and restore ids and scales."""
+        for attempt in range(_LOAD_ATTEMPTS):
+            with open(persist_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            count = len(meta["ids"])
+            try:
+                vectors = np.load(_data_path(persist_path, meta.get("data_file")), mmap_mode="r") if count else None
+                break
+            except FileNotFoundError:
+                # Another process persisted and deleted this matrix after we read the JSON file
+                if attempt == _LOAD_ATTEMPTS - 1:
+                    raise
+        with self._lock:
+            self._ids = meta["ids"]
+            self._ref_doc_ids = meta["ref_doc_ids"]
+            self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
+            self._vectors = vectors
+            self._count = count
+            self._scales = (
+                np.array(meta["scales"], dtype=np.float32) if meta.get("scales") is not None
+                else np.ones(count, dtype=np.float32)
+            )
+            self._live = np.ones(count, dtype=bool)
+            self._mapped = vectors is not None
+            self._dirty = False
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, dtype: str = "float32") -> "MmapVectorStore":
+        """
+        Load a persisted store, mapping its matrix read-only.
+
+        A SimpleVectorStore file at the same path is migrated, and a store
+        persisted with another dtype is re-quantized; either way needs_persist
+        is set so the caller writes the converted store back.
+
+        Args:
+            persist_path (str): Vector store JSON file.
+            dtype (str, optional): Storage type wanted. Defaults to "float32".
+
+        Returns:
+            MmapVectorStore: The loaded store, empty if nothing was persisted.
+        """
+        store = cls(dtype=dtype)
+        if not os.path.exists(persist_path):
+            return store
+        with open(persist_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        if meta.get("format") != cls.class_name():
+            # A SimpleVectorStore file: re-encode its float lists
+            embeddings = meta.get("embedding_dict", {})
+            ref_doc_ids = meta.get("text_id_to_ref_doc_id", {})
+            logger.info("Migrating %d embeddings from SimpleVectorStore to %s", len(embeddings), dtype)
+            if embeddings:
+                rows, scales = quantize(np.array(list(embeddings.values()), dtype=np.float32), dtype)
+                store._append(rows, scales)
+                store._ids = list(embeddings)
+                store._ref_doc_ids = [ref_doc_ids.get(node_id, "None") for node_id in embeddings]
+                store._rows = {node_id: row for row, node_id in enumerate(embeddings)}
+            store._dirty = True
+            return store
+
+        store._load_persisted(persist_path)
+        if meta["dtype"] != dtype:
+            logger.info("Re-quantizing %d embeddings from %s to %s", len(store._rows), meta["dtype"], dtype)
+            if np.dtype(VECTOR_DTYPES[dtype]).itemsize > np.dtype(VECTOR_DTYPES[meta["dtype"]]).itemsize:
+                logger.warning("Precision lost to %s is not restored; rebuild the index to re-embed", meta["dtype"])
+            vectors = store._vectors
+            if vectors is not None:
+                unit = vectors.astype(np.float32) * store._scales[:, None]
+                converted = cls(dtype=dtype)
+                rows, scales = quantize(unit, dtype)
+                converted._append(rows, scales)
+                converted._ids, converted._ref_doc_ids = store._ids, store._ref_doc_ids
+                converted._rows = store._rows
+                store = converted
+            else:
+                store = cls(dtype=dtype)
+            store._dirty = True
+        return store
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Startup Benchmark
+-----------------
+Measures how long it takes to import the package and to get the first
+agent ready to talk, comparing a blocking index build with the background
+warm-up used by setup_chat_environment.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeat 5] [--mock-embeddings]
+
+Import times are measured in fresh interpreters so module caches do not
+hide the cost. --mock-embeddings swaps in llama_index's MockEmbedding so
+the startup comparison runs without an OpenAI key.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+IMPORT_CASES = {
+    "import FinancialAdvisorRBA": "import FinancialAdvisorRBA",
+    "from FinancialAdvisorRBA import load_config": "from FinancialAdvisorRBA import load_config",
+    "import FinancialAdvisorRBA.financialdemo": "import FinancialAdvisorRBA.financialdemo",
+}
+
+def time_import(statement: str, repeat: int) -> float:
+    """Median wall time of a statement in a fresh interpreter, in seconds."""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def time_first_agent(pdf_dir: Path, background: bool) -> dict:
+    """Seconds until the first agent exists, and until the index is usable."""
+    from FinancialAdvisorRBA.agents import create_advisor_agent
+    from FinancialAdvisorRBA.utils import initialize_llama_index, start_index_warmup
+
+    llm_config = {"config_list": [{"model": "gpt-4", "api_key": "sk-benchmark"}]}
+    with tempfile.TemporaryDirectory() as persist_dir:
+        start = time.perf_counter()
+        if background:
+            index = start_index_warmup(pdf_dir, Path(persist_dir))
+        else:
+            index = initialize_llama_index(pdf_dir, Path(persist_dir))
+        create_advisor_agent(llm_config)
+        first_agent = time.perf_counter() - start
+        if background:
+            index.wait()
+        index_ready = time.perf_counter() - start
+    return {"first_agent_s": first_agent, "index_ready_s": index_ready}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark package import and startup latency")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter launches per import case")
+    parser.add_argument("--pdf-dir", type=Path, default=REPO_ROOT / "FinancialAdvisorRBA" / "sample_pdf")
+    parser.add_argument("--mock-embeddings", action="store_true", help="Use MockEmbedding instead of OpenAI")
+    parser.add_argument("--skip-startup", action="store_true", help="Only measure import times")
+    args = parser.parse_args()
+
+    print("Import time (median of %d cold interpreters)" % args.repeat)
+    for label, statement in IMPORT_CASES.items():
+        print(f"  {label:<48} {time_import(statement, args.repeat) * 1000:8.1f} ms")
+
+    if args.skip_startup:
+        return
+    if args.mock_embeddings:
+        from llama_index.core import Settings
+        from llama_index.core.embeddings import MockEmbedding
+        Settings.embed_model = MockEmbedding(embed_dim=1536)
+
+    print("Startup (cold index build)")
+    for background in (False, True):
+        result = time_first_agent(args.pdf_dir, background)
+        mode = "background warm-up" if background else "blocking build"
+        print(f"  {mode:<20} first agent {result['first_agent_s']:8.2f} s   index ready {result['index_ready_s']:8.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Vector Store Benchmark
+----------------------
+Compares llama_index's SimpleVectorStore (exact float lists) with the
+memory-mapped MmapVectorStore in float32, float16 and int8. Each store is
+persisted once, then loaded and queried by several worker processes at
+the same time, as the demo's worker processes would.
+
+Reported per store: file size, private (anonymous) and shared (file-backed)
+resident memory per worker, query latency, and recall@k against the exact
+float store.
+
+Usage:
+    python benchmarks/bench_vector_store.py [--vectors 5000] [--dim 1536] [--workers 4] [--top-k 8]
+
+Embeddings are synthetic (clustered Gaussian), so no key or network is
+needed. Memory figures come from /proc/self/status and are Linux only.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+STORES = ["simple", "float32", "float16", "int8"]
+
+def _rss_mb() -> Dict[str, float]:
+    """Anonymous (private) and file-backed (shareable) resident memory of this process in MB."""
+    rss = {"RssAnon": 0.0, "RssFile": 0.0}
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in rss:
+                    rss[key] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return rss
+
+def synthetic_embeddings(count: int, dim: int, seed: int, clusters: int = 64) -> np.ndarray:
+    """Clustered Gaussian vectors, so near neighbours are meaningful."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    return centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+
+def build_stores(workdir: Path, vectors: np.ndarray) -> Dict[str, Path]:
+    """Persist the same embeddings in every store and return their files."""
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores import SimpleVectorStore
+
+    from FinancialAdvisorRBA.vector_store import MmapVectorStore
+
+    nodes = [TextNode(id_=f"node-{i}", text="", embedding=vector.tolist()) for i, vector in enumerate(vectors)]
+    paths = {}
+    simple = SimpleVectorStore()
+    simple.add(nodes)
+    paths["simple"] = workdir / "simple__vector_store.json"
+    simple.persist(str(paths["simple"]))
+    for dtype in STORES[1:]:
+        store = MmapVectorStore(dtype=dtype)
+        store.add(nodes)
+        paths[dtype] = workdir / f"{dtype}__vector_store.json"
+        store.persist(str(paths[dtype]))
+    return paths
+
+def worker(kind: str, path: str, queries_path: str, top_k: int) -> Dict[str, Any]:
+    """Load a store in a fresh process, run every query, and report memory, latency and results."""
+    from llama_index.core.vector_stores import SimpleVectorStore
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+
+    from FinancialAdvisorRBA.vector_store import MmapVectorStore
+
+    queries = np.load(queries_path)
+    before = _rss_mb()
+    start = time.perf_counter()
+    store = SimpleVectorStore.from_persist_path(path) if kind == "simple" else MmapVectorStore.from_persist_path(path, kind)
+    load_seconds = time.perf_counter() - start
+
+    latencies, results = [], []
+    for query in queries:
+        t = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+        latencies.append((time.perf_counter() - t) * 1000)
+        results.append(result.ids)
+    after = _rss_mb()
+    return {
+        "load_seconds": load_seconds,
+        "anon_mb": after["RssAnon"] - before["RssAnon"],
+        "file_mb": after["RssFile"] - before["RssFile"],
+        "query_p50_ms": statistics.median(latencies),
+        "results": results
+    }
+
+def recall(results: List[List[str]], exact: List[List[str]]) -> float:
+    """Mean fraction of the exact top-k found."""
+    return statistics.mean(len(set(got) & set(want)) / len(want) for got, want in zip(results, exact) if want)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark memory and recall of the memory-mapped vector store")
+    parser.add_argument("--vectors", type=int, default=5000, help="Embeddings in the store")
+    parser.add_argument("--dim", type=int, default=1536, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per worker")
+    parser.add_argument("--workers", type=int, default=4, help="Processes loading each store at once")
+    parser.add_argument("--top-k", type=int, default=8, help="Neighbours per query (the retriever's candidate_k)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rba-vectors-") as tmp:
+        workdir = Path(tmp)
+        vectors = synthetic_embeddings(args.vectors, args.dim, seed=0)
+        # Queries near stored vectors, like a question about a topic the research covers
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, len(vectors), args.queries)] + 0.8 * rng.standard_normal(
+            (args.queries, args.dim)
+        ).astype(np.float32)
+        queries_path = workdir / "queries.npy"
+        np.save(queries_path, queries)
+        paths = build_stores(workdir, vectors)
+        del vectors
+
+        print(f"{args.vectors} x {args.dim} embeddings, {args.workers} workers, recall@{args.top_k}", flush=True)
+        print(f"{'store':<8} {'file MB':>8} {'private MB/worker':>18} {'shared MB/worker':>17} "
+              f"{'load s':>7} {'query p50 ms':>13} {'recall':>7}", flush=True)
+        exact = None
+        context = get_context("spawn")
+        for kind in STORES:
+            size = os.path.getsize(paths[kind]) + (
+                os.path.getsize(paths[kind].parent / json.loads(paths[kind].read_text())["data_file"])
+                if kind != "simple" else 0
+            )
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+                runs = list(pool.map(
+                    worker, [kind] * args.workers, [str(paths[kind])] * args.workers,
+                    [str(queries_path)] * args.workers, [args.top_k] * args.workers
+                ))
+            if exact is None:
+                exact = runs[0]["results"]
+            print(
+                f"{kind:<8} {size / 2**20:8.1f} {statistics.mean(r['anon_mb'] for r in runs):18.1f} "
+                f"{statistics.mean(r['file_mb'] for r in runs):17.1f} "
+                f"{statistics.mean(r['load_seconds'] for r in runs):7.2f} "
+                f"{statistics.mean(r['query_p50_ms'] for r in runs):13.2f} "
+                f"{statistics.mean(recall(r['results'], exact) for r in runs):7.3f}",
+                flush=True
+            )
+
+if __name__ == "__main__":
+    main()
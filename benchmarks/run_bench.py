@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline End-to-End Benchmark
+----------------------------
+Runs scripted advisory sessions against the local stub OpenAI server and
+reports wall time, rounds, LLM calls, prompt/completion tokens, retrieval
+latency, time to first streamed token and routing fallbacks per scenario.
+Reports from two runs can be compared to catch regressions.
+
+Usage:
+    python benchmarks/run_bench.py run [scenarios/*.json] --output results.json
+    python benchmarks/run_bench.py compare baseline.json results.json [--threshold 0.1]
+
+No OpenAI key or network access is needed: agents, the LlamaIndex
+synthesizer and embeddings all talk to the stub server, and the stdin
+user is replaced by the scenario's scripted replies.
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_openai import StubOpenAIServer
+
+SCENARIO_DIR = Path(__file__).resolve().parent / "scenarios"
+STUB_API_KEY = "sk-stub-benchmark"
+
+# Metrics where an increase is a regression; timings use a relative threshold, counts any increase
+TIMING_METRICS = ["wall_seconds", "index_seconds", "retrieval_mean_ms", "retrieval_p95_ms", "first_token_p50_ms"]
+COUNT_METRICS = [
+    "rounds", "llm_calls", "prompt_tokens", "completion_tokens", "llm_cost_usd", "tier_escalations", "llm_retries",
+    "routing_fallbacks"
+]
+
+class ScriptedUser:
+    """Replays a fixed list of user replies in place of stdin, then exits."""
+
+    def __init__(self, replies: List[str]):
+        self.replies = list(replies)
+        self.turns = 0
+
+    def __call__(self, prompt: str) -> str:
+        reply = self.replies[self.turns] if self.turns < len(self.replies) else "exit"
+        self.turns += 1
+        return reply
+
+class ReplyTimer:
+    """Token channel that records how long each streamed reply takes to start and to finish."""
+
+    def __init__(self):
+        self.first_token_ms: List[float] = []
+        self.reply_ms: List[float] = []
+        self._started: Dict[str, float] = {}
+        self._waiting: Dict[str, bool] = {}
+
+    def start(self, speaker: str) -> None:
+        self._started[speaker] = time.perf_counter()
+        self._waiting[speaker] = True
+
+    def token(self, speaker: str, text: str) -> None:
+        if self._waiting.pop(speaker, False):
+            self.first_token_ms.append((time.perf_counter() - self._started[speaker]) * 1000)
+
+    def route(self, speaker: str, keyword: str, target: Any) -> None:
+        pass
+
+    def restart(self, speaker: str) -> None:
+        pass
+
+    def end(self, speaker: str, content: str) -> None:
+        if content:
+            self.reply_ms.append((time.perf_counter() - self._started[speaker]) * 1000)
+        self._waiting.pop(speaker, None)
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_scenario(path: Path) -> Dict[str, Any]:
+    """Run one scenario end to end and return its metrics."""
+    from llama_index.core import Settings
+    from llama_index.embeddings.openai import OpenAIEmbedding
+    from llama_index.llms.openai import OpenAI
+
+    from FinancialAdvisorRBA import financialdemo
+    from FinancialAdvisorRBA.agents import create_user_proxy
+    from FinancialAdvisorRBA.checkpoints import open_checkpoint
+    from FinancialAdvisorRBA.config import build_config
+    from FinancialAdvisorRBA.model_tiers import tier_metrics
+    from FinancialAdvisorRBA.scheduler import get_llm_scheduler
+    from FinancialAdvisorRBA.tracing import summarize_trace_file
+    from FinancialAdvisorRBA.utils import configure_profile_store, initialize_llama_index, speaker_router
+
+    scenario = json.loads(path.read_text(encoding="utf-8"))
+    stub = StubOpenAIServer(scenario, token_latency=scenario.get("token_latency", 0.0)).start()
+    workdir = Path(tempfile.mkdtemp(prefix="rba-bench-"))
+    original_query = financialdemo.llama_index_query
+    original_batch_query = financialdemo.llama_index_batch_query
+    try:
+        Settings.embed_model = OpenAIEmbedding(api_key=STUB_API_KEY, api_base=stub.base_url)
+        Settings.llm = OpenAI(model="gpt-4", api_key=STUB_API_KEY, api_base=stub.base_url)
+
+        config = build_config(STUB_API_KEY)
+        for entry in config["llm_config"]["config_list"]:
+            entry["base_url"] = stub.base_url
+        # Disable autogen's response cache so every run exercises the full path
+        config["llm_config"]["cache_seed"] = None
+        config["index_dir"] = workdir / "index_store"
+        config["profile_db"] = workdir / "customers.db"
+        config["compliance_audit_log"] = workdir / "compliance_audit.jsonl"
+        config["trace_log"] = workdir / "trace.jsonl"
+
+        pdf_dir = workdir / "pdfs"
+        pdf_dir.mkdir()
+        for name in scenario.get("pdf_files", []):
+            shutil.copy(Path(config["pdf_dir"]) / name, pdf_dir / name)
+
+        start = time.perf_counter()
+        index = initialize_llama_index(pdf_dir, config["index_dir"], config["vector_dtype"])
+        index_seconds = time.perf_counter() - start
+        configure_profile_store(config["profile_db"])
+        stub.reset_stats()
+        tier_metrics.reset()
+
+        retrieval_ms: List[float] = []
+
+        def timed_query(query, index, filters=None):
+            t = time.perf_counter()
+            try:
+                return original_query(query, index, filters)
+            finally:
+                retrieval_ms.append((time.perf_counter() - t) * 1000)
+
+        def timed_batch_query(queries, index, filters=None):
+            t = time.perf_counter()
+            try:
+                return original_batch_query(queries, index, filters)
+            finally:
+                retrieval_ms.append((time.perf_counter() - t) * 1000)
+
+        financialdemo.llama_index_query = timed_query
+        financialdemo.llama_index_batch_query = timed_batch_query
+        routing_before = speaker_router.stats()
+
+        user = ScriptedUser(scenario.get("user", []))
+        user_proxy = create_user_proxy(input_fn=user)
+        checkpoint = open_checkpoint(workdir / "sessions", "bench")
+        replies = ReplyTimer()
+        manager = financialdemo.build_chat_manager(config, index, user_proxy, checkpoint, token_channel=replies)
+        scheduler = get_llm_scheduler()
+        scheduler.reset_stats()
+        start = time.perf_counter()
+        user_proxy.initiate_chat(manager, message=scenario["opening"])
+        wall_seconds = time.perf_counter() - start
+
+        routing_after = speaker_router.stats()
+        llm_stats = stub.snapshot()
+        chat_stats = {caller: values for caller, values in llm_stats.items() if caller != "embeddings"}
+        tiers = tier_metrics.summary()
+        scheduling = scheduler.stats()
+        return {
+            "scenario": scenario.get("name", path.stem),
+            "wall_seconds": wall_seconds,
+            "index_seconds": index_seconds,
+            "rounds": len(manager.groupchat.messages),
+            "llm_calls": sum(v["calls"] for v in chat_stats.values()),
+            "prompt_tokens": sum(v["prompt_tokens"] for v in chat_stats.values()),
+            "completion_tokens": sum(v["completion_tokens"] for v in chat_stats.values()),
+            "llm_cost_usd": round(sum(v["cost_usd"] for v in tiers.values()), 6),
+            "tier_escalations": sum(sum(v["escalations"].values()) for v in tiers.values()),
+            "llm_retries": scheduling["retries"],
+            "embedding_calls": llm_stats.get("embeddings", {}).get("calls", 0),
+            "retrieval_calls": len(retrieval_ms),
+            "retrieval_mean_ms": statistics.mean(retrieval_ms) if retrieval_ms else 0.0,
+            "retrieval_p95_ms": _percentile(retrieval_ms, 0.95),
+            "streamed_replies": len(replies.reply_ms),
+            "first_token_p50_ms": _percentile(replies.first_token_ms, 0.50),
+            "reply_p50_ms": _percentile(replies.reply_ms, 0.50),
+            "routing_fallbacks": routing_after.get("fallback", 0) - routing_before.get("fallback", 0),
+            "llm_calls_by_caller": {caller: v["calls"] for caller, v in sorted(chat_stats.items())},
+            "tiers": tiers,
+            "scheduler": scheduling,
+            "user_turns": user.turns,
+            "spans": summarize_trace_file(config["trace_log"])
+        }
+    finally:
+        financialdemo.llama_index_query = original_query
+        financialdemo.llama_index_batch_query = original_batch_query
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print a side-by-side comparison of two reports.
+
+    Args:
+        baseline (Dict[str, Any]): Earlier report.
+        current (Dict[str, Any]): New report.
+        threshold (float): Allowed relative slowdown for timing metrics.
+
+    Returns:
+        List[str]: Descriptions of regressions found.
+    """
+    regressions = []
+    old_by_name = {s["scenario"]: s for s in baseline["scenarios"]}
+    for new in current["scenarios"]:
+        old = old_by_name.get(new["scenario"])
+        if old is None:
+            print(f"{new['scenario']}: no baseline")
+            continue
+        print(f"{new['scenario']}")
+        for metric in TIMING_METRICS + COUNT_METRICS:
+            before, after = old.get(metric, 0), new.get(metric, 0)
+            change = (after - before) / before if before else 0.0
+            if metric in TIMING_METRICS:
+                regressed = after > before * (1 + threshold) and after - before > 1e-3
+            else:
+                regressed = after > before
+            flag = "  REGRESSION" if regressed else ""
+            print(f"  {metric:<20} {before:>12.3f} -> {after:>12.3f}  ({change:+.1%}){flag}")
+            if regressed:
+                regressions.append(f"{new['scenario']}.{metric}: {before:.3f} -> {after:.3f}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for the advisory chat")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Run scenarios and write a report")
+    run_parser.add_argument("scenarios", nargs="*", type=Path, help="Scenario JSON files (default: all)")
+    run_parser.add_argument("--output", type=Path, help="Where to write the JSON report")
+    compare_parser = commands.add_parser("compare", help="Compare two reports")
+    compare_parser.add_argument("baseline", type=Path)
+    compare_parser.add_argument("current", type=Path)
+    compare_parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown for timings")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        current = json.loads(args.current.read_text(encoding="utf-8"))
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) found")
+            sys.exit(1)
+        print("No regressions")
+        return
+
+    paths = args.scenarios or sorted(SCENARIO_DIR.glob("*.json"))
+    report = {"created": time.time(), "scenarios": [run_scenario(path) for path in paths]}
+    for result in report["scenarios"]:
+        print(
+            f"{result['scenario']}: {result['wall_seconds']:.2f}s wall, {result['rounds']} rounds, "
+            f"{result['llm_calls']} LLM calls, {result['prompt_tokens']}+{result['completion_tokens']} tokens, "
+            f"retrieval {result['retrieval_mean_ms']:.1f}ms mean, first token {result['first_token_p50_ms']:.1f}ms "
+            f"of {result['reply_p50_ms']:.1f}ms p50 reply, {result['routing_fallbacks']} routing fallbacks"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stub OpenAI Server
+------------------
+A local, OpenAI-compatible stand-in for benchmarks. It serves:
+
+- POST /v1/chat/completions: scripted completions per agent, or replayed
+  completions from an earlier transcript, streamed as server-sent events
+  (word by word, with a final usage chunk) when the request asks to stream.
+- POST /v1/embeddings: deterministic hashed bag-of-words embeddings, so
+  similar texts get similar vectors and retrieval behaves realistically.
+- GET /stats: call and token counters per caller.
+
+With a rate limit set, completions beyond the allowed number per window
+are refused with 429 and a Retry-After header, like the real endpoint.
+
+Callers are identified from the system message, so the script can give
+each agent its own sequence of replies. Script format:
+
+    {
+      "responses": {
+        "FinancialAdvisor": ["What is your goal?", {"tool_calls": [{"name": "f", "arguments": {}}]}],
+        "synthesis": ["Hong Kong equities ..."]
+      },
+      "default": "OK"
+    }
+
+Each caller's list is consumed in order and its last entry repeats.
+
+Usage:
+    python benchmarks/stub_openai.py --script scenario.json --port 8399
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+EMBEDDING_DIM = 256
+
+# A word and the whitespace after it: one streamed content chunk
+_WORD = re.compile(r"\s*\S+\s*")
+
+# Substrings of each agent's system prompt used to attribute requests
+AGENT_MARKERS = {
+    "FinancialAdvisor": "expert financial advisor",
+    "PortfolioRecommendationAgent": "You are the Portfolio Recommendation Agent",
+    "MarketDataAgent": "financial market intelligence assistant",
+    "RiskAssessmentAgent": "You are the Risk Assessment Agent",
+    "RegulatoryComplianceAgent": "You are the Regulatory Compliance Agent",
+    "speaker_selection": "role play game",
+}
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, else approximate by characters."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    Deterministic unit-length embedding from hashed word counts.
+
+    Args:
+        text (str): Text to embed.
+        dim (int, optional): Embedding size. Defaults to EMBEDDING_DIM.
+
+    Returns:
+        List[float]: Normalized embedding.
+    """
+    vector = [0.0] * dim
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+def _request_key(messages: List[Dict[str, Any]]) -> str:
+    """Hash of a chat request's messages, used to match replayed completions."""
+    payload = json.dumps([(m.get("role"), m.get("content")) for m in messages], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class StubOpenAIServer:
+    """Threaded stub server with scripted or replayed completions."""
+
+    def __init__(
+        self,
+        script: Optional[Dict[str, Any]] = None,
+        replay: Optional[Path] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        rate_limit: Optional[Tuple[int, float]] = None,
+        token_latency: float = 0.0
+    ):
+        """
+        Args:
+            script (Optional[Dict[str, Any]], optional): Scripted responses per caller. Defaults to None.
+            replay (Optional[Path], optional): Transcript JSONL whose completions are replayed by request hash. Defaults to None.
+            host (str, optional): Bind address. Defaults to "127.0.0.1".
+            port (int, optional): Bind port, 0 for any free port. Defaults to 0.
+            latency (float, optional): Artificial seconds of delay per completion. Defaults to 0.0.
+            rate_limit (Optional[Tuple[int, float]], optional): At most this many completions per this many
+                seconds; others get 429. Defaults to None (unlimited).
+            token_latency (float, optional): Artificial seconds of generation time per word of a reply,
+                spent before a whole completion is returned or between the chunks of a stream. Defaults to 0.0.
+        """
+        script = script or {}
+        self.responses: Dict[str, List[Any]] = {k: list(v) for k, v in script.get("responses", {}).items()}
+        self.default: Any = script.get("default", "OK")
+        self.latency = latency
+        self.token_latency = token_latency
+        self.rate_limit = rate_limit
+        self.rejected = 0
+        self._recent: deque = deque()
+        self.replayed: Dict[str, Any] = {}
+        if replay is not None:
+            with open(replay, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.replayed[entry["key"]] = entry["response"]
+        self.transcript: List[Dict[str, Any]] = []
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+        self._cursor: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI-compatible base URL of the running server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubOpenAIServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_stats(self) -> None:
+        """Clear call counters, the rejection count and the transcript."""
+        with self._lock:
+            self.stats.clear()
+            self.transcript.clear()
+            self.rejected = 0
+
+    def admit(self) -> Optional[float]:
+        """
+        Apply the rate limit to a completion request.
+
+        Returns:
+            Optional[float]: None if the request is admitted, else seconds until it would be.
+        """
+        if self.rate_limit is None:
+            return None
+        limit, window = self.rate_limit
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] >= window:
+                self._recent.popleft()
+            if len(self._recent) < limit:
+                self._recent.append(now)
+                return None
+            self.rejected += 1
+            return window - (now - self._recent[0])
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Copy of the per-caller counters."""
+        with self._lock:
+            return {caller: dict(values) for caller, values in self.stats.items()}
+
+    def save_transcript(self, path: Path) -> None:
+        """Write the request/response transcript for later replay."""
+        with self._lock, open(path, "w", encoding="utf-8") as f:
+            for entry in self.transcript:
+                f.write(json.dumps(entry) + "\n")
+
+    def _caller(self, messages: List[Dict[str, Any]]) -> str:
+        """Attribute a request to an agent by its system prompt."""
+        system = " ".join(str(m.get("content") or "") for m in messages if m.get("role") == "system")
+        for caller, marker in AGENT_MARKERS.items():
+            if marker in system:
+                return caller
+        return "synthesis"
+
+    def _next_response(self, caller: str, key: str) -> Any:
+        """Pick the replayed or scripted response for a caller."""
+        if key in self.replayed:
+            return self.replayed[key]
+        script = self.responses.get(caller)
+        if not script:
+            return self.default
+        index = min(self._cursor[caller], len(script) - 1)
+        self._cursor[caller] += 1
+        return script[index]
+
+    def chat_completion(self, body: Dict[str, Any], stream: bool = False) -> Dict[str, Any]:
+        """Build a chat completion response for a request body. A streamed reply's per-word delay is left to stream_chunks."""
+        messages = body.get("messages", [])
+        key = _request_key(messages)
+        with self._lock:
+            caller = self._caller(messages)
+            response = self._next_response(caller, key)
+
+        message: Dict[str, Any] = {"role": "assistant", "content": None}
+        finish_reason = "stop"
+        if isinstance(response, dict) and response.get("tool_calls"):
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}
+                }
+                for call in response["tool_calls"]
+            ]
+            finish_reason = "tool_calls"
+            completion_text = json.dumps(response["tool_calls"])
+        else:
+            message["content"] = response["content"] if isinstance(response, dict) else str(response)
+            completion_text = message["content"]
+
+        prompt_tokens = sum(count_tokens(str(m.get("content") or "")) for m in messages)
+        completion_tokens = count_tokens(completion_text)
+        with self._lock:
+            stats = self.stats[caller]
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            self.transcript.append({"key": key, "caller": caller, "response": response})
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.token_latency and not stream:
+            time.sleep(self.token_latency * len(_WORD.findall(message["content"] or "")))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason, "logprobs": None}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def stream_chunks(self, completion: Dict[str, Any], include_usage: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Split a chat completion into streamed chunks, as the real endpoint sends them.
+
+        Args:
+            completion (Dict[str, Any]): Response built by chat_completion.
+            include_usage (bool, optional): End with a chunk carrying the token usage. Defaults to False.
+
+        Yields:
+            Dict[str, Any]: "chat.completion.chunk" objects: the role, the content a word at a
+            time or the tool calls, the finish reason, then the usage if asked for.
+        """
+        choice = completion["choices"][0]
+        message = choice["message"]
+        header = {key: completion[key] for key in ("id", "created", "model")}
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> Dict[str, Any]:
+            return {
+                **header,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}]
+            }
+
+        yield chunk({"role": "assistant", "content": ""})
+        for word in _WORD.findall(message["content"] or ""):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield chunk({"content": word})
+        for index, call in enumerate(message.get("tool_calls") or []):
+            yield chunk({"tool_calls": [{"index": index, **call}]})
+        yield chunk({}, choice["finish_reason"])
+        if include_usage:
+            yield {**header, "object": "chat.completion.chunk", "choices": [], "usage": completion["usage"]}
+
+    def embeddings(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Build an embeddings response for a request body."""
+        inputs: Union[str, List[str]] = body.get("input", [])
+        texts = [inputs] if isinstance(inputs, str) else [str(text) for text in inputs]
+        tokens = sum(count_tokens(text) for text in texts)
+        with self._lock:
+            stats = self.stats["embeddings"]
+            stats["calls"] += 1
+            stats["prompt_tokens"] += tokens
+        return {
+            "object": "list",
+            "model": body.get("model", "text-embedding-ada-002"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                for i, text in enumerate(texts)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    def _handler_class(self) -> type:
+        """HTTP handler bound to this server instance."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks: Iterator[Dict[str, Any]]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/stats"):
+                    self._send(200, server.snapshot())
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith("/chat/completions"):
+                    retry_after = server.admit()
+                    if retry_after is not None:
+                        self._send(429, {
+                            "error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+                        }, {"Retry-After": f"{retry_after:.3f}"})
+                    elif body.get("stream"):
+                        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+                        self._send_stream(server.stream_chunks(server.chat_completion(body, stream=True), include_usage))
+                    else:
+                        self._send(200, server.chat_completion(body))
+                elif self.path.endswith("/embeddings"):
+                    self._send(200, server.embeddings(body))
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        return Handler
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub server")
+    parser.add_argument("--script", type=Path, help="Scenario or script JSON with a 'responses' section")
+    parser.add_argument("--replay", type=Path, help="Transcript JSONL to replay")
+    parser.add_argument("--port", type=int, default=8399)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay per completion")
+    parser.add_argument("--rate-limit", help="Completions allowed per window, as COUNT/SECONDS, e.g. 60/60")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds of generation time per word")
+    args = parser.parse_args()
+
+    script = json.loads(args.script.read_text(encoding="utf-8")) if args.script else None
+    rate_limit = None
+    if args.rate_limit:
+        count, _, seconds = args.rate_limit.partition("/")
+        rate_limit = (int(count), float(seconds or 60))
+    server = StubOpenAIServer(
+        script, args.replay, port=args.port, latency=args.latency, rate_limit=rate_limit,
+        token_latency=args.token_latency
+    )
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for batch review inputs, resumption and customers without a risk profile."""
+
+import json
+
+import pytest
+
+from FinancialAdvisorRBA.batch import completed_customers, read_customer_list, review_customer
+from FinancialAdvisorRBA.profiles import DEFAULT_CUSTOMER_ID
+from FinancialAdvisorRBA.utils import close_profile_store, configure_profile_store
+
+@pytest.fixture
+def profile_store(tmp_path):
+    yield configure_profile_store(tmp_path / "customers.db")
+    close_profile_store()
+
+def test_customers_without_a_risk_profile_are_unknown(tmp_path):
+    path = tmp_path / "customers.txt"
+    path.write_text("# id,risk\nC001,conservative\nC002\n\nC003, \n", encoding="utf-8")
+    assert list(read_customer_list(path)) == [("C001", "conservative"), ("C002", None), ("C003", None)]
+    assert list(read_customer_list(path, "moderate"))[1:] == [("C002", "moderate"), ("C003", "moderate")]
+
+def test_errors_and_needs_review_are_retried(tmp_path):
+    output = tmp_path / "reviews.jsonl"
+    output.write_text("\n".join(json.dumps({"customer_id": customer_id, "status": status}) for customer_id, status in [
+        ("C001", "approved"), ("C002", "error"), ("C003", "needs_review"), ("C004", "requires_changes")
+    ]) + "\n{torn", encoding="utf-8")
+    assert completed_customers(output) == {"C001", "C004"}
+
+def test_unknown_risk_profile_is_not_reviewed(profile_store):
+    # No LLM call is made, so the config and index are never touched
+    result = review_customer({}, None, DEFAULT_CUSTOMER_ID, None)
+    assert result["status"] == "needs_review"
+    assert result["risk_profile"] is None
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for splitting a combined market data answer into per-question parts."""
+
+from FinancialAdvisorRBA.utils import _split_batch_answer
+
+def test_labelled_parts_are_keyed_by_question_position():
+    text = "[1] HK equities rose 5%.\nMore detail.\n[2]: Bonds were flat.\n  [3]. Gold fell."
+    assert _split_batch_answer(text, 3) == {0: "HK equities rose 5%.\nMore detail.", 1: "Bonds were flat.", 2: "Gold fell."}
+
+def test_missing_empty_and_out_of_range_parts_are_dropped():
+    text = "Preamble\n[1]\n[2] Answer two\n[5] Not asked"
+    assert _split_batch_answer(text, 3) == {1: "Answer two"}
+
+def test_first_answer_for_a_repeated_label_wins():
+    assert _split_batch_answer("[1] First\n[1] Second", 1) == {0: "First"}
+
+def test_labels_inside_a_line_are_not_split():
+    assert _split_batch_answer("[1] See note [2] in the report", 2) == {0: "See note [2] in the report"}
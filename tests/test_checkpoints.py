@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for session checkpoint recording and recovery from torn writes."""
+
+import json
+
+from FinancialAdvisorRBA.checkpoints import SessionCheckpoint
+
+def _message(content, name="FinancialAdvisor"):
+    return {"role": "user", "name": name, "content": content}
+
+def _write(checkpoint, contents):
+    for index, content in enumerate(contents):
+        checkpoint.record(index, _message(content), "FinancialAdvisor")
+
+def test_recorded_rounds_are_restored(tmp_path):
+    path = tmp_path / "s1.jsonl"
+    checkpoint = SessionCheckpoint(path, "s1")
+    _write(checkpoint, ["Hello", "Please APPROVE the report"])
+    checkpoint.close()
+
+    restored = SessionCheckpoint(path, "s1")
+    assert [m["content"] for m in restored.messages] == ["Hello", "Please APPROVE the report"]
+    assert restored.rounds == 2
+    assert restored.pending_approval == {"agent": "FinancialAdvisor", "round": 1}
+    assert not restored.finished
+    restored.close()
+
+def test_torn_last_line_is_ignored_and_terminated(tmp_path):
+    path = tmp_path / "s2.jsonl"
+    checkpoint = SessionCheckpoint(path, "s2")
+    _write(checkpoint, ["First", "Second"])
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"round": 2, "speaker": "Finan')
+
+    restored = SessionCheckpoint(path, "s2")
+    assert [m["content"] for m in restored.messages] == ["First", "Second"]
+    restored.record(2, _message("Third"), "FinancialAdvisor")
+    restored.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert json.loads(lines[-1])["message"]["content"] == "Third"
+    again = SessionCheckpoint(path, "s2")
+    assert [m["content"] for m in again.messages] == ["First", "Second", "Third"]
+    again.close()
+
+def test_replayed_rounds_are_not_duplicated(tmp_path):
+    path = tmp_path / "s3.jsonl"
+    checkpoint = SessionCheckpoint(path, "s3")
+    _write(checkpoint, ["First"])
+    checkpoint.close()
+
+    restored = SessionCheckpoint(path, "s3")
+    _write(restored, ["First", "Second"])
+    restored.finish()
+    restored.close()
+
+    again = SessionCheckpoint(path, "s3")
+    assert [m["content"] for m in again.messages] == ["First", "Second"]
+    assert again.finished
+    again.close()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for allocation parsing and the deterministic compliance rule engine."""
+
+import pytest
+
+from FinancialAdvisorRBA.compliance import AMBIGUOUS, APPROVED, REQUIRES_CHANGES, ComplianceRuleEngine, parse_allocation
+
+@pytest.fixture(scope="module")
+def engine():
+    return ComplianceRuleEngine.from_file()
+
+def _proposal(*lines):
+    return "Proposed allocation:\n" + "\n".join(lines)
+
+def test_parse_allocation_reads_percent_first_and_percent_last_lines():
+    holdings, unrecognized = parse_allocation(_proposal("- 50% S&P 500 Index Fund", "Gold: 10%"))
+    assert [(name, weight) for name, _, weight in holdings] == [("S&P 500 Index Fund", 0.5), ("Gold", 0.1)]
+    assert unrecognized == []
+
+def test_parse_allocation_ignores_lines_without_a_single_percentage():
+    holdings, _ = parse_allocation("Expected return of 5% to 7%\nNo weights here")
+    assert holdings == []
+
+def test_rounded_weights_are_not_rejected(engine):
+    for weight in (32, 33, 34):
+        proposal = _proposal(
+            f"- {weight}% Government Bonds", f"- {weight}% Cash", f"- {weight}% Investment Grade Bonds"
+        )
+        result = engine.evaluate(proposal, "moderate")
+        assert result["verdict"] != REQUIRES_CHANGES
+        assert "ALLOC-001" not in result["violations"]
+
+def test_exact_total_within_limits_is_approved(engine):
+    proposal = _proposal("- 33% Government Bonds", "- 33% Cash", "- 33% Investment Grade Bonds")
+    assert engine.evaluate(proposal, "moderate")["verdict"] == APPROVED
+
+def test_crypto_over_the_cap_requires_changes(engine):
+    proposal = _proposal("- 40% Government Bonds", "- 40% Cash", "- 20% Bitcoin")
+    result = engine.evaluate(proposal, "moderate")
+    assert result["verdict"] == REQUIRES_CHANGES
+    assert "CRYPTO-001" in result["violations"]
+
+def test_profile_rules_are_undetermined_without_a_profile(engine):
+    proposal = _proposal("- 50% Government Bonds", "- 50% Cash")
+    result = engine.evaluate(proposal, None)
+    assert result["verdict"] == AMBIGUOUS
+    assert "DEF-001" in result["undetermined"]
+
+def test_detect_risk_profile(engine):
+    assert engine.detect_risk_profile("Risk Assessment: Moderate, balanced growth") == "moderate"
+    assert engine.detect_risk_profile("Risk Assessment: not aggressive") is None
+    assert engine.detect_risk_profile("No assessment line") is None
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for profile lookups by id and name in the SQLite profile store."""
+
+import threading
+
+import pytest
+
+from FinancialAdvisorRBA.profiles import DEFAULT_CUSTOMER_ID, DEMO_PROFILE, AmbiguousCustomerError, ProfileStore
+
+def _profile(customer_id, name):
+    return dict(DEMO_PROFILE, customer_id=customer_id, name=name)
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileStore(tmp_path / "customers.db")
+    yield store
+    store.close()
+
+def test_demo_customer_is_seeded(store):
+    assert store.get_profile(DEFAULT_CUSTOMER_ID)["name"] == DEMO_PROFILE["name"]
+
+def test_lookup_by_id_and_normalized_name(store):
+    store.upsert_profiles([_profile("C001", "Chan Tai Man")])
+    assert store.get_profile("C001")["name"] == "Chan Tai Man"
+    assert store.get_profile("  chan   TAI man ")["customer_id"] == "C001"
+
+def test_shared_name_is_ambiguous_but_ids_still_resolve(store):
+    store.upsert_profiles([_profile("C001", "Chan Tai Man"), _profile("C002", "chan tai man")])
+    with pytest.raises(AmbiguousCustomerError):
+        store.get_profile("Chan Tai Man")
+    assert store.get_profile("C002")["customer_id"] == "C002"
+
+def test_name_becomes_ambiguous_after_import(store):
+    store.upsert_profiles([_profile("C001", "Chan Tai Man")])
+    assert store.get_profile("Chan Tai Man")["customer_id"] == "C001"
+    store.upsert_profiles([_profile("C002", "Chan Tai Man")])
+    with pytest.raises(AmbiguousCustomerError):
+        store.get_profile("Chan Tai Man")
+
+def test_misses_are_not_cached(store):
+    assert store.get_profile("C009") is None
+    store.upsert_profiles([_profile("C009", "Late Import")])
+    assert store.get_profile("C009")["name"] == "Late Import"
+
+def test_import_csv(store, tmp_path):
+    csv_path = tmp_path / "customers.csv"
+    csv_path.write_text(
+        "customer_id,name,currency,monthly_income,monthly_expense,asset_saving,asset_Bitcoin\n"
+        "C100,Lee Siu Ming,HKD,40000,15000,200000,\n",
+        encoding="utf-8"
+    )
+    assert store.import_csv(csv_path) == 1
+    assert store.get_profile("Lee Siu Ming")["asset"] == {"saving": 200000.0}
+
+def test_close_releases_every_thread_connection(store):
+    threads = [threading.Thread(target=store.get_profile, args=(f"missing-{i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.close()
+    assert store._connections == []
+    assert store.get_profile(DEFAULT_CUSTOMER_ID) is not None
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for exact and semantic matching in the market data answer cache."""
+
+from FinancialAdvisorRBA.query_cache import SemanticQueryCache, query_signature
+
+# Every query embeds to the same direction, so only the signature tells them apart
+def _embed(query):
+    return [1.0, 0.5, 0.25]
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = SemanticQueryCache()
+    cache.store("HSI outlook for 2025?", "answer")
+    assert cache.lookup("hsi   outlook for 2025")[0] == "answer"
+
+def test_semantic_hit_requires_same_year():
+    cache = SemanticQueryCache(embed_fn=_embed)
+    cache.store("RBA outlook 2024", "answer 2024", _embed(""))
+    assert cache.lookup("RBA outlook 2025")[0] is None
+    assert cache.lookup("What is the RBA outlook 2024")[0] == "answer 2024"
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_semantic_hit_requires_same_ticker_and_region():
+    cache = SemanticQueryCache(embed_fn=_embed)
+    cache.store("HSI earnings growth", "hsi", _embed(""))
+    assert cache.lookup("Nikkei earnings growth")[0] is None
+    assert cache.lookup("HSCEI earnings growth")[0] is None
+
+def test_semantic_hit_respects_scope_and_threshold():
+    cache = SemanticQueryCache(similarity_threshold=0.99)
+    cache.store("bond yields", "scoped", [1.0, 0.0], scope="asia")
+    assert cache.lookup("bond yield levels", embedding=[1.0, 0.0])[0] is None
+    assert cache.lookup("bond yield levels", "asia", [0.0, 1.0])[0] is None
+    assert cache.lookup("bond yield levels", "asia", [1.0, 0.01])[0] == "scoped"
+
+def test_eviction_frees_matrix_rows():
+    cache = SemanticQueryCache(max_entries=2)
+    for i, name in enumerate(("alpha", "beta", "gamma")):
+        cache.store(f"{name} outlook", name, [1.0, float(i)])
+    assert cache.stats()["size"] == 2
+    assert cache.lookup("alpha outlook")[0] is None
+    assert cache.lookup("gamma view", embedding=[1.0, 2.0])[0] == "gamma"
+
+def test_stale_version_is_not_stored():
+    cache = SemanticQueryCache()
+    cache.bind_version(1)
+    cache.bind_version(2)
+    cache.store("query", "old answer", version=1)
+    assert cache.lookup("query")[0] is None
+
+def test_query_signature():
+    assert query_signature("HSI Q1 2025") == (
+        ("hong_kong",), ("2025-01", "2025-03"), frozenset({"1", "2025"}), frozenset({"HSI", "Q1"})
+    )
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for month parsing, filter inference and hybrid retrieval fallbacks."""
+
+import pytest
+from llama_index.core import MockEmbedding, QueryBundle, VectorStoreIndex
+from llama_index.core.schema import TextNode
+
+from FinancialAdvisorRBA.retrieval import HybridRetriever, KeywordIndex, _parse_month, infer_filters
+
+@pytest.mark.parametrize("text, month", [
+    ("December 31, 2024", "2024-12"),
+    ("As of March 15, 2025", "2025-03"),
+    ("investors may 30%", None),
+    ("wpb investment monthly jan-25", "2025-01"),
+    ("article equitymarketcommentaryjanuary2025", "2025-01"),
+    ("Outlook for Sept. 2024", "2024-09"),
+    ("May 2025 update", "2025-05"),
+    ("March 15", None),
+])
+def test_parse_month(text, month):
+    assert _parse_month(text) == month
+
+def test_infer_filters_ignores_day_numbers():
+    assert infer_filters("As of March 15, 2025") == {"period": ("2025-03", "2025-03")}
+    assert infer_filters("investors may 30% of equities") == {}
+
+def test_infer_filters_quarter_and_region():
+    assert infer_filters("HSI outlook for Q1 2025") == {
+        "regions": ["hong_kong"],
+        "period": ("2025-01", "2025-03")
+    }
+
+def _node(node_id, text, month=None, regions=""):
+    return TextNode(
+        id_=node_id,
+        text=text,
+        metadata={"publication_month": month, "publication_year": int(month[:4]) if month else None,
+                  "regions": regions, "source_file": f"{node_id}.pdf"}
+    )
+
+@pytest.fixture
+def nodes():
+    return [
+        _node("jan", "Hang Seng earnings outlook", "2025-01", "hong_kong"),
+        _node("feb", "Hang Seng valuation update", "2025-02", "hong_kong"),
+        _node("undated", "General equity commentary"),
+    ]
+
+def test_allowed_ids_keeps_untagged_nodes_unless_tagged_only(nodes):
+    keyword_index = KeywordIndex()
+    keyword_index.add_nodes(nodes)
+    period = {"period": ("2025-01", "2025-01")}
+    assert keyword_index.allowed_ids(period) == {"jan", "undated"}
+    assert keyword_index.allowed_ids(period, tagged_only=True) == {"jan"}
+    assert keyword_index.allowed_ids({"period": ("2030-05", "2030-05")}, tagged_only=True) == set()
+
+def test_search_drops_inferred_period_matching_no_dated_node(nodes):
+    index = VectorStoreIndex(nodes, embed_model=MockEmbedding(embed_dim=8))
+    keyword_index = KeywordIndex.from_index(index)
+    retriever = HybridRetriever(index, keyword_index, top_k=3)
+
+    hits = retriever.search(QueryBundle("Hang Seng outlook December 2030", embedding=[0.5] * 8))
+    assert {hit.node.node_id for hit in hits} == {"jan", "feb", "undated"}
+
+    hits = retriever.search(QueryBundle("Hang Seng outlook January 2025", embedding=[0.5] * 8))
+    assert {hit.node.node_id for hit in hits} == {"jan", "undated"}
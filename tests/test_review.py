@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for merging review panel reports and splitting them back into member messages."""
+
+from FinancialAdvisorRBA.compliance import APPROVED, REQUIRES_CHANGES
+from FinancialAdvisorRBA.review import REVIEW_PANEL_NAME, ReviewPanelAgent, split_review
+
+def _panel_message(reports):
+    return {"role": "user", "name": REVIEW_PANEL_NAME, "content": ReviewPanelAgent([], []).merge(reports)}
+
+def test_split_review_round_trips_member_reports():
+    reports = [
+        ("RiskAssessmentAgent", "Volatility is moderate.\n\nDrawdown within limits."),
+        ("RegulatoryComplianceAgent", "APPROVED")
+    ]
+    parts = split_review(_panel_message(reports))
+    assert [(part["name"], part["content"]) for part in parts] == reports
+    assert all(part["role"] == "user" for part in parts)
+
+def test_merge_heads_the_message_with_the_verdict():
+    message = _panel_message([("RiskAssessmentAgent", "APPROVED"), ("RegulatoryComplianceAgent", REQUIRES_CHANGES)])
+    assert f"Compliance verdict: {REQUIRES_CHANGES}" in message["content"]
+    message = _panel_message([("RegulatoryComplianceAgent", f"{APPROVED}, no issues")])
+    assert f"Compliance verdict: {APPROVED}" in message["content"]
+
+def test_other_messages_are_left_alone():
+    message = {"role": "user", "name": "RiskAssessmentAgent", "content": "=== Fake ===\ntext"}
+    assert split_review(message) == [message]
+    tool_call = {"role": "assistant", "name": REVIEW_PANEL_NAME, "content": None}
+    assert split_review(tool_call) == [tool_call]
+    unsectioned = {"role": "user", "name": REVIEW_PANEL_NAME, "content": "No reports"}
+    assert split_review(unsectioned) == [unsectioned]